@@ -21,11 +21,45 @@ class Settings(BaseSettings):
     CORS_ORIGINS: str = "http://localhost:3000"
     
     # ML Model
-    ML_MODEL_PATH: str = "./app/ml/models/credit_model.pkl"
+    ML_MODEL_PATH: str = "./app/ml/models/credit_model"  # Model bundle directory
+    MAX_BATCH_SCORE_SIZE: int = 10000
+    NEIGHBOR_INDEX: str = "exact"  # exact (in-memory kernel), brute, kd_tree, ball_tree or ivf; "sklearn" is a deprecated alias of exact
+    NEIGHBOR_INDEX_DIR: str = ""  # Persist/memory-map the reference set here when set
+    NEIGHBOR_INDEX_N_PROBE: int = 8  # ivf only: clusters scanned per query (recall vs speed)
+    NEIGHBOR_EXPLANATIONS: bool = False  # Add the nearest historical applicants to /apply feedback
+    MODEL_ADMIN_TOKEN: str = ""  # X-Admin-Token for /api/model/reload (empty disables it)
+    MODEL_RELOAD_POLL_SECONDS: float = 0  # Reload when the bundle on disk changes (0 disables)
+    PREDICTION_CACHE_SIZE: int = 10000  # Cached single-applicant predictions (0 disables)
+    PREDICTION_CACHE_TTL_SECONDS: float = 300
+    INFERENCE_EXECUTOR: str = "thread"  # thread, process (model preloaded per worker) or inline
+    INFERENCE_WORKERS: int = 4
+    INFERENCE_MAX_PENDING: int = 256  # Scoring requests waiting or running; more get a 503
+    INFERENCE_TIMEOUT_SECONDS: float = 10  # Scoring requests slower than this get a 504
+    MICRO_BATCH_WINDOW_MS: float = 2  # How long an /apply score waits to share a model call
+    MICRO_BATCH_MAX_SIZE: int = 64  # Dispatch a batch at this size (1 disables batching)
+    MICRO_BATCH_MAX_QUEUE: int = 1024  # Scores waiting for a batch; more get a 503
+    SHADOW_MODEL_PATH: str = ""  # Candidate bundle scored alongside production (empty disables shadowing)
+    SHADOW_MAX_QUEUE: int = 1000  # Shadow evaluations waiting; more are dropped
+    SHADOW_BATCH_SIZE: int = 64
+    SHADOW_RATE_TOLERANCE: float = 5  # Acceptance-rate gap (points) recorded as a disagreement
+    SHADOW_LOG_PATH: str = "./logs/shadow_disagreements.jsonl"
     
     # File Upload
-    MAX_UPLOAD_SIZE: int = 10485760
+    MAX_UPLOAD_SIZE: int = 10485760  # Bytes; uploads are rejected with a 413 once they pass it
+    STORED_CHUNK_ROWS: int = 10000  # Rows per stored chunk of an upload's transactions (every row is stored)
+    AGGREGATE_UPDATE_ATTEMPTS: int = 5  # Merges into a user's aggregates tried before giving up on concurrent updates
+    CATEGORY_MEMO_SIZE: int = 100000  # Distinct descriptions whose category is remembered (0 disables)
+    CATEGORIZER_MODEL_PATH: str = ""  # Learned categorizer for debits no keyword matches (empty disables it)
+    CATEGORIZER_MIN_CONFIDENCE: float = 0.5  # Below this the debit stays in others
     ALLOWED_EXTENSIONS: str = "csv,xlsx,xls"
+    UPLOAD_JOB_WORKERS: int = 2  # Background uploads processed at once
+    UPLOAD_JOB_MAX_PENDING: int = 32  # Background uploads waiting; more get a 503
+    UPLOAD_JOB_TTL_SECONDS: float = 3600  # How long a finished upload job can be looked up
+    UPLOAD_JOB_DIR: str = ""  # Where background uploads wait to be processed (empty: system temp dir)
+    UPLOAD_JOB_STORE: str = "supabase"  # supabase (job status shared by all server workers) or memory (single worker only)
+    UPLOAD_JOB_SYNC_SECONDS: float = 2  # How often running jobs' progress is written to the job store
+    BULK_MAX_FILES: int = 60  # Statements in one bulk upload, counting those inside zip archives
+    BULK_PARSE_WORKERS: int = 0  # Processes parsing a bulk upload's statements (0: one per CPU core)
     
     # Thresholds (percentage of income)
     TRANSPORT_THRESHOLD: int = 15
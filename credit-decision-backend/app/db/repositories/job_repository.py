@@ -0,0 +1,34 @@
+from app.config.database import supabase_client
+from app.services.job_queue import JobStore
+from typing import Dict, List, Optional
+
+# Background upload jobs shared by all server workers expect this table:
+#
+#   create table upload_jobs (
+#       id uuid primary key,
+#       kind text not null,
+#       owner uuid,
+#       status text not null,
+#       progress jsonb,
+#       result jsonb,
+#       error jsonb,
+#       created_at timestamptz not null,
+#       started_at timestamptz,
+#       finished_at timestamptz,
+#       updated_at timestamptz not null
+#   );
+
+class JobRepository(JobStore):
+    def __init__(self):
+        self.db = supabase_client
+    
+    async def save_jobs(self, jobs: List[Dict]):
+        """Insert or replace job records"""
+        self.db.table('upload_jobs').upsert(jobs, on_conflict='id').execute()
+    
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get a job record by ID"""
+        response = self.db.table('upload_jobs').select('*').eq('id', str(job_id)).execute()
+        return response.data[0] if response.data else None
+
+job_repository = JobRepository()
@@ -26,4 +26,21 @@ class LoanRepository:
         response = self.db.table('loan_applications').update(decision_data).eq('id', str(loan_id)).execute()
         return response.data[0] if response.data else None
 
+    async def get_decided_loans(self, since: Optional[str] = None, after_id: Optional[str] = None,
+                                limit: int = 10000) -> List[Dict]:
+        """
+        Get approved/rejected loans after the (since, after_id) position, oldest first (model update feed).
+        Ordered by (created_at, id) so loans sharing a timestamp are neither skipped nor repeated across pages;
+        without after_id every loan created at since is skipped.
+        """
+        query = self.db.table('loan_applications').select(
+            'id, num_debts, total_debt_amount, monthly_emis, total_assets, monthly_income, city_tier, status, created_at'
+        ).in_('status', ['approved', 'rejected'])
+        if since and after_id:
+            query = query.or_(f'created_at.gt."{since}",and(created_at.eq."{since}",id.gt.{after_id})')
+        elif since:
+            query = query.gt('created_at', since)
+        response = query.order('created_at').order('id').limit(limit).execute()
+        return response.data if response.data else []
+
 loan_repository = LoanRepository()
@@ -1,7 +1,42 @@
 from app.config.database import supabase_client
+from datetime import datetime, timezone
 from typing import Dict, List, Optional
 from uuid import UUID
 
+# Running aggregates and de-duplication keys expect these tables, and
+# repeat-upload detection and cash-flow features these columns:
+#
+#   alter table transactions
+#       add column file_hash text,
+#       add column content_hash text,
+#       add column transactions_count integer;
+#   create index on transactions (user_id, file_hash);
+#   create index on transactions (user_id, content_hash);
+#   alter table financial_behavior add column cash_flow jsonb;
+#   alter table financial_behavior add column monthly_income numeric;
+#   alter table transactions add column stored_chunks integer;
+#   -- Uploads over STORED_CHUNK_ROWS rows: transaction_data holds chunk 0, the rest are here
+#   create table transaction_chunks (
+#       transaction_id uuid not null references transactions(id) on delete cascade,
+#       chunk integer not null,
+#       rows jsonb not null,
+#       primary key (transaction_id, chunk)
+#   );
+#   create table financial_aggregates (
+#       user_id uuid primary key references users(id),
+#       aggregates jsonb not null,
+#       version integer not null default 0,
+#       updated_at timestamptz not null default now()
+#   );
+#   create table transaction_keys (
+#       user_id uuid not null references users(id),
+#       key bigint not null,
+#       primary key (user_id, key)
+#   );
+
+# Keys sent per insert request
+KEY_BATCH_SIZE = 10000
+
 class TransactionRepository:
     def __init__(self):
         self.db = supabase_client
@@ -11,11 +46,27 @@ class TransactionRepository:
         response = self.db.table('transactions').insert(transaction_data).execute()
         return response.data[0] if response.data else None
     
+    async def find_transaction_upload(self, user_id: UUID, file_hash: str = None,
+                                      content_hash: str = None) -> Optional[Dict]:
+        """Latest upload of a user with the given file hash or content hash (without its transaction data)"""
+        query = self.db.table('transactions').select(
+            'id, user_id, file_name, upload_date, transactions_count'
+        ).eq('user_id', str(user_id))
+        query = query.eq('file_hash', file_hash) if file_hash else query.eq('content_hash', content_hash)
+        response = query.order('upload_date', desc=True).limit(1).execute()
+        return response.data[0] if response.data else None
+    
     async def get_user_transactions(self, user_id: UUID) -> List[Dict]:
         """Get all transactions for a user"""
         response = self.db.table('transactions').select('*').eq('user_id', str(user_id)).order('upload_date', desc=True).execute()
         return response.data if response.data else []
     
+    async def save_transaction_chunk(self, transaction_id: UUID, chunk: int, rows: List[Dict]):
+        """Store one further chunk of an upload's transactions"""
+        self.db.table('transaction_chunks').insert(
+            {'transaction_id': str(transaction_id), 'chunk': chunk, 'rows': rows}
+        ).execute()
+    
     async def save_financial_behavior(self, behavior_data: Dict) -> Dict:
         """Save financial behavior analysis"""
         response = self.db.table('financial_behavior').insert(behavior_data).execute()
@@ -26,4 +77,44 @@ class TransactionRepository:
         response = self.db.table('financial_behavior').select('*').eq('user_id', str(user_id)).order('created_at', desc=True).limit(1).execute()
         return response.data[0] if response.data else None
 
+    async def claim_transaction_keys(self, user_id: UUID, keys: List[int]) -> List[int]:
+        """Record a user's transaction keys; returns the ones not recorded before"""
+        claimed = []
+        for start in range(0, len(keys), KEY_BATCH_SIZE):
+            rows = [{'user_id': str(user_id), 'key': key} for key in keys[start:start + KEY_BATCH_SIZE]]
+            # Existing keys are skipped and left out of the returned rows
+            response = self.db.table('transaction_keys').upsert(
+                rows, on_conflict='user_id,key', ignore_duplicates=True
+            ).execute()
+            claimed.extend(row['key'] for row in response.data or [])
+        return claimed
+    
+    async def release_transaction_keys(self, user_id: UUID, keys: List[int]):
+        """Forget claimed keys whose transactions did not make it into the aggregates"""
+        for start in range(0, len(keys), KEY_BATCH_SIZE):
+            self.db.table('transaction_keys').delete().eq('user_id', str(user_id)).in_(
+                'key', keys[start:start + KEY_BATCH_SIZE]
+            ).execute()
+    
+    async def get_financial_aggregates(self, user_id: UUID) -> Optional[Dict]:
+        """Get a user's running transaction aggregates, as {'aggregates', 'version'}"""
+        response = self.db.table('financial_aggregates').select('aggregates, version').eq('user_id', str(user_id)).execute()
+        return response.data[0] if response.data else None
+    
+    async def save_financial_aggregates(self, user_id: UUID, aggregates: Dict, version: Optional[int]) -> bool:
+        """
+        Write a user's running transaction aggregates if they are still at
+        version (None: not created yet); False when another update got there first
+        """
+        row = {'aggregates': aggregates, 'updated_at': datetime.now(timezone.utc).isoformat()}
+        if version is None:
+            response = self.db.table('financial_aggregates').upsert(
+                {**row, 'user_id': str(user_id), 'version': 0}, on_conflict='user_id', ignore_duplicates=True
+            ).execute()
+        else:
+            response = self.db.table('financial_aggregates').update({**row, 'version': version + 1}).eq(
+                'user_id', str(user_id)
+            ).eq('version', version).execute()
+        return bool(response.data)
+
 transaction_repository = TransactionRepository()
@@ -1,7 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config.settings import settings
-from app.routes import auth, loan, transaction, bank, user
+from app.routes import auth, loan, transaction, bank, user, model
+from app.ml.model_registry import model_registry
+from app.services.ml_service import ml_service
+from app.services.transaction_service import transaction_service
 from app.middleware.error_handler import error_handler_middleware, setup_exception_handlers
 
 # Create FastAPI app
@@ -35,6 +38,18 @@ app.include_router(loan.router, prefix="/api/loans", tags=["Loans"])
 app.include_router(transaction.router, prefix="/api/transactions", tags=["Transactions"])
 app.include_router(bank.router, prefix="/api/banks", tags=["Banks"])
 app.include_router(user.router, prefix="/api/user", tags=["User"])
+app.include_router(model.router, prefix="/api/model", tags=["Model"])
+
+@app.on_event("startup")
+async def start_model_watcher():
+    model_registry.start_watching(settings.MODEL_RELOAD_POLL_SECONDS)
+
+@app.on_event("shutdown")
+async def stop_model_watcher():
+    await model_registry.stop_watching()
+    ml_service.shutdown()
+    await transaction_service.jobs.shutdown()
+    transaction_service.statements.shutdown()
 
 @app.get("/")
 async def root():
@@ -6,58 +6,158 @@ Trained model for predicting loan approval based on financial parameters
 import pickle
 import numpy as np
 from sklearn.neighbors import KNeighborsClassifier
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import LabelEncoder
 from typing import Dict, Tuple
 import os
 import joblib
+from app.ml.decision_rules import RuleEngine, RuleEvaluation, rule_engine
+from app.ml.feature_engineering import FEATURE_ORDER, FeatureInput
+from app.ml.preprocessor import KERNEL_MAX_ROWS, FeaturePipeline, KNNKernel
+from app.ml.model_bundle import ModelBundle, is_bundle, load_bundle, save_bundle
+from app.ml.neighbor_index import INDEX_MANIFEST, NeighborIndex, build_index, load_index, neighbor_vote, vote_weights
+from app.ml.neighbor_explanation import NeighborExplanation
+from app.config.settings import settings
 
 class CreditScoreModel:
-    def __init__(self, model_path: str = None, scaler_path: str = None):
+    def __init__(self, model_path: str = None, scaler_path: str = None, rules: RuleEngine = None,
+                 index_type: str = 'exact', index_dir: str = None, index_n_probe: int = 8,
+                 bundle_path: str = None, strict: bool = False):
         """
         Initialize Credit Score Model
         
         Args:
-            model_path: Path to saved KNN model (.pkl)
-            scaler_path: Path to saved StandardScaler (.pkl)
+            model_path: Path to legacy pickled KNN model (.pkl), used when no bundle exists
+            scaler_path: Path to legacy pickled StandardScaler (.pkl)
+            rules: Compiled acceptance-rate rule table (defaults to acceptance_rules.json)
+            index_type: Neighbour search backend - 'exact' (matching
+                KNeighborsClassifier.predict_proba: a NumPy kernel for up to
+                KERNEL_MAX_ROWS reference rows, a KD-tree above that) or a
+                neighbor_index kind (brute, kd_tree, ball_tree, ivf).
+                'sklearn' is accepted as a deprecated name of 'exact'
+            index_dir: Directory to persist the float32 reference set; it is
+                memory-mapped from there on later loads
+            index_n_probe: Clusters scanned per query by the ivf index
+            bundle_path: Model bundle directory (see app/ml/model_bundle.py)
+            strict: Raise on a missing or invalid model instead of falling back
+                to the development dummy model (used for hot reloads)
         """
+        self.bundle_path = bundle_path or './app/ml/models/credit_model'
         self.model_path = model_path or './app/ml/models/knn_model.pkl'
         self.scaler_path = scaler_path or './app/ml/models/scaler.pkl'
+        self.rule_engine = rules or rule_engine
+        if index_type == 'sklearn':
+            print("⚠ Warning: NEIGHBOR_INDEX 'sklearn' is deprecated, use 'exact'")
+            index_type = 'exact'
+        self.index_type = index_type
+        self.index_dir = index_dir
+        self.index_n_probe = index_n_probe
+        self.strict = strict
         self.model = None
-        self.scaler = None
+        self.pipeline: FeaturePipeline = None
+        self.bundle: ModelBundle = None
+        self.neighbor_index: NeighborIndex = None
+        self.kernel: KNNKernel = None
         self.load_model()
     
     def load_model(self):
-        """Load trained KNN model and scaler"""
+        """Load the model bundle, falling back to legacy pickled model and scaler"""
+        self.model = None
+        self.bundle = None
         try:
-            # Try to load existing model
-            if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
+            if is_bundle(self.bundle_path):
+                self._load_bundle()
+            elif os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
                 with open(self.model_path, 'rb') as f:
                     self.model = pickle.load(f)
                 with open(self.scaler_path, 'rb') as f:
-                    self.scaler = pickle.load(f)
-                print("✓ Loaded trained KNN model and scaler")
+                    self.pipeline = FeaturePipeline.from_scaler(pickle.load(f))
+                self._use_sklearn_model('legacy-pickle')
+                print("✓ Loaded trained KNN model and scaler (legacy pickle)")
+            elif self.strict:
+                raise FileNotFoundError(f"No model bundle at {self.bundle_path}")
             else:
                 print("⚠ Warning: Model files not found. Please train the model first.")
-                print(f"Expected model at: {self.model_path}")
-                print(f"Expected scaler at: {self.scaler_path}")
+                print(f"Expected model bundle at: {self.bundle_path}")
                 # Create dummy model for development (will be replaced by trained model)
                 self._create_dummy_model()
         except Exception as e:
             print(f"✗ Error loading model: {str(e)}")
+            if self.strict:
+                raise
             self._create_dummy_model()
+        
+        self._load_neighbor_index()
+    
+    def _load_bundle(self):
+        """Memory-map a model bundle and rebuild the feature pipeline from its arrays"""
+        bundle = load_bundle(self.bundle_path)
+        
+        self.bundle = bundle
+        self.pipeline = FeaturePipeline.from_arrays(bundle.scaler_mean, bundle.scaler_scale, len(bundle))
+        self.reference = bundle.reference
+        self.labels = bundle.labels
+        self.classes = bundle.classes
+        self.n_neighbors = bundle.params['n_neighbors']
+        self.weights = bundle.params['weights']
+        self.model_version = bundle.version
+        self.model_format = 'bundle'
+        print(f"✓ Loaded model bundle {bundle.version} ({len(bundle)} reference rows)")
+    
+    def _use_sklearn_model(self, version: str):
+        """Take the reference set and KNN parameters from a fitted KNeighborsClassifier"""
+        self.reference = self.model._fit_X
+        self.labels = np.asarray(self.model._y)
+        self.classes = [str(c) for c in self.model.classes_]
+        self.n_neighbors = self.model.n_neighbors
+        self.weights = self.model.weights
+        self.model_version = version
+        self.model_format = 'pickle' if version == 'legacy-pickle' else version
+    
+    def _load_neighbor_index(self):
+        """Build (or memory-map) the neighbour index over the model's reference set"""
+        self.neighbor_index = None
+        self.kernel = None
+        index_type = self.index_type
+        if index_type == 'exact':
+            if len(self.reference) <= KERNEL_MAX_ROWS:
+                self.kernel = KNNKernel(self.reference, self.labels, len(self.classes), self.n_neighbors, self.weights)
+                return
+            index_type = 'kd_tree'
+        
+        params = {'n_probe': self.index_n_probe} if index_type == 'ivf' else {}
+        # One persisted index per model version, so a reload never picks up a stale one
+        index_dir = os.path.join(self.index_dir, self.model_version) if self.index_dir else None
+        manifest_path = os.path.join(index_dir, INDEX_MANIFEST) if index_dir else None
+        
+        if manifest_path and os.path.exists(manifest_path):
+            index = load_index(index_dir, **params)
+            # Only reuse a persisted index built for this model's reference set
+            if index.kind == index_type and len(index) == len(self.reference):
+                self.neighbor_index = index
+        
+        if self.neighbor_index is None:
+            index = build_index(index_type, self.reference, **params)
+            if index_dir:
+                index.save(index_dir)
+                index = load_index(index_dir, **params)
+            self.neighbor_index = index
+        
+        print(f"✓ Neighbour index ready: {index_type} over {len(self.neighbor_index)} rows")
     
     def _create_dummy_model(self):
         """Create a dummy model for development/testing purposes"""
         print("Creating dummy model for development...")
         self.model = KNeighborsClassifier(n_neighbors=6, metric='minkowski', p=2)
-        self.scaler = StandardScaler()
+        self.pipeline = FeaturePipeline()
         
         # Train with dummy data (6 features)
         X_dummy = np.random.rand(100, 6)
         y_dummy = np.random.randint(0, 2, 100)
         
-        X_dummy_scaled = self.scaler.fit_transform(X_dummy)
+        X_dummy_scaled = self.pipeline.fit_transform(X_dummy)
         self.model.fit(X_dummy_scaled, y_dummy)
+        self.bundle = None
+        self._use_sklearn_model('dummy')
     
     def predict(self, features: Dict) -> Tuple[float, float]:
         """
@@ -76,147 +176,132 @@ class CreditScoreModel:
             Tuple of (ml_score, acceptance_rate)
         """
         try:
-            # Extract and prepare features in correct order
-            # Order matches training data: [num_debts, total_debt_amount, monthly_emis, 
-            #                               total_assets, monthly_income, city_tier_encoded]
-            city_tier_mapping = {'tier_1': 1, 'tier_2': 2, 'tier_3': 3}
-            
-            X = np.array([[
-                features['num_debts'],
-                features['total_debt_amount'],
-                features['monthly_emis'],
-                features['total_assets'],
-                features['monthly_income'],
-                city_tier_mapping.get(features['city_tier'], 2)
-            ]])
-            
-            # Scale features
-            X_scaled = self.scaler.transform(X)
-            
-            # Get prediction probability from KNN model
-            proba = self.model.predict_proba(X_scaled)[0]
-            
-            # ML Score (0-100) - probability of approval class
-            ml_score = proba[1] * 100  # Probability of class 1 (approved)
-            
-            # Calculate acceptance rate based on ML score + financial ratios
-            acceptance_rate = self._calculate_acceptance_rate(features, ml_score)
-            
-            return round(ml_score, 2), round(acceptance_rate, 2)
+            ml_scores, acceptance_rates = self.predict_batch([features])
+            return round(float(ml_scores[0]), 2), round(float(acceptance_rates[0]), 2)
             
         except Exception as e:
             print(f"Error in prediction: {str(e)}")
             # Return conservative estimates on error
             return 50.0, 50.0
     
-    def _calculate_acceptance_rate(self, features: Dict, ml_score: float) -> float:
+    def predict_batch(self, features: FeatureInput) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Calculate final acceptance rate by combining ML score with financial ratios
+        Predict credit scores and acceptance rates for many applicants at once
+        
+        Scaling, the neighbour query and the acceptance-rate rules each run
+        once over the whole (N, 6) matrix instead of once per applicant.
         
         Args:
-            features: User's financial features
-            ml_score: Base ML model score
+            features: List of feature dictionaries (same keys as predict), a
+                DataFrame with those columns, or an array of shape (N, 6)
+                already in FEATURE_ORDER with city tier encoded as 1/2/3
         
         Returns:
-            Final acceptance rate (10-95%)
+            Tuple of (ml_scores, acceptance_rates) arrays of length N
         """
-        # Start with ML score
-        acceptance_rate = ml_score
-        
-        # Calculate financial health indicators
-        monthly_income = max(features['monthly_income'], 1)  # Avoid division by zero
-        annual_income = monthly_income * 12
-        total_debt = max(features['total_debt_amount'], 0)
-        
-        # 1. Debt-to-Income Ratio (DTI)
-        debt_to_income = total_debt / annual_income if annual_income > 0 else 1
-        if debt_to_income > 0.5:  # High debt burden
-            acceptance_rate -= 15
-        elif debt_to_income > 0.3:  # Moderate debt burden
-            acceptance_rate -= 8
-        elif debt_to_income < 0.2:  # Low debt burden
-            acceptance_rate += 5
-        
-        # 2. EMI-to-Income Ratio
-        emi_to_income = features['monthly_emis'] / monthly_income if monthly_income > 0 else 1
-        if emi_to_income > 0.5:  # Very high EMI burden
-            acceptance_rate -= 20
-        elif emi_to_income > 0.4:  # High EMI burden
-            acceptance_rate -= 12
-        elif emi_to_income < 0.25:  # Manageable EMI
-            acceptance_rate += 5
-        
-        # 3. Asset-to-Debt Ratio
-        if total_debt > 0:
-            asset_ratio = features['total_assets'] / total_debt
-            if asset_ratio > 2.0:  # Strong asset backing
-                acceptance_rate += 15
-            elif asset_ratio > 1.5:  # Good asset backing
-                acceptance_rate += 10
-            elif asset_ratio < 0.5:  # Weak asset backing
-                acceptance_rate -= 10
-        elif features['total_assets'] > 0:
-            # No debt but has assets
-            acceptance_rate += 10
-        
-        # 4. Number of existing debts penalty
-        if features['num_debts'] > 5:
-            acceptance_rate -= 12
-        elif features['num_debts'] > 3:
-            acceptance_rate -= 6
-        elif features['num_debts'] == 0:
-            acceptance_rate += 5
-        
-        # 5. City tier adjustment (cost of living)
-        if features['city_tier'] == 'tier_1':
-            # Higher income needed in metro cities
-            if monthly_income < 30000:
-                acceptance_rate -= 5
-        elif features['city_tier'] == 'tier_3':
-            # Lower cost of living
-            acceptance_rate += 3
-        
-        # Ensure bounds [10, 95]
-        acceptance_rate = max(10, min(95, acceptance_rate))
-        
-        return acceptance_rate
+        evaluation = self.evaluate_batch(features)
+        return evaluation.ml_scores, evaluation.acceptance_rates
     
-    def save_model(self, model_path: str = None, scaler_path: str = None):
+    def evaluate_batch(self, features: FeatureInput, explain: bool = False) -> RuleEvaluation:
         """
-        Save trained model and scaler to disk
+        Score applicants and evaluate the decision rules in one pass
         
         Args:
-            model_path: Path to save KNN model
-            scaler_path: Path to save StandardScaler
+            features: Same as predict_batch
+            explain: Also build neighbour explanations (evaluation.neighbors)
+                from the same neighbour query
+        
+        Returns:
+            RuleEvaluation holding ML scores, acceptance rates, statuses and
+            the triggered feedback rules for every applicant
         """
-        model_path = model_path or self.model_path
-        scaler_path = scaler_path or self.scaler_path
+        X = self.pipeline.features(features)
+        if X.shape[0] == 0:
+            return self.rule_engine.evaluate(X, np.empty(0))
         
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        # Scale features
+        X_scaled = self.pipeline.scale_features(X)
         
-        try:
-            with open(model_path, 'wb') as f:
-                pickle.dump(self.model, f)
-            with open(scaler_path, 'wb') as f:
-                pickle.dump(self.scaler, f)
-            print(f"✓ Model saved to {model_path}")
-            print(f"✓ Scaler saved to {scaler_path}")
-        except Exception as e:
-            print(f"✗ Error saving model: {str(e)}")
+        # One neighbour query gives both the vote and the explanation
+        distances, indices = self.kneighbors(X_scaled)
+        neighbor_labels = self.labels[indices]
+        
+        # ML Score (0-100) - probability of class 1 (approved)
+        ml_scores = neighbor_vote(neighbor_labels, distances, len(self.classes), self.weights)[:, 1] * 100
+        
+        # Acceptance rate = ML score adjusted by the financial-ratio rule table
+        evaluation = self.rule_engine.evaluate(X, ml_scores)
+        if explain:
+            evaluation.neighbors = NeighborExplanation(
+                X_scaled, distances, indices, neighbor_labels, vote_weights(distances, self.weights),
+                self.reference, self.pipeline.mean, self.pipeline.scale, self.classes
+            )
+        return evaluation
+    
+    def kneighbors(self, X_scaled: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(distances, reference-row indices) of the n_neighbors nearest rows, from the configured backend"""
+        if self.kernel is not None:
+            return self.kernel.kneighbors(X_scaled)
+        return self.neighbor_index.query(X_scaled, self.n_neighbors)
+    
+    @property
+    def scaler(self):
+        """The fitted StandardScaler inside the feature pipeline"""
+        return self.pipeline.scaler if self.pipeline is not None else None
+    
+    def save_model(self, bundle_path: str = None, metrics: Dict = None) -> ModelBundle:
+        """
+        Save the loaded model as a bundle
+        
+        Args:
+            bundle_path: Bundle directory (defaults to the configured bundle path)
+            metrics: Optional evaluation metrics to record in the manifest
+        """
+        bundle_path = bundle_path or self.bundle_path
+        bundle = save_bundle(
+            bundle_path,
+            reference=self.reference,
+            labels=self.labels,
+            scaler_mean=self.pipeline.mean,
+            scaler_scale=self.pipeline.scale,
+            classes=self.classes,
+            n_neighbors=self.n_neighbors,
+            weights=self.weights,
+            metrics=metrics
+        )
+        print(f"✓ Model bundle {bundle.version} saved to {bundle_path}")
+        return bundle
     
     def get_model_info(self) -> Dict:
         """Get information about the loaded model"""
         return {
             'model_type': 'KNeighborsClassifier',
-            'n_neighbors': self.model.n_neighbors if hasattr(self.model, 'n_neighbors') else None,
-            'metric': self.model.metric if hasattr(self.model, 'metric') else None,
-            'model_loaded': self.model is not None,
-            'scaler_loaded': self.scaler is not None,
-            'model_path': self.model_path,
-            'scaler_path': self.scaler_path
+            'model_version': self.model_version,
+            'model_format': self.model_format,
+            'n_neighbors': self.n_neighbors,
+            'weights': self.weights,
+            'metric': 'euclidean',
+            'features': FEATURE_ORDER,
+            'classes': self.classes,
+            'neighbor_index': self.neighbor_index.kind if self.neighbor_index is not None else 'exact',
+            'reference_rows': len(self.reference),
+            'model_loaded': self.model is not None or self.bundle is not None,
+            'scaler_loaded': self.pipeline is not None and self.pipeline.is_fitted,
+            'bundle_path': self.bundle_path if self.bundle is not None else None,
+            'model_path': self.model_path if self.model_format == 'pickle' else None
         }
 
 
+def load_credit_model(bundle_path: str = None, strict: bool = False) -> CreditScoreModel:
+    """Create a CreditScoreModel configured from settings"""
+    return CreditScoreModel(
+        bundle_path=bundle_path or settings.ML_MODEL_PATH,
+        index_type=settings.NEIGHBOR_INDEX,
+        index_dir=settings.NEIGHBOR_INDEX_DIR or None,
+        index_n_probe=settings.NEIGHBOR_INDEX_N_PROBE,
+        strict=strict
+    )
+
+
 # Create global instance
-credit_model = CreditScoreModel()
+credit_model = load_credit_model()
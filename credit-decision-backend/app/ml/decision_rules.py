@@ -0,0 +1,202 @@
+"""
+Decision Rules - table-driven acceptance-rate and feedback rules
+The rule table (acceptance_rules.json) is compiled once into NumPy
+np.select operations that evaluate any number of applicants in one pass
+"""
+
+import json
+import os
+import numpy as np
+from typing import Dict, List, Tuple
+from app.ml.feature_engineering import DERIVED_FEATURES, FEATURE_ORDER, derived_features
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), 'acceptance_rules.json')
+
+FEEDBACK_SECTIONS = ['strengths', 'concerns', 'recommendations']
+
+_OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+# Metrics a rule condition may reference (raw features and derived ratios)
+METRICS = FEATURE_ORDER + DERIVED_FEATURES + ['ml_score', 'acceptance_rate']
+
+
+def compute_metrics(X: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Compute the raw and derived metrics used by the rules
+
+    Args:
+        X: Raw (unscaled) feature matrix in FEATURE_ORDER
+
+    Returns:
+        Dictionary of metric name -> array of length N
+    """
+    metrics = {name: X[:, j] for j, name in enumerate(FEATURE_ORDER)}
+    # Derived ratios (monthly_income is floored at 1 there to avoid division by zero)
+    metrics.update(derived_features(X))
+    return metrics
+
+
+class RuleEvaluation:
+    """Result of evaluating the rule table over N applicants"""
+
+    def __init__(self, engine: 'RuleEngine', ml_scores: np.ndarray, acceptance_rates: np.ndarray,
+                 adjustment_index: np.ndarray, decision_index: np.ndarray, feedback_mask: np.ndarray):
+        self.engine = engine
+        self.ml_scores = ml_scores
+        self.acceptance_rates = acceptance_rates
+        self.adjustment_index = adjustment_index  # (N, n_rules), -1 where no clause matched
+        self.decision_index = decision_index      # (N,)
+        self.feedback_mask = feedback_mask        # (N, n_feedback_rules)
+        self.neighbors = None                     # NeighborExplanation when requested
+
+    def __len__(self) -> int:
+        return len(self.ml_scores)
+
+    @property
+    def statuses(self) -> np.ndarray:
+        """Decision status for every applicant"""
+        return self.engine.decision_statuses[self.decision_index]
+
+    def codes(self, i: int) -> List[str]:
+        """Codes of every adjustment and feedback rule triggered for applicant i"""
+        codes = [
+            self.engine.adjustment_codes[r][clause]
+            for r, clause in enumerate(self.adjustment_index[i]) if clause >= 0
+        ]
+        codes.append(self.engine.decision_codes[self.decision_index[i]])
+        codes.extend(self.engine.feedback_codes[j] for j in np.flatnonzero(self.feedback_mask[i]))
+        return codes
+
+    def feedback(self, i: int) -> Dict:
+        """Feedback payload for applicant i"""
+        feedback = {
+            'overall': self.engine.decision_messages[self.decision_index[i]],
+            **{section: [] for section in FEEDBACK_SECTIONS}
+        }
+        for j in np.flatnonzero(self.feedback_mask[i]):
+            feedback[self.engine.feedback_sections[j]].append(self.engine.feedback_messages[j])
+        if self.neighbors is not None:
+            feedback['neighbors'] = self.neighbors.explain(i)
+        return feedback
+
+    def result(self, i: int) -> Dict:
+        """Score, rate, status and feedback for applicant i"""
+        return {
+            'ml_score': float(self.ml_scores[i]),
+            'acceptance_rate': float(self.acceptance_rates[i]),
+            'status': str(self.engine.decision_statuses[self.decision_index[i]]),
+            'feedback': self.feedback(i)
+        }
+
+
+class RuleEngine:
+    def __init__(self, rules: Dict):
+        """
+        Compile a rule table
+
+        Args:
+            rules: Parsed rule table (see acceptance_rules.json)
+        """
+        self.version = rules.get('version')
+        self.min_rate = rules['bounds']['min']
+        self.max_rate = rules['bounds']['max']
+
+        self.adjustment_names = [rule['name'] for rule in rules['adjustments']]
+        self.adjustment_codes = [[clause['code'] for clause in rule['clauses']] for rule in rules['adjustments']]
+        self._adjustments = [
+            (
+                [self._compile_condition(clause['when']) for clause in rule['clauses']],
+                np.array([clause['adjustment'] for clause in rule['clauses']], dtype=np.float64)
+            )
+            for rule in rules['adjustments']
+        ]
+
+        self._decisions = [self._compile_condition(band['when']) for band in rules['decision']]
+        self.decision_statuses = np.array([band['status'] for band in rules['decision']])
+        self.decision_codes = [band['code'] for band in rules['decision']]
+        self.decision_messages = [band['message'] for band in rules['decision']]
+
+        for rule in rules['feedback']:
+            if rule['section'] not in FEEDBACK_SECTIONS:
+                raise ValueError(f"Unknown feedback section '{rule['section']}'")
+        self._feedback = [self._compile_condition(rule['when']) for rule in rules['feedback']]
+        self.feedback_sections = [rule['section'] for rule in rules['feedback']]
+        self.feedback_codes = [rule['code'] for rule in rules['feedback']]
+        self.feedback_messages = [rule['message'] for rule in rules['feedback']]
+
+    @classmethod
+    def from_file(cls, path: str = None) -> 'RuleEngine':
+        """Load and compile a rule table from JSON"""
+        with open(path or DEFAULT_RULES_PATH, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _compile_condition(when: List) -> List[Tuple]:
+        """Validate a list of [metric, operator, value] terms (all must hold)"""
+        terms = []
+        for metric, op, value in when:
+            if metric not in METRICS:
+                raise ValueError(f"Unknown rule metric '{metric}'")
+            if op not in _OPERATORS:
+                raise ValueError(f"Unknown rule operator '{op}'")
+            if isinstance(value, str) and value not in METRICS:
+                raise ValueError(f"Unknown rule metric '{value}'")
+            terms.append((metric, _OPERATORS[op], value))
+        return terms
+
+    @staticmethod
+    def _evaluate_condition(terms: List[Tuple], metrics: Dict[str, np.ndarray], n: int) -> np.ndarray:
+        mask = np.ones(n, dtype=bool)
+        for metric, op, value in terms:
+            mask &= op(metrics[metric], metrics[value] if isinstance(value, str) else value)
+        return mask
+
+    def evaluate(self, X: np.ndarray, ml_scores: np.ndarray) -> RuleEvaluation:
+        """
+        Evaluate the rule table for N applicants
+
+        Args:
+            X: Raw (unscaled) feature matrix in FEATURE_ORDER
+            ml_scores: Base ML model scores (0-100)
+
+        Returns:
+            RuleEvaluation with adjusted acceptance rates and triggered rules
+        """
+        n = X.shape[0]
+        metrics = compute_metrics(X)
+        metrics['ml_score'] = ml_scores
+
+        # Within a rule the first matching clause wins; rules add up
+        acceptance_rates = np.array(ml_scores, dtype=np.float64)
+        adjustment_index = np.full((n, len(self._adjustments)), -1, dtype=np.int16)
+        for r, (conditions, adjustments) in enumerate(self._adjustments):
+            masks = [self._evaluate_condition(terms, metrics, n) for terms in conditions]
+            clause = np.select(masks, np.arange(len(masks)), default=-1)
+            adjustment_index[:, r] = clause
+            acceptance_rates += np.where(clause >= 0, adjustments[clause], 0)
+
+        # Ensure bounds, then decide on the same rounded values that are returned
+        acceptance_rates = np.round(np.clip(acceptance_rates, self.min_rate, self.max_rate), 2)
+        ml_scores = np.round(ml_scores, 2)
+        metrics['acceptance_rate'] = acceptance_rates
+        metrics['ml_score'] = ml_scores
+
+        decision_masks = [self._evaluate_condition(terms, metrics, n) for terms in self._decisions]
+        decision_index = np.select(decision_masks, np.arange(len(decision_masks)), default=len(decision_masks) - 1)
+
+        feedback_mask = np.empty((n, len(self._feedback)), dtype=bool)
+        for j, terms in enumerate(self._feedback):
+            feedback_mask[:, j] = self._evaluate_condition(terms, metrics, n)
+
+        return RuleEvaluation(self, ml_scores, acceptance_rates, adjustment_index, decision_index, feedback_mask)
+
+
+# Compiled default rule table
+rule_engine = RuleEngine.from_file()
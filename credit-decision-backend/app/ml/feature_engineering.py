@@ -0,0 +1,98 @@
+"""
+Feature Engineering - shared feature definitions for the credit model
+Training, online scoring and batch scoring all build their inputs here, so
+the model always sees features encoded the same way. Every function works
+column-wise on whole arrays.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Union
+
+# Column order used in training data and expected by the scaler/model
+FEATURE_ORDER = ['num_debts', 'total_debt_amount', 'monthly_emis', 'total_assets', 'monthly_income', 'city_tier']
+
+CITY_TIER_MAPPING = {'tier_1': 1, 'tier_2': 2, 'tier_3': 3}
+DEFAULT_CITY_TIER = 2
+
+# Derived ratios computed from the raw features
+DERIVED_FEATURES = ['total_debt', 'debt_to_income', 'emi_to_income', 'asset_to_debt']
+
+_TIERS = [float(t) for t in CITY_TIER_MAPPING.values()]
+_TIER_LOOKUP = {**{label: float(t) for label, t in CITY_TIER_MAPPING.items()}, **{t: float(t) for t in CITY_TIER_MAPPING.values()}}
+
+FeatureInput = Union[List[Dict], pd.DataFrame, np.ndarray]
+
+
+def encode_city_tier(values: Iterable) -> np.ndarray:
+    """
+    Encode city tiers as 1/2/3
+
+    Accepts the API labels ('tier_1'...) and the numeric tiers used in the
+    training data; anything else becomes DEFAULT_CITY_TIER.
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.number):
+        encoded = values.astype(np.float64)
+    else:
+        encoded = np.array([_TIER_LOOKUP.get(v, np.nan) for v in values.tolist()], dtype=np.float64)
+    return np.where(np.isin(encoded, _TIERS), encoded, float(DEFAULT_CITY_TIER))
+
+
+def build_feature_matrix(features: FeatureInput) -> np.ndarray:
+    """
+    Build the raw (N, 6) float64 matrix in FEATURE_ORDER
+
+    Args:
+        features: List of applicant dictionaries, a DataFrame with the
+            FEATURE_ORDER columns, or an array of shape (N, 6) already in
+            FEATURE_ORDER with city tier encoded as 1/2/3
+
+    Raises:
+        ValueError: if an array has the wrong shape or a DataFrame lacks a feature column
+    """
+    if isinstance(features, np.ndarray):
+        X = np.asarray(features, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != len(FEATURE_ORDER):
+            raise ValueError(f"Expected feature array of shape (N, {len(FEATURE_ORDER)}), got {features.shape}")
+        return X
+
+    if isinstance(features, pd.DataFrame):
+        missing = [name for name in FEATURE_ORDER if name not in features.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+        columns = {name: features[name].to_numpy() for name in FEATURE_ORDER}
+    else:
+        columns = {name: [row[name] for row in features] for name in FEATURE_ORDER}
+
+    X = np.empty((len(columns['city_tier']), len(FEATURE_ORDER)), dtype=np.float64)
+    for j, name in enumerate(FEATURE_ORDER[:-1]):
+        X[:, j] = columns[name]
+    X[:, -1] = encode_city_tier(columns['city_tier'])
+    return X
+
+
+def derived_features(X: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Compute the financial ratios used by the decision rules and feedback
+
+    Args:
+        X: Raw (unscaled) feature matrix in FEATURE_ORDER
+
+    Returns:
+        monthly_income (floored at 1 to avoid division by zero) plus
+        every DERIVED_FEATURES column, each an array of length N
+    """
+    monthly_income = np.maximum(X[:, 4], 1)
+    total_debt = np.maximum(X[:, 1], 0)
+    total_assets = X[:, 3]
+
+    return {
+        'monthly_income': monthly_income,
+        'total_debt': total_debt,
+        'debt_to_income': total_debt / (monthly_income * 12),
+        'emi_to_income': X[:, 2] / monthly_income,
+        'asset_to_debt': np.divide(total_assets, total_debt, out=np.zeros_like(total_assets), where=total_debt > 0),
+    }
@@ -0,0 +1,174 @@
+"""
+Inference Executor - runs model inference off the asyncio event loop
+Scoring (scaling, the neighbour query and the rule table) is CPU-bound, so
+it is dispatched to a thread or process pool. The number of requests waiting
+or running is bounded, and each request has a timeout.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List
+from app.ml.credit_score_model import CreditScoreModel, load_credit_model
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ('inline', 'thread', 'process')
+
+
+class InferenceOverloaded(Exception):
+    """Raised when too many inference requests are already queued"""
+
+
+class InferenceTimeout(Exception):
+    """Raised when an inference request does not finish in time"""
+
+
+def evaluate_results(model: CreditScoreModel, features: List[Dict], explain: bool = False) -> List[Dict]:
+    """Full result (score, rate, status and feedback, with neighbour explanations if asked) for every applicant"""
+    evaluation = model.evaluate_batch(features, explain=explain)
+    return [evaluation.result(i) for i in range(len(evaluation))]
+
+
+def evaluate_scores(model: CreditScoreModel, features: List[Dict]) -> List[Dict]:
+    """Score, rate and status for every applicant (no feedback)"""
+    evaluation = model.evaluate_batch(features)
+    return [
+        {"ml_score": score, "acceptance_rate": rate, "status": decision}
+        for score, rate, decision in zip(
+            evaluation.ml_scores.tolist(),
+            evaluation.acceptance_rates.tolist(),
+            evaluation.statuses.tolist()
+        )
+    ]
+
+
+# Process pool workers keep their own copy of the model, keyed by version
+_worker_models: Dict[str, CreditScoreModel] = {}
+
+
+def _init_worker(bundle_path: str, model_version: str):
+    """Preload the model when a worker process starts"""
+    _worker_model(bundle_path, model_version)
+
+
+def _worker_model(bundle_path: str, model_version: str) -> CreditScoreModel:
+    model = _worker_models.get(model_version)
+    if model is None:
+        model = load_credit_model(bundle_path=bundle_path, strict=True)
+        if model.model_version != model_version:
+            raise RuntimeError(f"Bundle {bundle_path} holds {model.model_version}, expected {model_version}")
+        # Only the active version is needed once a reload has reached this worker
+        _worker_models.clear()
+        _worker_models[model_version] = model
+    return model
+
+
+def _run_in_worker(task: Callable, bundle_path: str, model_version: str, features: List[Dict]):
+    return task(_worker_model(bundle_path, model_version), features)
+
+
+class InferenceExecutor:
+    def __init__(self, kind: str = 'thread', max_workers: int = 4, max_pending: int = 256,
+                 timeout: float = 10.0):
+        """
+        Args:
+            kind: 'thread', 'process' (model preloaded in every worker) or
+                'inline' (run on the event loop, the old behaviour)
+            max_workers: Pool size
+            max_pending: Requests allowed to wait or run at once; more are rejected
+            timeout: Seconds to wait for a result (0 waits forever)
+        """
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown inference executor '{kind}'. Expected one of {list(EXECUTOR_KINDS)}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._thread_pool: ThreadPoolExecutor = None
+        self._process_pool: ProcessPoolExecutor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _pool_for(self, model: CreditScoreModel) -> Executor:
+        # A process worker can only rebuild a model that was loaded from a bundle
+        if self.kind == 'process' and model.bundle is not None:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(model.bundle_path, model.model_version)
+                )
+            return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='inference')
+        return self._thread_pool
+
+    def _submit(self, task: Callable, model: CreditScoreModel, features: List[Dict]) -> Future:
+        pool = self._pool_for(model)
+        if isinstance(pool, ProcessPoolExecutor):
+            return pool.submit(_run_in_worker, task, model.bundle_path, model.model_version, features)
+        return pool.submit(task, model, features)
+
+    def _release(self, future: Future):
+        with self._lock:
+            self.pending -= 1
+            if not future.cancelled() and future.exception() is None:
+                self.completed += 1
+
+    async def run(self, task: Callable, model: CreditScoreModel, features: List[Dict]):
+        """
+        Run task(model, features) on the pool
+
+        Raises:
+            InferenceOverloaded: if max_pending requests are already in flight
+            InferenceTimeout: if the result is not ready within timeout seconds
+        """
+        if self.kind == 'inline':
+            return task(model, features)
+
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise InferenceOverloaded(f"{self.pending} inference requests already in flight")
+            self.pending += 1
+        try:
+            future = self._submit(task, model, features)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        # The slot is freed when the work really ends, not when the caller stops waiting
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout or None)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise InferenceTimeout(f"Inference did not finish within {self.timeout}s")
+
+    def shutdown(self):
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._thread_pool = None
+        self._process_pool = None
+
+    def get_stats(self) -> Dict:
+        return {
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'timeout_seconds': self.timeout,
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+        }
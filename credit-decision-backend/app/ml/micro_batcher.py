@@ -0,0 +1,166 @@
+"""
+Micro Batcher - coalesces concurrent single-applicant scoring requests
+Requests arriving within a short window are scored with one vectorized
+model call, and each caller's future is resolved with its own row. When
+the batch call fails, its requests are scored one by one, so a single bad
+applicant only fails its own request.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Tuple, Type
+import numpy as np
+from app.ml.credit_score_model import CreditScoreModel
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class MicroBatchOverloaded(Exception):
+    """Raised when the micro-batch queue is full"""
+
+
+class MicroBatcher:
+    def __init__(self, run_batch: Callable[[CreditScoreModel, List[Dict]], Awaitable[List]],
+                 window_ms: float = 2.0, max_batch_size: int = 64, max_queue: int = 1024,
+                 batch_errors: Tuple[Type[BaseException], ...] = ()):
+        """
+        Args:
+            run_batch: Scores a list of applicants with one model and returns
+                one result per applicant, in order
+            window_ms: How long the first request of a batch waits for company
+            max_batch_size: A batch is dispatched as soon as it reaches this size
+            max_queue: Requests allowed to wait for a batch; more are rejected
+            batch_errors: Errors about the call rather than its applicants
+                (back-pressure, timeouts); they fail the whole batch instead
+                of it being retried one request at a time
+        """
+        self.run_batch = run_batch
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.max_queue = max_queue
+        self.batch_errors = batch_errors
+        self._queue: asyncio.Queue = None
+        self._full: asyncio.Event = None
+        self._loop = None
+        self._collector: asyncio.Task = None
+        self._dispatches = set()
+        self.requests = 0
+        self.batches = 0
+        self.rejected = 0
+        self.split_batches = 0
+        self.size_histogram = [0] * len(BATCH_SIZE_BUCKETS)
+        self._delays_ms = deque(maxlen=10000)
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (e.g. tests): rebuild the loop-bound state
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._full = asyncio.Event()
+            self._collector = loop.create_task(self._collect())
+
+    async def submit(self, model: CreditScoreModel, features: Dict):
+        """
+        Queue one applicant and wait for its result
+
+        Raises:
+            MicroBatchOverloaded: if max_queue requests are already waiting
+            Exception: whatever run_batch raised for this request (scored alone
+                after its batch failed), or a batch_errors error for the batch
+        """
+        self._ensure_started()
+        if self._queue.qsize() >= self.max_queue:
+            self.rejected += 1
+            raise MicroBatchOverloaded(f"{self._queue.qsize()} scoring requests already queued")
+
+        future = self._loop.create_future()
+        self._queue.put_nowait((model, features, future, time.perf_counter()))
+        if self._queue.qsize() >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    async def _collect(self):
+        while True:
+            first = await self._queue.get()
+            if self._queue.qsize() + 1 < self.max_batch_size and self.window_ms > 0:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.window_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = [first]
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Dispatch without waiting so the next batch can start collecting
+            task = self._loop.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List):
+        dispatched = time.perf_counter()
+        self.batches += 1
+        self.requests += len(batch)
+        self.size_histogram[min(np.searchsorted(BATCH_SIZE_BUCKETS, len(batch)), len(BATCH_SIZE_BUCKETS) - 1)] += 1
+        self._delays_ms.extend((dispatched - enqueued) * 1000 for _, _, _, enqueued in batch)
+
+        # Requests that picked up different models (across a reload) are scored separately
+        groups: Dict[int, List] = {}
+        for item in batch:
+            groups.setdefault(id(item[0]), []).append(item)
+
+        for items in groups.values():
+            try:
+                results = await self.run_batch(items[0][0], [features for _, features, _, _ in items])
+            except Exception as e:
+                if len(items) == 1 or isinstance(e, self.batch_errors):
+                    for _, _, future, _ in items:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    await self._dispatch_singly(items)
+                continue
+            for (_, _, future, _), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def _dispatch_singly(self, items: List):
+        """Score a failed batch's requests one at a time, so only the bad ones fail"""
+        self.split_batches += 1
+        for model, features, future, _ in items:
+            if future.done():
+                continue
+            try:
+                result = (await self.run_batch(model, [features]))[0]
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self) -> Dict:
+        delays = np.fromiter(self._delays_ms, dtype=np.float64)
+        return {
+            'window_ms': self.window_ms,
+            'max_batch_size': self.max_batch_size,
+            'max_queue': self.max_queue,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'requests': self.requests,
+            'batches': self.batches,
+            'rejected': self.rejected,
+            'split_batches': self.split_batches,
+            'mean_batch_size': round(self.requests / self.batches, 2) if self.batches else 0.0,
+            'batch_size_histogram': {
+                f"<={bucket}": count for bucket, count in zip(BATCH_SIZE_BUCKETS, self.size_histogram)
+            },
+            'queue_delay_p50_ms': round(float(np.percentile(delays, 50)), 3) if len(delays) else 0.0,
+            'queue_delay_p99_ms': round(float(np.percentile(delays, 99)), 3) if len(delays) else 0.0,
+        }
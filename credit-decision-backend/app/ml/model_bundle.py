@@ -0,0 +1,430 @@
+"""
+Model Bundle - versioned, memory-mappable artifact format for the KNN credit model
+
+A bundle is a directory holding a manifest plus plain .npy arrays:
+
+    credit_model/
+        manifest.json       format/model version, feature order, classes,
+                            KNN parameters and a sha256 per array
+        reference.npy       scaled training matrix (float32, N x 6)
+        labels.npy          encoded class labels (N,)
+        scaler_mean.npy     StandardScaler mean_ (6,)
+        scaler_scale.npy    StandardScaler scale_ (6,)
+        segment_0001_*.npy  rows appended since the last compaction (format 2)
+
+The bundle path is a symlink to the current version, a hidden sibling
+directory (.credit_model.<id>). Publishing a version atomically repoints
+the link, so the path always resolves to a complete bundle; the previous
+version is kept for readers that resolved the link just before.
+
+Arrays are opened with np.load(mmap_mode='r'), so loading only reads the
+manifest and maps the files; it does not grow with the number of rows.
+Appended segments stay separate mapped files, presented together as one
+SegmentedRows view, until they are compacted back into single arrays (see
+app/ml/model_updater.py).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+import numpy as np
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence
+from app.ml.feature_engineering import FEATURE_ORDER
+
+BUNDLE_FORMAT_VERSION = 1
+# Format 2 adds appended row segments; bundles without segments stay format 1
+SEGMENTED_FORMAT_VERSION = 2
+MANIFEST_FILE = 'manifest.json'
+
+_ARRAYS = {
+    'reference': np.float32,
+    'labels': np.int64,
+    'scaler_mean': np.float64,
+    'scaler_scale': np.float64,
+}
+_SEGMENT_ARRAYS = ('reference', 'labels')
+
+
+class ModelBundleError(ValueError):
+    """Raised when a bundle is missing, corrupt or incompatible with the scoring code"""
+
+
+class SegmentedRows:
+    """
+    Read-only view of arrays stacked row-wise, each left as it is (memory-mapped)
+
+    Supports what scoring needs: len/shape/dtype, row slices and integer
+    (array) row indexing, which only read the rows asked for. np.asarray
+    gives one in-memory array for code that needs it (index builds,
+    compaction).
+    """
+
+    def __init__(self, parts: Sequence[np.ndarray]):
+        self.parts = list(parts)
+        self.offsets = np.cumsum([0] + [len(part) for part in self.parts])
+        self.dtype = self.parts[0].dtype
+        self.ndim = self.parts[0].ndim
+        self.shape = (int(self.offsets[-1]),) + self.parts[0].shape[1:]
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = np.concatenate(self.parts)
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return self[np.arange(start, stop, step)]
+            pieces = [
+                part[max(start - offset, 0):max(stop - offset, 0)]
+                for part, offset in zip(self.parts, self.offsets)
+                if start < offset + len(part) and stop > offset
+            ]
+            if len(pieces) == 1:
+                return pieces[0]
+            return np.concatenate(pieces) if pieces else self.parts[0][:0]
+        if isinstance(key, tuple):
+            raise TypeError("SegmentedRows supports row indexing only")
+
+        indices = np.asarray(key)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        flat = indices.astype(np.int64).ravel()
+        flat[flat < 0] += len(self)
+        if flat.size and (flat.min() < 0 or flat.max() >= len(self)):
+            raise IndexError(f"Row index out of range for {len(self)} rows")
+        part_of = np.searchsorted(self.offsets, flat, side='right') - 1
+        rows = np.empty((len(flat),) + self.shape[1:], dtype=self.dtype)
+        for p in np.unique(part_of):
+            mask = part_of == p
+            rows[mask] = self.parts[p][flat[mask] - self.offsets[p]]
+        return rows.reshape(indices.shape + self.shape[1:])
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_array(directory: str, file_name: str, array: np.ndarray, dtype) -> Dict:
+    """Save one array and return its manifest entry"""
+    array = np.ascontiguousarray(array, dtype=dtype)
+    np.save(os.path.join(directory, file_name), array)
+    return {
+        'file': file_name,
+        'dtype': np.dtype(dtype).name,
+        'shape': list(array.shape),
+        'sha256': _sha256(os.path.join(directory, file_name)),
+    }
+
+
+def _load_array(directory: str, name: str, entry: Dict, mmap_mode: str, verify: bool) -> np.ndarray:
+    file_path = os.path.join(directory, entry['file'])
+    if verify and _sha256(file_path) != entry['sha256']:
+        raise ModelBundleError(f"Checksum mismatch for {file_path}")
+    try:
+        array = np.load(file_path, mmap_mode=mmap_mode, allow_pickle=False)
+    except (OSError, ValueError) as e:
+        raise ModelBundleError(f"Cannot load {file_path}: {e}")
+    if array.dtype != _ARRAYS[name] or list(array.shape) != entry['shape']:
+        raise ModelBundleError(f"Array '{name}' does not match its manifest entry")
+    return array
+
+
+def _version_prefix(path: str) -> str:
+    return f'.{os.path.basename(os.path.abspath(path))}.'
+
+
+def _new_version_dir(path: str) -> str:
+    parent = os.path.dirname(os.path.abspath(path))
+    return os.path.join(parent, f'{_version_prefix(path)}{uuid.uuid4().hex[:12]}')
+
+
+def _publish(staging: str, path: str):
+    """
+    Make a fully written staging directory the bundle at path
+
+    The staging directory becomes a version directory and path, a symlink,
+    is repointed at it with os.replace, so readers never find path missing
+    or half written. A bundle saved as a plain directory (before bundles
+    were versioned) is first moved into a version directory of its own;
+    only that one-time move leaves path briefly missing. Versions other
+    than the new and the previous one are removed.
+    """
+    path = os.path.abspath(path)
+    if os.path.isdir(path) and not os.path.islink(path):
+        os.replace(path, _new_version_dir(path))
+    previous = os.path.basename(os.readlink(path)) if os.path.islink(path) else None
+
+    version = _new_version_dir(path)
+    os.replace(staging, version)
+    link = f'{version}.link'
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, path)
+
+    parent, prefix = os.path.dirname(path), _version_prefix(path)
+    keep = {os.path.basename(version), previous, os.path.basename(os.readlink(path))}
+    for name in os.listdir(parent):
+        if name.startswith(prefix) and name not in keep and not name.endswith('.link'):
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+
+def is_bundle(path: str) -> bool:
+    """True if path is a bundle directory"""
+    return bool(path) and os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+class ModelBundle:
+    """A loaded bundle: manifest metadata plus (memory-mapped) arrays"""
+
+    def __init__(self, path: str, manifest: Dict, arrays: Dict[str, np.ndarray]):
+        self.path = path
+        self.manifest = manifest
+        self.reference = arrays['reference']
+        self.labels = arrays['labels']
+        self.scaler_mean = arrays['scaler_mean']
+        self.scaler_scale = arrays['scaler_scale']
+        self.segments = len(manifest.get('segments', []))
+
+    @property
+    def version(self) -> str:
+        return self.manifest['model_version']
+
+    @property
+    def classes(self) -> List[str]:
+        return self.manifest['classes']
+
+    @property
+    def params(self) -> Dict:
+        return self.manifest['params']
+
+    @property
+    def updates(self) -> Dict:
+        """Incremental update state (running scaler statistics, outcome watermark)"""
+        return self.manifest.get('updates', {})
+
+    def __len__(self) -> int:
+        return self.manifest['n_samples']
+
+
+def save_bundle(path: str, reference: np.ndarray, labels: np.ndarray, scaler_mean: np.ndarray,
+                scaler_scale: np.ndarray, classes: List[str], n_neighbors: int, weights: str = 'uniform',
+                metrics: Dict = None, model_version: str = None, updates: Dict = None) -> ModelBundle:
+    """
+    Write a bundle directory (replacing any bundle already at path)
+
+    Args:
+        path: Bundle directory
+        reference: Scaled training matrix in FEATURE_ORDER
+        labels: Encoded class labels (indices into classes)
+        scaler_mean: Fitted StandardScaler mean_
+        scaler_scale: Fitted StandardScaler scale_
+        classes: Class names, in label-encoder order
+        n_neighbors: KNN k
+        weights: KNN vote weighting ('uniform' or 'distance')
+        metrics: Optional evaluation metrics to record
+        model_version: Version string (derived from the array checksums if omitted)
+        updates: Optional incremental update state to carry over
+
+    Returns:
+        The written bundle, loaded back from disk
+    """
+    arrays = {
+        'reference': reference,
+        'labels': labels,
+        'scaler_mean': scaler_mean,
+        'scaler_scale': scaler_scale,
+    }
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+
+    # Write into a temporary sibling directory and swap it in at the end
+    staging = tempfile.mkdtemp(prefix='.bundle-', dir=parent)
+    try:
+        os.chmod(staging, 0o755)
+        entries = {name: _write_array(staging, f'{name}.npy', arrays[name], dtype) for name, dtype in _ARRAYS.items()}
+
+        created_at = datetime.now(timezone.utc)
+        params = {'n_neighbors': int(n_neighbors), 'weights': weights, 'metric': 'euclidean'}
+        # Models trained on the same arrays with different KNN settings get different versions
+        content_hash = hashlib.sha256(
+            (''.join(e['sha256'] for e in entries.values()) + json.dumps(params, sort_keys=True)).encode()
+        ).hexdigest()
+        manifest = {
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'model_version': model_version or f"{created_at:%Y%m%d%H%M%S}-{content_hash[:8]}",
+            'created_at': created_at.isoformat(),
+            'model_type': 'knn',
+            'features': list(FEATURE_ORDER),
+            'classes': [str(c) for c in classes],
+            'params': params,
+            'n_samples': int(entries['reference']['shape'][0]),
+            'arrays': entries,
+            'metrics': metrics or {},
+        }
+        if updates:
+            manifest['updates'] = updates
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        _publish(staging, path)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    return load_bundle(path)
+
+
+def append_bundle(path: str, reference: np.ndarray, labels: np.ndarray, updates: Dict = None) -> ModelBundle:
+    """
+    Publish a new bundle version with extra rows appended as a segment
+
+    Existing array files are hard-linked into the new version (copied if the
+    filesystem cannot link), so the cost is proportional to the new rows.
+
+    Args:
+        path: Existing bundle directory
+        reference: New rows, scaled with the bundle's scaler
+        labels: Encoded class labels of the new rows
+        updates: Incremental update state to record (replaces the previous one)
+
+    Returns:
+        The new bundle version, loaded back from disk
+    """
+    # Link from the version the manifest was read from, even if path is repointed meanwhile
+    source = os.path.realpath(path)
+    current = load_bundle(source)
+    manifest = json.loads(json.dumps(current.manifest))
+    segments = manifest.setdefault('segments', [])
+    existing = [e['file'] for e in manifest['arrays'].values()]
+    existing += [e['file'] for segment in segments for e in segment['arrays'].values()]
+
+    staging = tempfile.mkdtemp(prefix='.bundle-', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        os.chmod(staging, 0o755)
+        for file_name in existing:
+            try:
+                os.link(os.path.join(source, file_name), os.path.join(staging, file_name))
+            except OSError:
+                shutil.copy2(os.path.join(source, file_name), os.path.join(staging, file_name))
+
+        prefix = f'segment_{len(segments) + 1:04d}'
+        entries = {
+            'reference': _write_array(staging, f'{prefix}_reference.npy', reference, _ARRAYS['reference']),
+            'labels': _write_array(staging, f'{prefix}_labels.npy', labels, _ARRAYS['labels']),
+        }
+        if entries['reference']['shape'][1:] != [len(FEATURE_ORDER)] \
+                or entries['labels']['shape'] != entries['reference']['shape'][:1]:
+            raise ModelBundleError(f"Appended rows must be (N, {len(FEATURE_ORDER)}) with N labels")
+
+        created_at = datetime.now(timezone.utc)
+        content_hash = hashlib.sha256(
+            (current.version + ''.join(e['sha256'] for e in entries.values())).encode()
+        ).hexdigest()
+        n_rows = entries['reference']['shape'][0]
+        segments.append({'rows': n_rows, 'created_at': created_at.isoformat(), 'arrays': entries})
+        manifest.update({
+            'format_version': SEGMENTED_FORMAT_VERSION,
+            'model_version': f"{created_at:%Y%m%d%H%M%S}-{content_hash[:8]}",
+            'parent_version': current.version,
+            'created_at': created_at.isoformat(),
+            'n_samples': len(current) + n_rows,
+        })
+        if updates is not None:
+            manifest['updates'] = updates
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        _publish(staging, path)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    return load_bundle(path)
+
+
+def load_bundle(path: str, mmap_mode: str = 'r', verify: bool = False) -> ModelBundle:
+    """
+    Load a bundle, memory-mapping its arrays
+
+    Args:
+        path: Bundle directory (or the symlink to its current version)
+        mmap_mode: np.load mmap mode (None reads the arrays into memory)
+        verify: Check every array against its sha256 (reads the whole files)
+
+    Raises:
+        ModelBundleError: if the bundle is missing, corrupt, or its feature
+            schema does not match FEATURE_ORDER
+    """
+    # Resolved once per attempt, so the manifest and arrays come from the same version
+    directory = os.path.realpath(path)
+    while True:
+        try:
+            return _read_bundle(path, directory, mmap_mode, verify)
+        except ModelBundleError:
+            # Publishes pruned the version while it was read: read the current one instead
+            latest = os.path.realpath(path)
+            if latest == directory:
+                raise
+            directory = latest
+
+
+def _read_bundle(path: str, directory: str, mmap_mode: str, verify: bool) -> ModelBundle:
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ModelBundleError(f"Cannot read bundle manifest {manifest_path}: {e}")
+
+    if manifest.get('format_version') not in (BUNDLE_FORMAT_VERSION, SEGMENTED_FORMAT_VERSION):
+        raise ModelBundleError(
+            f"Unsupported bundle format {manifest.get('format_version')} "
+            f"(expected {BUNDLE_FORMAT_VERSION} or {SEGMENTED_FORMAT_VERSION})"
+        )
+    if manifest.get('features') != FEATURE_ORDER:
+        raise ModelBundleError(
+            f"Bundle feature schema {manifest.get('features')} does not match expected order {FEATURE_ORDER}"
+        )
+    if manifest.get('params', {}).get('metric') != 'euclidean':
+        raise ModelBundleError(f"Unsupported distance metric {manifest.get('params', {}).get('metric')}")
+
+    arrays = {}
+    for name in _ARRAYS:
+        entry = manifest['arrays'].get(name)
+        if entry is None:
+            raise ModelBundleError(f"Bundle is missing array '{name}'")
+        arrays[name] = _load_array(directory, name, entry, mmap_mode, verify)
+
+    n_features = len(FEATURE_ORDER)
+    segments = manifest.get('segments', [])
+    if segments:
+        for name in _SEGMENT_ARRAYS:
+            parts = [arrays[name]]
+            for segment in segments:
+                entry = segment['arrays'].get(name)
+                if entry is None:
+                    raise ModelBundleError(f"Bundle segment is missing array '{name}'")
+                parts.append(_load_array(directory, name, entry, mmap_mode, verify))
+            if any(part.shape[1:] != parts[0].shape[1:] for part in parts):
+                raise ModelBundleError(f"Bundle segments of '{name}' differ in shape")
+            # Kept as separate mapped parts: loading stays independent of the row count
+            arrays[name] = SegmentedRows(parts)
+
+    if arrays['reference'].ndim != 2 or arrays['reference'].shape[1] != n_features \
+            or arrays['scaler_mean'].shape != (n_features,) or arrays['scaler_scale'].shape != (n_features,):
+        raise ModelBundleError(f"Bundle arrays do not have {n_features} features")
+    if len(arrays['labels']) != len(arrays['reference']):
+        raise ModelBundleError("Bundle labels and reference matrix differ in length")
+    if len(arrays['reference']) != manifest.get('n_samples'):
+        raise ModelBundleError("Bundle row count does not match its manifest")
+
+    return ModelBundle(path, manifest, arrays)
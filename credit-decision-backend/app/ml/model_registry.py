@@ -0,0 +1,140 @@
+"""
+Model Registry - holds the active credit model and swaps in retrained ones
+New models are loaded and warmed up off the request path, then published
+with a single reference assignment. Requests that already picked up the
+previous model finish on it.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional
+from app.ml.credit_score_model import CreditScoreModel, credit_model, load_credit_model
+from app.ml.model_bundle import MANIFEST_FILE, load_bundle
+
+logger = logging.getLogger(__name__)
+
+# Representative applicants used to warm up a freshly loaded model
+WARMUP_APPLICANTS = [
+    {'num_debts': 0, 'total_debt_amount': 0, 'monthly_emis': 0,
+     'total_assets': 300000, 'monthly_income': 80000, 'city_tier': 'tier_1'},
+    {'num_debts': 2, 'total_debt_amount': 50000, 'monthly_emis': 5000,
+     'total_assets': 200000, 'monthly_income': 50000, 'city_tier': 'tier_2'},
+    {'num_debts': 5, 'total_debt_amount': 150000, 'monthly_emis': 15000,
+     'total_assets': 100000, 'monthly_income': 30000, 'city_tier': 'tier_3'},
+]
+
+
+class ModelRegistry:
+    def __init__(self, model: CreditScoreModel, loader: Callable[..., CreditScoreModel] = load_credit_model):
+        """
+        Args:
+            model: Initially active model
+            loader: Builds a model from a bundle path (must raise on failure)
+        """
+        self._model = model
+        self._loader = loader
+        self._lock = asyncio.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+        self._swap_listeners: List[Callable[[CreditScoreModel, CreditScoreModel], None]] = []
+        self.last_reload: Dict = {}
+
+    @property
+    def current(self) -> CreditScoreModel:
+        """The active model; callers should read this once per request"""
+        return self._model
+
+    @property
+    def version(self) -> str:
+        return self._model.model_version
+
+    def add_swap_listener(self, listener: Callable[[CreditScoreModel, CreditScoreModel], None]):
+        """Call listener(old_model, new_model) after every swap"""
+        self._swap_listeners.append(listener)
+
+    def _load_and_warm(self, bundle_path: str) -> Dict:
+        """Blocking part of a reload: verify, load and warm up a model"""
+        start = time.perf_counter()
+        load_bundle(bundle_path, verify=True)
+        model = self._loader(bundle_path=bundle_path, strict=True)
+        loaded = time.perf_counter()
+
+        model.evaluate_batch(WARMUP_APPLICANTS)
+        for applicant in WARMUP_APPLICANTS:
+            model.evaluate_batch([applicant])
+        warmed = time.perf_counter()
+
+        return {
+            'model': model,
+            'load_ms': round((loaded - start) * 1000, 2),
+            'warmup_ms': round((warmed - loaded) * 1000, 2),
+        }
+
+    async def reload(self, bundle_path: str = None) -> Dict:
+        """
+        Load the bundle at bundle_path (default: the active model's bundle) and swap it in
+
+        Raises:
+            Exception: whatever the load raised; the active model is left untouched
+        """
+        bundle_path = bundle_path or self._model.bundle_path
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, self._load_and_warm, bundle_path)
+
+            previous, model = self._model, result['model']
+            self._model = model
+            for listener in self._swap_listeners:
+                listener(previous, model)
+
+            self.last_reload = {
+                'previous_version': previous.model_version,
+                'model_version': model.model_version,
+                'bundle_path': bundle_path,
+                'load_ms': result['load_ms'],
+                'warmup_ms': result['warmup_ms'],
+                'reloaded_at': time.time(),
+            }
+            logger.info(f"Swapped credit model {previous.model_version} -> {model.model_version}")
+            return self.last_reload
+
+    def _bundle_version_on_disk(self, bundle_path: str) -> Optional[str]:
+        try:
+            with open(os.path.join(bundle_path, MANIFEST_FILE)) as f:
+                return json.load(f).get('model_version')
+        except (OSError, ValueError):
+            return None
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            bundle_path = self._model.bundle_path
+            version = self._bundle_version_on_disk(bundle_path)
+            if version and version != self._model.model_version:
+                try:
+                    await self.reload(bundle_path)
+                except Exception as e:
+                    logger.error(f"Model reload of {bundle_path} ({version}) failed: {str(e)}")
+
+    def start_watching(self, interval: float):
+        """Poll the bundle manifest and reload when its model_version changes"""
+        if interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.get_running_loop().create_task(self._watch(interval))
+
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    def get_model_info(self) -> Dict:
+        """Active model info plus the outcome of the last reload"""
+        return {**self._model.get_model_info(), 'last_reload': self.last_reload or None}
+
+
+model_registry = ModelRegistry(credit_model)
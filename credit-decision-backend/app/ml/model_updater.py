@@ -0,0 +1,212 @@
+"""
+Model Updater - incremental updates of the KNN credit model from decided loans
+KNN has no fitted weights beyond its scaler, so learning from new outcomes
+means adding rows to the reference set. Appending scales the new rows with
+the serving scaler and writes them as a bundle segment (cost proportional to
+the new rows) while running scaler statistics track the full data set.
+
+Compaction folds the segments back into single arrays, rescales the whole
+reference set once the running statistics have drifted from the serving
+scaler, and prebuilds the persisted neighbour index for the new version.
+"""
+
+import logging
+import os
+import numpy as np
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence, Tuple
+from app.ml.feature_engineering import FEATURE_ORDER, FeatureInput, build_feature_matrix
+from app.ml.model_bundle import ModelBundle, append_bundle, load_bundle, save_bundle
+from app.ml.neighbor_index import INDEX_TYPES, build_index
+
+logger = logging.getLogger(__name__)
+
+# Loan decisions used as training labels, mapped to the model's class names
+DECIDED_STATUS_LABELS = {'approved': 'True', 'rejected': 'False'}
+
+# Largest running-vs-serving shift (in serving standard deviations) compaction tolerates without rescaling
+DEFAULT_RESCALE_DRIFT = 0.05
+
+
+class RunningScaler:
+    """Count, mean and variance per feature, updated in batches (Chan et al.)"""
+
+    def __init__(self, n_samples: int, mean: np.ndarray, var: np.ndarray):
+        self.n_samples = int(n_samples)
+        self.mean = np.asarray(mean, dtype=np.float64).copy()
+        self.var = np.asarray(var, dtype=np.float64).copy()
+
+    @classmethod
+    def from_bundle(cls, bundle: ModelBundle) -> 'RunningScaler':
+        """Running statistics recorded in the bundle, or its serving scaler on the first update"""
+        state = bundle.updates.get('running_scaler')
+        if state:
+            return cls(state['n_samples'], state['mean'], state['var'])
+        # The serving scaler was fitted on the (unappended) reference rows
+        return cls(len(bundle), bundle.scaler_mean, np.asarray(bundle.scaler_scale, dtype=np.float64) ** 2)
+
+    def update(self, X: np.ndarray) -> 'RunningScaler':
+        """Fold a raw feature matrix into the statistics"""
+        n_new = len(X)
+        if n_new == 0:
+            return self
+        mean_new = X.mean(axis=0)
+        m2_new = ((X - mean_new) ** 2).sum(axis=0)
+        total = self.n_samples + n_new
+        delta = mean_new - self.mean
+        m2 = self.var * self.n_samples + m2_new + delta ** 2 * self.n_samples * n_new / total
+        self.mean = self.mean + delta * n_new / total
+        self.var = m2 / total
+        self.n_samples = total
+        return self
+
+    @property
+    def scale(self) -> np.ndarray:
+        """Standard deviation, with constant features scaled by 1 as StandardScaler does"""
+        scale = np.sqrt(self.var)
+        return np.where(scale < 10 * np.finfo(np.float64).eps, 1.0, scale)
+
+    def drift(self, mean: np.ndarray, scale: np.ndarray) -> float:
+        """Largest shift of mean or scale from a serving scaler, in its standard deviations"""
+        return float(max(np.max(np.abs(self.mean - mean) / scale), np.max(np.abs(self.scale / scale - 1))))
+
+    def to_dict(self) -> Dict:
+        return {'n_samples': self.n_samples, 'mean': self.mean.tolist(), 'var': self.var.tolist()}
+
+
+def decided_outcomes(loans: List[Dict]) -> Tuple[np.ndarray, List[str], str]:
+    """
+    Turn decided loan applications into labelled feature rows
+
+    Args:
+        loans: loan_applications rows (feature columns, status, created_at)
+
+    Returns:
+        (raw feature matrix, class labels, latest created_at) for the loans
+        whose status is in DECIDED_STATUS_LABELS
+    """
+    decided = [loan for loan in loans if loan.get('status') in DECIDED_STATUS_LABELS]
+    if not decided:
+        return np.empty((0, len(FEATURE_ORDER))), [], None
+    labels = [DECIDED_STATUS_LABELS[loan['status']] for loan in decided]
+    timestamps = [str(loan['created_at']) for loan in decided if loan.get('created_at')]
+    return build_feature_matrix(decided), labels, max(timestamps) if timestamps else None
+
+
+def append_outcomes(bundle_path: str, features: FeatureInput, labels: Sequence[str],
+                    watermark: str = None, watermark_id: str = None) -> ModelBundle:
+    """
+    Append labelled rows to a bundle and publish a new model version
+
+    Args:
+        bundle_path: Model bundle directory
+        features: Raw applicant features (see build_feature_matrix)
+        labels: Class name per row (must be one of the bundle's classes)
+        watermark: Latest outcome timestamp included, recorded so the next
+            run only fetches newer outcomes
+        watermark_id: Id of the last outcome at that timestamp, so the next
+            run resumes after it rather than skipping loans sharing the timestamp
+
+    Returns:
+        The new bundle version (or the current one if there was nothing to add)
+
+    Raises:
+        ValueError: if a label is not one of the model's classes
+    """
+    bundle = load_bundle(bundle_path)
+    X = build_feature_matrix(features)
+    if len(X) != len(labels):
+        raise ValueError(f"Got {len(X)} feature rows but {len(labels)} labels")
+    if len(X) == 0:
+        return bundle
+
+    class_index = {name: i for i, name in enumerate(bundle.classes)}
+    unknown = sorted({str(label) for label in labels} - set(class_index))
+    if unknown:
+        raise ValueError(f"Unknown labels {unknown}; model classes are {bundle.classes}")
+    y = np.array([class_index[str(label)] for label in labels], dtype=np.int64)
+
+    mean = np.asarray(bundle.scaler_mean, dtype=np.float64)
+    scale = np.asarray(bundle.scaler_scale, dtype=np.float64)
+    running = RunningScaler.from_bundle(bundle).update(X)
+    drift = running.drift(mean, scale)
+
+    updates = dict(bundle.updates)
+    updates.update({
+        'running_scaler': running.to_dict(),
+        'scaler_drift': round(drift, 6),
+        'appended_rows': updates.get('appended_rows', 0) + len(X),
+        'last_outcome_at': watermark or updates.get('last_outcome_at'),
+        'last_outcome_id': watermark_id if watermark else updates.get('last_outcome_id'),
+    })
+    new_bundle = append_bundle(bundle_path, (X - mean) / scale, y, updates=updates)
+    logger.info("Appended %d rows to %s -> %s (%d segments, scaler drift %.4f)",
+                len(X), bundle.version, new_bundle.version, new_bundle.segments, drift)
+    if drift > DEFAULT_RESCALE_DRIFT:
+        logger.warning("Scaler drift %.4f exceeds %.2f; run compaction to rescale the reference set",
+                       drift, DEFAULT_RESCALE_DRIFT)
+    return new_bundle
+
+
+def compact_bundle(bundle_path: str, rescale: str = 'auto', drift_threshold: float = DEFAULT_RESCALE_DRIFT,
+                   index_type: str = None, index_dir: str = None) -> ModelBundle:
+    """
+    Fold appended segments into single arrays and publish a new model version
+
+    Args:
+        bundle_path: Model bundle directory
+        rescale: 'auto' refits the scaler from the running statistics when
+            they drifted past drift_threshold, 'always' or 'never'
+        drift_threshold: See DEFAULT_RESCALE_DRIFT
+        index_type: Neighbour index to prebuild for the new version
+            (brute, kd_tree, ball_tree or ivf; None skips it)
+        index_dir: Root directory of persisted indexes (NEIGHBOR_INDEX_DIR)
+
+    Returns:
+        The compacted bundle
+    """
+    if rescale not in ('auto', 'always', 'never'):
+        raise ValueError(f"rescale must be 'auto', 'always' or 'never', got '{rescale}'")
+    bundle = load_bundle(bundle_path)
+    mean = np.asarray(bundle.scaler_mean, dtype=np.float64)
+    scale = np.asarray(bundle.scaler_scale, dtype=np.float64)
+    running = RunningScaler.from_bundle(bundle)
+    drift = running.drift(mean, scale)
+    reference = np.asarray(bundle.reference, dtype=np.float64)
+
+    rescaled = rescale == 'always' or (rescale == 'auto' and drift > drift_threshold)
+    if rescaled:
+        # (raw - new_mean) / new_scale, applied to rows stored as (raw - mean) / scale
+        new_mean, new_scale = running.mean, running.scale
+        reference = reference * (scale / new_scale) + (mean - new_mean) / new_scale
+        mean, scale = new_mean, new_scale
+
+    updates = dict(bundle.updates)
+    updates.update({
+        'running_scaler': running.to_dict(),
+        'scaler_drift': 0.0 if rescaled else round(drift, 6),
+        'compacted_at': datetime.now(timezone.utc).isoformat(),
+    })
+    if rescaled:
+        updates['rescaled_at'] = updates['compacted_at']
+    new_bundle = save_bundle(
+        bundle_path,
+        reference=reference,
+        labels=bundle.labels,
+        scaler_mean=mean,
+        scaler_scale=scale,
+        classes=bundle.classes,
+        n_neighbors=bundle.params['n_neighbors'],
+        weights=bundle.params['weights'],
+        metrics=bundle.manifest.get('metrics'),
+        updates=updates,
+    )
+    logger.info("Compacted %s (%d segments) -> %s, %d rows%s", bundle.version, bundle.segments,
+                new_bundle.version, len(new_bundle), ', rescaled' if rescaled else '')
+
+    if index_type and index_dir:
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown neighbour index '{index_type}'. Available: {', '.join(INDEX_TYPES)}")
+        # Same per-version layout CreditScoreModel looks for, so the reload reuses it
+        build_index(index_type, new_bundle.reference).save(os.path.join(index_dir, new_bundle.version))
+    return new_bundle
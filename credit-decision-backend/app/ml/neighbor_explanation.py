@@ -0,0 +1,81 @@
+"""
+Neighbour Explanation - why the KNN model scored an applicant the way it did
+Built from the same kneighbors result that produced the score, so an
+explanation never costs a second neighbour query. For every applicant it
+keeps the neighbours' distances, reference-row indices, outcomes and vote
+weights, plus per-feature contributions:
+
+    distance_share  share of the squared (scaled) distance to the neighbours
+                    that each feature accounts for; high means the applicant
+                    differs from their closest historical matches on it
+    approved_gap    mean raw value of the approved neighbours minus the
+                    applicant's value (None when no neighbour was approved)
+"""
+
+import numpy as np
+from typing import Dict, List
+from app.ml.feature_engineering import FEATURE_ORDER
+
+# Class index of the approved outcome (the ML score is its probability)
+APPROVED_CLASS = 1
+
+
+class NeighborExplanation:
+    def __init__(self, X_scaled: np.ndarray, distances: np.ndarray, indices: np.ndarray,
+                 neighbor_labels: np.ndarray, vote_weights: np.ndarray, reference: np.ndarray,
+                 mean: np.ndarray, scale: np.ndarray, classes: List[str]):
+        """
+        Args:
+            X_scaled: (N, 6) scaled applicants
+            distances: (N, k) neighbour distances, ascending
+            indices: (N, k) neighbour rows in the reference set
+            neighbor_labels: (N, k) encoded neighbour outcomes
+            vote_weights: (N, k) weight of each neighbour in the vote
+            reference: Scaled reference matrix the indices point into
+            mean: Scaler mean (to report gaps in raw units)
+            scale: Scaler standard deviation
+            classes: Class names, in label-encoder order
+        """
+        self.distances = distances
+        self.indices = indices
+        self.neighbor_labels = neighbor_labels
+        self.vote_weights = vote_weights
+        self.classes = classes
+
+        neighbors = np.asarray(reference[indices.ravel()], dtype=np.float64).reshape(indices.shape + (X_scaled.shape[1],))
+        diff = neighbors - X_scaled[:, None, :]
+        squared = (diff ** 2).sum(axis=1)
+        total = squared.sum(axis=1, keepdims=True)
+        self.distance_share = np.divide(squared, total, out=np.zeros_like(squared), where=total > 0)
+
+        approved = neighbor_labels == APPROVED_CLASS
+        n_approved = approved.sum(axis=1)
+        # Mean scaled gap to the approved neighbours, converted back to raw units
+        gap = (diff * approved[:, :, None]).sum(axis=1) / np.maximum(n_approved, 1)[:, None]
+        self.approved_gap = np.where(n_approved[:, None] > 0, gap * scale, np.nan)
+        self.approved_share = (vote_weights * approved).sum(axis=1) / np.maximum(vote_weights.sum(axis=1), 1e-12)
+
+    def __len__(self) -> int:
+        return len(self.distances)
+
+    def explain(self, i: int) -> Dict:
+        """JSON-ready explanation for applicant i"""
+        gap = self.approved_gap[i]
+        return {
+            'k': int(self.distances.shape[1]),
+            'approved_vote_share': round(float(self.approved_share[i]), 4),
+            'nearest': [
+                {
+                    'distance': round(float(d), 4),
+                    'outcome': self.classes[int(label)],
+                    'weight': round(float(w), 4),
+                }
+                for d, label, w in zip(self.distances[i], self.neighbor_labels[i], self.vote_weights[i])
+            ],
+            'distance_share': {
+                name: round(float(share), 4) for name, share in zip(FEATURE_ORDER, self.distance_share[i])
+            },
+            'approved_gap': None if np.isnan(gap).all() else {
+                name: round(float(value), 2) + 0.0 for name, value in zip(FEATURE_ORDER, gap)
+            },
+        }
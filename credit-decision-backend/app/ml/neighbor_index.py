@@ -0,0 +1,303 @@
+"""
+Neighbour Index - pluggable nearest-neighbour search for the KNN credit model
+The reference set is kept as a float32 matrix that can be memory-mapped
+from disk, so it can grow to millions of historical loan outcomes
+
+Available indexes:
+    - brute: exact, chunked scan over the reference matrix
+    - kd_tree / ball_tree: exact, tree-based (sklearn KDTree / BallTree)
+    - ivf: approximate inverted-file index; n_probe trades recall for speed
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+import numpy as np
+from sklearn.neighbors import KDTree, BallTree
+from typing import Dict, Tuple
+from app.ml.model_bundle import SegmentedRows
+
+# Rows of reference data processed per distance block (bounds temporary memory)
+_BLOCK_ELEMENTS = 1 << 22
+
+INDEX_MANIFEST = 'index.json'
+
+
+def _squared_distances(queries: np.ndarray, block: np.ndarray) -> np.ndarray:
+    """Squared euclidean distances between every query and every block row (float64)"""
+    block = np.asarray(block, dtype=np.float64)
+    d = (queries * queries).sum(axis=1)[:, None] - 2.0 * queries @ block.T + (block * block).sum(axis=1)[None, :]
+    return np.maximum(d, 0.0, out=d)
+
+
+def _top_k(distances: np.ndarray, indices: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the k smallest distances per row, sorted ascending"""
+    if distances.shape[1] > k:
+        part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        distances = np.take_along_axis(distances, part, axis=1)
+        indices = np.take_along_axis(indices, part, axis=1)
+    order = np.argsort(distances, axis=1, kind='stable')
+    return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+
+def vote_weights(distances: np.ndarray, weights: str = 'uniform') -> np.ndarray:
+    """(N, k) weight of each neighbour in the vote ('uniform' or 'distance', as in sklearn)"""
+    if weights == 'distance':
+        with np.errstate(divide='ignore'):
+            w = 1.0 / distances
+        # Exact matches take all the weight, as in sklearn
+        exact = np.isinf(w)
+        rows = exact.any(axis=1)
+        w[rows] = exact[rows].astype(np.float64)
+        return w
+    return np.ones_like(distances, dtype=np.float64)
+
+
+def neighbor_vote(neighbor_labels: np.ndarray, distances: np.ndarray, n_classes: int,
+                  weights: str = 'uniform') -> np.ndarray:
+    """
+    Class probabilities from neighbour labels, matching KNeighborsClassifier
+
+    Args:
+        neighbor_labels: (N, k) encoded class labels of the neighbours
+        distances: (N, k) neighbour distances
+        n_classes: Number of classes
+        weights: 'uniform' or 'distance'
+
+    Returns:
+        (N, n_classes) probability matrix
+    """
+    w = vote_weights(distances, weights)
+    proba = np.zeros((neighbor_labels.shape[0], n_classes), dtype=np.float64)
+    for c in range(n_classes):
+        proba[:, c] = (w * (neighbor_labels == c)).sum(axis=1)
+    normalizer = proba.sum(axis=1, keepdims=True)
+    normalizer[normalizer == 0.0] = 1.0
+    return proba / normalizer
+
+
+class NeighborIndex(ABC):
+    """Base class: holds the float32 reference matrix and answers k-NN queries"""
+
+    kind = None
+
+    def __init__(self, reference: np.ndarray):
+        if isinstance(reference, (np.memmap, SegmentedRows)) and reference.dtype == np.float32:
+            # Left on disk: queries read it block by block
+            self.reference = reference
+        else:
+            self.reference = np.ascontiguousarray(reference, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self.reference.shape[0]
+
+    @abstractmethod
+    def query(self, X: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest reference rows for every query row
+
+        Returns:
+            Tuple of (distances, indices), both (N, k), sorted by distance
+        """
+
+    def params(self) -> Dict:
+        """Parameters needed to rebuild the index on load"""
+        return {}
+
+    def _save_arrays(self, directory: str):
+        pass
+
+    def save(self, directory: str):
+        """Write the index to a directory of .npy files plus a manifest"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'reference.npy'), np.asarray(self.reference, dtype=np.float32))
+        self._save_arrays(directory)
+        with open(os.path.join(directory, INDEX_MANIFEST), 'w') as f:
+            json.dump({'kind': self.kind, 'rows': len(self), 'params': self.params()}, f, indent=2)
+
+    @classmethod
+    def _from_arrays(cls, reference: np.ndarray, directory: str, mmap_mode: str, params: Dict) -> 'NeighborIndex':
+        return cls(reference, **params)
+
+
+class BruteForceIndex(NeighborIndex):
+    """Exact search by scanning the reference matrix block by block"""
+
+    kind = 'brute'
+
+    def query(self, X: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        X = np.asarray(X, dtype=np.float64)
+        n_ref = len(self)
+        k = min(k, n_ref)
+        block_rows = max(k, _BLOCK_ELEMENTS // max(len(X), 1))
+
+        best_d = np.full((len(X), 0), np.inf)
+        best_i = np.empty((len(X), 0), dtype=np.int64)
+        for start in range(0, n_ref, block_rows):
+            block = self.reference[start:start + block_rows]
+            d = _squared_distances(X, block)
+            i = np.broadcast_to(np.arange(start, start + len(block), dtype=np.int64), d.shape)
+            best_d, best_i = _top_k(np.hstack([best_d, d]), np.hstack([best_i, i]), k)
+        return np.sqrt(best_d), best_i
+
+
+class TreeIndex(NeighborIndex):
+    """Exact search with a KD-tree or ball tree built over the reference set"""
+
+    kind = 'kd_tree'
+    _tree_class = KDTree
+
+    def __init__(self, reference: np.ndarray, leaf_size: int = 40):
+        super().__init__(reference)
+        self.leaf_size = leaf_size
+        # The tree keeps its own float64 copy of the data it partitions
+        self.tree = self._tree_class(np.asarray(self.reference, dtype=np.float64), leaf_size=leaf_size)
+
+    def query(self, X: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        distances, indices = self.tree.query(np.asarray(X, dtype=np.float64), k=min(k, len(self)))
+        return distances, indices.astype(np.int64, copy=False)
+
+    def params(self) -> Dict:
+        return {'leaf_size': self.leaf_size}
+
+
+class BallTreeIndex(TreeIndex):
+    kind = 'ball_tree'
+    _tree_class = BallTree
+
+
+class IVFIndex(NeighborIndex):
+    """
+    Approximate inverted-file index
+
+    Reference rows are clustered around n_lists centroids and stored
+    contiguously per cluster. A query scans only the n_probe clusters with
+    the closest centroids; raising n_probe raises recall (n_probe = n_lists
+    is an exact search).
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, reference: np.ndarray, n_lists: int = None, n_probe: int = 8,
+                 n_iter: int = 10, sample_size: int = None, random_state: int = 42,
+                 centroids: np.ndarray = None, ids: np.ndarray = None, offsets: np.ndarray = None):
+        super().__init__(reference)
+        self.n_probe = n_probe
+        if centroids is not None:
+            # Already clustered (loaded from disk): reference is stored in list order
+            self.centroids, self.ids, self.offsets = centroids, ids, offsets
+            self.n_lists = len(centroids)
+            self._centroid_tree = KDTree(self.centroids)
+            return
+
+        n = len(self)
+        self.n_lists = n_lists or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(random_state)
+        # ~64 training points per list is plenty for the coarse quantizer
+        sample_size = min(n, sample_size or 64 * self.n_lists)
+        sample = self.reference[np.sort(rng.choice(n, size=sample_size, replace=False))]
+        self.centroids = self._kmeans(np.asarray(sample, dtype=np.float64), self.n_lists, n_iter, rng)
+        self.n_lists = len(self.centroids)
+
+        assignment = self._nearest_centroid(self.reference, self.centroids)
+        order = np.argsort(assignment, kind='stable')
+        counts = np.bincount(assignment, minlength=self.n_lists)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.ids = order.astype(np.int64)
+        self.reference = np.ascontiguousarray(self.reference[order], dtype=np.float32)
+        self._centroid_tree = KDTree(self.centroids)
+
+    @staticmethod
+    def _kmeans(sample: np.ndarray, n_lists: int, n_iter: int, rng: np.random.Generator) -> np.ndarray:
+        n_lists = min(n_lists, len(sample))
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            labels = IVFIndex._nearest_centroid(sample, centroids)
+            counts = np.bincount(labels, minlength=n_lists)
+            filled = counts > 0
+            for j in range(sample.shape[1]):
+                centroids[filled, j] = np.bincount(labels, weights=sample[:, j], minlength=n_lists)[filled]
+            centroids[filled] /= counts[filled, None]
+        return centroids
+
+    @staticmethod
+    def _nearest_centroid(rows: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Index of the closest centroid for every row (a KD-tree over centroids suits low dimensions)"""
+        tree = KDTree(centroids)
+        block_rows = _BLOCK_ELEMENTS // 8
+        labels = np.empty(len(rows), dtype=np.int64)
+        for start in range(0, len(rows), block_rows):
+            block = np.asarray(rows[start:start + block_rows], dtype=np.float64)
+            labels[start:start + len(block)] = tree.query(block, k=1, return_distance=False)[:, 0]
+        return labels
+
+    def query(self, X: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        X = np.asarray(X, dtype=np.float64)
+        k = min(k, len(self))
+        n_probe = min(max(self.n_probe, 1), self.n_lists)
+        probes = self._centroid_tree.query(X, k=n_probe, return_distance=False)
+
+        distances = np.full((len(X), k), np.inf)
+        indices = np.full((len(X), k), -1, dtype=np.int64)
+        for q, lists in enumerate(probes):
+            # Widen the probe set until it holds at least k candidates
+            extra = n_probe
+            while self._candidate_count(lists) < k and extra < self.n_lists:
+                extra = min(extra * 2, self.n_lists)
+                lists = self._centroid_tree.query(X[q:q + 1], k=extra, return_distance=False)[0]
+            positions = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in lists])
+            d = _squared_distances(X[q:q + 1], self.reference[positions])
+            best_d, best_p = _top_k(d, positions[None, :], k)
+            distances[q, :best_d.shape[1]] = np.sqrt(best_d[0])
+            indices[q, :best_p.shape[1]] = self.ids[best_p[0]]
+        return distances, indices
+
+    def _candidate_count(self, lists: np.ndarray) -> int:
+        return int((self.offsets[lists + 1] - self.offsets[lists]).sum())
+
+    def params(self) -> Dict:
+        return {'n_probe': self.n_probe}
+
+    def _save_arrays(self, directory: str):
+        np.save(os.path.join(directory, 'centroids.npy'), self.centroids)
+        np.save(os.path.join(directory, 'ids.npy'), self.ids)
+        np.save(os.path.join(directory, 'offsets.npy'), self.offsets)
+
+    @classmethod
+    def _from_arrays(cls, reference: np.ndarray, directory: str, mmap_mode: str, params: Dict) -> 'IVFIndex':
+        return cls(
+            reference,
+            centroids=np.load(os.path.join(directory, 'centroids.npy')),
+            ids=np.load(os.path.join(directory, 'ids.npy'), mmap_mode=mmap_mode),
+            offsets=np.load(os.path.join(directory, 'offsets.npy')),
+            **params
+        )
+
+
+INDEX_TYPES = {
+    BruteForceIndex.kind: BruteForceIndex,
+    TreeIndex.kind: TreeIndex,
+    BallTreeIndex.kind: BallTreeIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+
+def build_index(kind: str, reference: np.ndarray, **params) -> NeighborIndex:
+    """Build a neighbour index of the given kind over a reference matrix"""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown neighbour index '{kind}'. Available: {', '.join(INDEX_TYPES)}")
+    return INDEX_TYPES[kind](reference, **params)
+
+
+def load_index(directory: str, mmap_mode: str = 'r', **params) -> NeighborIndex:
+    """
+    Load an index saved with NeighborIndex.save
+
+    The reference matrix is memory-mapped (float32) by default; keyword
+    arguments override saved parameters (e.g. n_probe).
+    """
+    with open(os.path.join(directory, INDEX_MANIFEST)) as f:
+        manifest = json.load(f)
+    reference = np.load(os.path.join(directory, 'reference.npy'), mmap_mode=mmap_mode)
+    index_class = INDEX_TYPES[manifest['kind']]
+    return index_class._from_arrays(reference, directory, mmap_mode, {**manifest.get('params', {}), **params})
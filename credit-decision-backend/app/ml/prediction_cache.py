@@ -0,0 +1,114 @@
+"""
+Prediction Cache - bounded LRU + TTL cache for single-applicant predictions
+Keys are the normalized feature vector plus the model version, so a reloaded
+model never serves results computed by its predecessor.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+from app.ml.feature_engineering import FEATURE_ORDER, encode_city_tier
+
+# Decimal places kept when normalizing amounts (retries that differ below this share an entry)
+KEY_DECIMALS = 2
+
+
+def feature_key(features: Dict, model_version: str) -> Tuple:
+    """
+    Build the cache key for one applicant
+
+    Args:
+        features: Applicant features (the six model inputs; extra fields are ignored)
+        model_version: Version of the model that will score them
+
+    Returns:
+        (model_version, f1, ..., f6) with amounts as rounded floats and
+        city_tier mapped to its numeric tier
+    """
+    values = []
+    for name in FEATURE_ORDER:
+        value = features[name]
+        if name == 'city_tier':
+            value = encode_city_tier([value])[0]
+        values.append(round(float(value), KEY_DECIMALS))
+    return (model_version, *values)
+
+
+class PredictionCache:
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 300,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_size: Maximum number of entries (0 disables the cache)
+            ttl_seconds: Entry lifetime in seconds (0 means entries never expire)
+            clock: Time source, injectable for tests
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: Hashable) -> Optional[Dict]:
+        """Return a copy of the cached result, or None on a miss"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Dict):
+        """Store a result, evicting the least recently used entry when full"""
+        if not self.enabled:
+            return
+        expires_at = self._clock() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            self._entries[key] = (expires_at, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (e.g. after a model reload)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
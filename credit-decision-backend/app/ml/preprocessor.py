@@ -0,0 +1,154 @@
+"""
+Preprocessor - the credit model's feature pipeline and scoring kernel
+Encodes raw applicant data into the FEATURE_ORDER matrix and scales it.
+Training and every scoring path go through the same pipeline object.
+
+Fitting uses sklearn, but the fitted state is exported as plain arrays
+(float64 scaler mean/scale, a contiguous KNN reference set), and scoring
+is done with NumPy arithmetic on them. That skips sklearn's per-call input
+validation and dispatch, which dominates the cost of scoring one applicant.
+"""
+
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+from typing import Dict
+from app.ml.feature_engineering import FEATURE_ORDER, FeatureInput, build_feature_matrix
+from app.ml.neighbor_index import neighbor_vote
+
+# Query rows x reference rows handled per distance block (bounds temporary memory)
+_BLOCK_ELEMENTS = 1 << 20
+
+# Above this many reference rows a single query is a linear scan the KD-tree beats
+KERNEL_MAX_ROWS = 10000
+
+
+class FeaturePipeline:
+    def __init__(self, mean: np.ndarray = None, scale: np.ndarray = None, n_samples: int = 0):
+        """
+        Args:
+            mean: Fitted scaler mean per feature (fit() sets it when omitted)
+            scale: Fitted scaler standard deviation per feature
+            n_samples: Rows the scaler was fitted on
+        """
+        self.mean = None
+        self.scale = None
+        self.n_samples = n_samples
+        if mean is not None:
+            self._set_arrays(mean, scale)
+
+    def _set_arrays(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean = np.ascontiguousarray(mean, dtype=np.float64)
+        self.scale = np.ascontiguousarray(scale, dtype=np.float64)
+        if self.mean.shape != (len(FEATURE_ORDER),) or self.scale.shape != (len(FEATURE_ORDER),):
+            raise ValueError(f"Scaler arrays must have {len(FEATURE_ORDER)} features")
+
+    @classmethod
+    def from_arrays(cls, mean: np.ndarray, scale: np.ndarray, n_samples: int = 0) -> 'FeaturePipeline':
+        """Rebuild a fitted pipeline from stored scaler statistics (e.g. a model bundle)"""
+        return cls(mean, scale, n_samples)
+
+    @classmethod
+    def from_scaler(cls, scaler: StandardScaler) -> 'FeaturePipeline':
+        """Export a fitted StandardScaler (e.g. a legacy pickle)"""
+        return cls(scaler.mean_, scaler.scale_, int(getattr(scaler, 'n_samples_seen_', 0)))
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.mean is not None
+
+    @property
+    def scaler(self) -> StandardScaler:
+        """An equivalent fitted StandardScaler"""
+        scaler = StandardScaler()
+        scaler.mean_ = self.mean.copy()
+        scaler.scale_ = self.scale.copy()
+        scaler.var_ = scaler.scale_ ** 2
+        scaler.n_features_in_ = len(FEATURE_ORDER)
+        scaler.n_samples_seen_ = self.n_samples
+        return scaler
+
+    def export_arrays(self) -> Dict[str, np.ndarray]:
+        """Fitted state as plain float64 arrays, named as in a model bundle"""
+        return {'scaler_mean': self.mean, 'scaler_scale': self.scale}
+
+    def features(self, data: FeatureInput) -> np.ndarray:
+        """Raw (unscaled) feature matrix"""
+        return build_feature_matrix(data)
+
+    def fit(self, data: FeatureInput) -> 'FeaturePipeline':
+        X = self.features(data)
+        scaler = StandardScaler().fit(X)
+        self._set_arrays(scaler.mean_, scaler.scale_)
+        self.n_samples = len(X)
+        return self
+
+    def transform(self, data: FeatureInput) -> np.ndarray:
+        """Scaled feature matrix"""
+        return self.scale_features(self.features(data))
+
+    def fit_transform(self, data: FeatureInput) -> np.ndarray:
+        return self.fit(data).transform(data)
+
+    def scale_features(self, X: np.ndarray) -> np.ndarray:
+        """Scale a raw (N, 6) float64 matrix that was already built with features()"""
+        return (X - self.mean) / self.scale
+
+
+class KNNKernel:
+    """
+    Exact k-nearest-neighbour scoring over a contiguous reference set
+
+    Produces the same probabilities as KNeighborsClassifier.predict_proba
+    (euclidean distance, uniform or distance weights).
+    """
+
+    def __init__(self, reference: np.ndarray, labels: np.ndarray, n_classes: int,
+                 n_neighbors: int, weights: str = 'uniform'):
+        if weights not in ('uniform', 'distance'):
+            raise ValueError(f"Unsupported KNN weights '{weights}'")
+        self.reference = np.ascontiguousarray(reference, dtype=np.float64)
+        self.labels = np.ascontiguousarray(labels, dtype=np.int64)
+        self.n_classes = n_classes
+        self.n_neighbors = min(n_neighbors, len(self.reference))
+        self.weights = weights
+        self._reference_sq = np.einsum('ij,ij->i', self.reference, self.reference)
+
+    @classmethod
+    def from_classifier(cls, model: KNeighborsClassifier) -> 'KNNKernel':
+        """Export a fitted euclidean KNeighborsClassifier"""
+        if model.effective_metric_ != 'euclidean':
+            raise ValueError(f"Only the euclidean metric is supported, got '{model.effective_metric_}'")
+        return cls(model._fit_X, model._y, len(model.classes_), model.n_neighbors, model.weights)
+
+    def __len__(self) -> int:
+        return self.reference.shape[0]
+
+    def kneighbors(self, X_scaled: np.ndarray):
+        """(distances, indices) of the k nearest reference rows, sorted by distance"""
+        k = self.n_neighbors
+        n_ref = len(self)
+        # Screen with the fast |x|^2 - 2xy + |y|^2 expansion, then rank a few
+        # extra candidates by exact differences so near-ties order as in sklearn
+        n_candidates = min(n_ref, 2 * k + 8)
+        block = max(1, _BLOCK_ELEMENTS // max(n_ref, 1))
+        distances = np.empty((len(X_scaled), k))
+        indices = np.empty((len(X_scaled), k), dtype=np.int64)
+        for start in range(0, len(X_scaled), block):
+            X = X_scaled[start:start + block]
+            if n_ref > n_candidates:
+                approx = self._reference_sq - 2.0 * (X @ self.reference.T)
+                candidates = np.argpartition(approx, n_candidates - 1, axis=1)[:, :n_candidates]
+            else:
+                candidates = np.broadcast_to(np.arange(n_ref), (len(X), n_ref))
+            diff = self.reference[candidates] - X[:, None, :]
+            d = np.einsum('qcf,qcf->qc', diff, diff)
+            order = np.argsort(d, axis=1, kind='stable')[:, :k]
+            distances[start:start + block] = np.sqrt(np.take_along_axis(d, order, axis=1))
+            indices[start:start + block] = np.take_along_axis(candidates, order, axis=1)
+        return distances, indices
+
+    def predict_proba(self, X_scaled: np.ndarray) -> np.ndarray:
+        """(N, n_classes) class probabilities for a scaled feature matrix"""
+        distances, indices = self.kneighbors(X_scaled)
+        return neighbor_vote(self.labels[indices], distances, self.n_classes, self.weights)
@@ -0,0 +1,173 @@
+"""
+Shadow Scorer - scores live traffic with a candidate model off the request path
+The production model answers every request; the applicant's features and
+the production decision are handed to a bounded queue that a single
+low-priority background thread drains in batches through the candidate.
+When the queue is full the evaluation is dropped (and counted) rather than
+slowing the request down. Status and acceptance-rate disagreements are
+appended to a JSON-lines log for offline comparison.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Dict, List
+from app.ml.credit_score_model import CreditScoreModel
+from app.ml.feature_engineering import FEATURE_ORDER
+from app.ml.inference_executor import evaluate_scores
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class ShadowScorer:
+    def __init__(self, candidate: CreditScoreModel, max_queue: int = 1000, batch_size: int = 64,
+                 rate_tolerance: float = 5.0, log_path: str = None, recent_size: int = 100):
+        """
+        Args:
+            candidate: Model scored in the shadow of the production model
+            max_queue: Evaluations allowed to wait; more are dropped
+            batch_size: Evaluations scored per candidate call
+            rate_tolerance: Acceptance-rate difference (points) counted as a disagreement
+            log_path: JSON-lines file disagreements are appended to (None keeps only recent ones)
+            recent_size: Disagreements kept in memory for get_stats
+        """
+        self.candidate = candidate
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.rate_tolerance = rate_tolerance
+        self.log_path = log_path
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._worker: threading.Thread = None
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=recent_size)
+        self.submitted = 0
+        self.dropped = 0
+        self.evaluated = 0
+        self.errors = 0
+        self.status_disagreements = 0
+        self.rate_disagreements = 0
+        self.status_pairs = Counter()
+        self._rate_diff_total = 0.0
+
+    def submit(self, features: Dict, production: Dict, production_version: str) -> bool:
+        """
+        Queue one applicant for shadow scoring without waiting
+
+        Args:
+            features: Applicant features the production model scored
+            production: Production result (ml_score, acceptance_rate, status)
+            production_version: Production model version
+
+        Returns:
+            False if the queue was full and the evaluation was dropped
+        """
+        if self._worker is None:
+            self._start()
+        item = (
+            {name: features[name] for name in FEATURE_ORDER},
+            {key: production[key] for key in ('ml_score', 'acceptance_rate', 'status')},
+            production_version,
+        )
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _start(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(item is _STOP for item in batch)
+            batch = [item for item in batch if item is not _STOP]
+            if batch:
+                try:
+                    self._compare(batch, evaluate_scores(self.candidate, [features for features, _, _ in batch]))
+                except Exception:
+                    with self._lock:
+                        self.errors += len(batch)
+                    logger.exception("Shadow scoring failed for %d applicants", len(batch))
+            if stop:
+                return
+            # Yield the GIL between batches so request threads are not starved
+            time.sleep(0)
+
+    def _compare(self, batch: List, results: List[Dict]):
+        disagreements = []
+        with self._lock:
+            for (features, production, production_version), shadow in zip(batch, results):
+                self.evaluated += 1
+                rate_diff = shadow['acceptance_rate'] - production['acceptance_rate']
+                self._rate_diff_total += abs(rate_diff)
+                self.status_pairs[f"{production['status']}->{shadow['status']}"] += 1
+                status_differs = shadow['status'] != production['status']
+                rate_differs = abs(rate_diff) > self.rate_tolerance
+                self.status_disagreements += status_differs
+                self.rate_disagreements += rate_differs
+                if status_differs or rate_differs:
+                    record = {
+                        'timestamp': datetime.now(timezone.utc).isoformat(),
+                        'production_version': production_version,
+                        'candidate_version': self.candidate.model_version,
+                        'features': features,
+                        'production': production,
+                        'candidate': shadow,
+                        'acceptance_rate_diff': round(rate_diff, 2),
+                    }
+                    disagreements.append(record)
+                    self.recent.append(record)
+
+        if disagreements and self.log_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+                with open(self.log_path, 'a') as f:
+                    f.writelines(json.dumps(record) + '\n' for record in disagreements)
+            except OSError as e:
+                logger.warning("Could not write shadow disagreements to %s: %s", self.log_path, e)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Score what is already queued, then stop the worker"""
+        if self._worker is not None:
+            # Blocking put: the stop marker must not be dropped by a full queue
+            self._queue.put(_STOP)
+            self._worker.join(timeout)
+            self._worker = None
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'candidate_version': self.candidate.model_version,
+                'max_queue': self.max_queue,
+                'queued': self._queue.qsize(),
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'evaluated': self.evaluated,
+                'errors': self.errors,
+                'status_disagreements': self.status_disagreements,
+                'rate_disagreements': self.rate_disagreements,
+                'status_agreement': round(1 - self.status_disagreements / self.evaluated, 4) if self.evaluated else None,
+                'mean_abs_rate_diff': round(self._rate_diff_total / self.evaluated, 3) if self.evaluated else None,
+                'status_pairs': dict(self.status_pairs),
+                'log_path': self.log_path,
+            }
@@ -1,10 +1,9 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from uuid import UUID
 
-class LoanApplicationCreate(BaseModel):
-    amount_requested: float = Field(..., gt=0)
+class LoanScoreFeatures(BaseModel):
     num_debts: int = Field(..., ge=0)
     total_debt_amount: float = Field(..., ge=0)
     monthly_emis: float = Field(..., ge=0)
@@ -12,6 +11,12 @@ class LoanApplicationCreate(BaseModel):
     monthly_income: float = Field(..., gt=0)
     city_tier: str = Field(..., pattern=r'^(tier_1|tier_2|tier_3)$')
 
+class LoanApplicationCreate(LoanScoreFeatures):
+    amount_requested: float = Field(..., gt=0)
+
+class LoanBatchScoreRequest(BaseModel):
+    applications: List[LoanScoreFeatures] = Field(..., min_length=1)
+
 class LoanApplicationResponse(BaseModel):
     id: UUID
     user_id: UUID
@@ -36,3 +41,14 @@ class LoanDecisionResponse(BaseModel):
     status: str
     feedback: Dict
     message: str
+    model_version: Optional[str] = None
+
+class LoanScoreResult(BaseModel):
+    ml_score: float
+    acceptance_rate: float
+    status: str
+
+class LoanBatchScoreResponse(BaseModel):
+    count: int
+    model_version: str
+    results: List[LoanScoreResult]
@@ -0,0 +1,5 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class ModelReloadRequest(BaseModel):
+    bundle_path: Optional[str] = None  # Defaults to the active model's bundle path
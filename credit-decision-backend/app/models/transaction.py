@@ -15,9 +15,22 @@ class TransactionUploadResponse(BaseModel):
     user_id: UUID
     file_name: str
     transactions_count: int
+    new_transactions_count: Optional[int] = None  # Rows not already on file from earlier uploads
+    repeat_upload: bool = False  # Same file or transactions as an earlier upload, whose record is returned
+    statements_count: Optional[int] = None  # Files analyzed together in a bulk upload
     upload_date: datetime
     message: str
 
+class UploadJobResponse(BaseModel):
+    job_id: UUID
+    status: str  # queued, running, succeeded or failed
+    progress: Dict = {}
+    result: Optional[TransactionUploadResponse] = None
+    error: Optional[Dict] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 class FinancialBehaviorResponse(BaseModel):
     id: UUID
     user_id: UUID
@@ -28,4 +41,5 @@ class FinancialBehaviorResponse(BaseModel):
     liquidity_resilience_days: int
     transaction_depth_days: int
     has_stable_inflow: bool
+    cash_flow: Optional[Dict] = None  # Monthly cash-flow features (periodicity, balances, runway)
     created_at: datetime
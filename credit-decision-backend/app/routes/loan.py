@@ -1,6 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from app.models.loan import LoanApplicationCreate, LoanApplicationResponse, LoanDecisionResponse
+from app.models.loan import (
+    LoanApplicationCreate, LoanApplicationResponse, LoanDecisionResponse,
+    LoanBatchScoreRequest, LoanBatchScoreResponse
+)
 from app.services.loan_service import loan_service
+from app.services.ml_service import ml_service
 from app.middleware.auth_middleware import get_current_user, security
 from typing import List
 
@@ -16,6 +20,18 @@ async def apply_for_loan(
     result = await loan_service.process_loan_application(user['id'], loan_data.dict())
     return result
 
+@router.post("/score-batch", response_model=LoanBatchScoreResponse)
+async def score_loan_batch(
+    batch: LoanBatchScoreRequest,
+    user = Depends(get_current_user),
+    credentials = Depends(security)
+):
+    """Score a batch of applicants in one model call (no loan records are created)"""
+    result = await ml_service.predict_credit_scores_batch(
+        [application.dict() for application in batch.applications]
+    )
+    return result
+
 @router.get("/user/{user_id}", response_model=List[LoanApplicationResponse])
 async def get_user_loans(
     user_id: str,
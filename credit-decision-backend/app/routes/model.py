@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from app.models.ml_model import ModelReloadRequest
+from app.services.ml_service import ml_service
+from app.ml.model_registry import model_registry
+from app.middleware.auth_middleware import get_current_user, security
+from app.config.settings import settings
+from typing import Optional
+import secrets
+
+router = APIRouter()
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Allow model administration only with the configured admin token"""
+    if not settings.MODEL_ADMIN_TOKEN or not x_admin_token \
+            or not secrets.compare_digest(x_admin_token, settings.MODEL_ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to administer the model"
+        )
+
+@router.get("/info")
+async def get_model_info(
+    user = Depends(get_current_user),
+    credentials = Depends(security)
+):
+    """Get the active credit model and its version"""
+    return ml_service.get_model_info()
+
+@router.post("/reload", dependencies=[Depends(require_admin_token)])
+async def reload_model(request: Optional[ModelReloadRequest] = None):
+    """Load a model bundle off the request path and atomically swap it in"""
+    bundle_path = request.bundle_path if request else None
+    try:
+        result = await model_registry.reload(bundle_path)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Model reload failed, keeping version {model_registry.version}: {str(e)}"
+        )
+    return result
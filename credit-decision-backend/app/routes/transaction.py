@@ -1,18 +1,34 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
-from app.models.transaction import TransactionUploadResponse, FinancialBehaviorResponse
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Response, status
+from app.models.transaction import TransactionUploadResponse, FinancialBehaviorResponse, UploadJobResponse
 from app.services.transaction_service import transaction_service
 from app.middleware.auth_middleware import get_current_user, security
+from typing import List, Union
 
 router = APIRouter()
 
-@router.post("/upload", response_model=TransactionUploadResponse)
+@router.post(
+    "/upload",
+    response_model=Union[TransactionUploadResponse, UploadJobResponse],
+    responses={202: {"model": UploadJobResponse, "description": "Queued for background processing"}}
+)
 async def upload_transactions(
+    response: Response,
     file: UploadFile = File(...),
     monthly_income: float = Form(...),
+    background: bool = Form(False),
     user = Depends(get_current_user),
     credentials = Depends(security)
 ):
-    """Upload and analyze transaction history"""
+    """
+    Upload and analyze transaction history
+    
+    With background=true the file is queued and a 202 with a job is
+    returned at once; poll GET /jobs/{job_id} for progress and the result.
+    """
+    if background:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return await transaction_service.submit_transaction_upload(user['id'], file, monthly_income)
+    
     result = await transaction_service.process_transaction_upload(
         user['id'],
         file,
@@ -20,6 +36,40 @@ async def upload_transactions(
     )
     return result
 
+@router.post(
+    "/upload/bulk",
+    response_model=Union[TransactionUploadResponse, UploadJobResponse],
+    responses={202: {"model": UploadJobResponse, "description": "Queued for background processing"}}
+)
+async def upload_transactions_bulk(
+    response: Response,
+    files: List[UploadFile] = File(...),
+    monthly_income: float = Form(...),
+    background: bool = Form(False),
+    user = Depends(get_current_user),
+    credentials = Depends(security)
+):
+    """
+    Upload several statements, or zip archives of them, analyzed as one history
+    
+    Transactions appearing in more than one statement are counted once.
+    background=true works as for /upload.
+    """
+    if background:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return await transaction_service.submit_bulk_upload(user['id'], files, monthly_income)
+    
+    return await transaction_service.process_bulk_upload(user['id'], files, monthly_income)
+
+@router.get("/jobs/{job_id}", response_model=UploadJobResponse)
+async def get_upload_job(
+    job_id: str,
+    user = Depends(get_current_user),
+    credentials = Depends(security)
+):
+    """Progress and result of a background upload"""
+    return await transaction_service.get_upload_job(user['id'], job_id)
+
 @router.get("/analyze/{user_id}", response_model=FinancialBehaviorResponse)
 async def get_financial_behavior(
     user_id: str,
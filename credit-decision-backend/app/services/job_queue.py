@@ -0,0 +1,303 @@
+"""
+Job Queue - background jobs with bounded concurrency and status tracking
+A job is a registered handler name plus a JSON-serializable payload, so the
+same calls work whether jobs run in this process (LocalJobQueue) or in a
+separate worker fleet behind another JobQueue implementation. Handlers are
+coroutines called as handler(payload, progress); progress(dict) merges
+into the job's progress while it runs, and the handler's return value
+becomes the job's result. A job that never reaches its handler (still
+waiting at shutdown) fails, and the kind's cleanup(payload) releases what
+the payload holds, such as saved upload files.
+
+Jobs run in the process that accepted them. With a JobStore, their records
+are also written to shared storage (on every status change, and with their
+progress every sync interval) so any server worker can report on them and
+results survive a restart; a job whose process stopped syncing it is
+reported as failed.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+# Sync intervals a stored unfinished job may go without an update before its process is presumed gone
+STALE_SYNC_INTERVALS = 5
+
+JobHandler = Callable[[Dict, Callable[[Dict], None]], Awaitable[Dict]]
+JobCleanup = Callable[[Dict], None]
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobStore(ABC):
+    """Job records shared by every server process"""
+
+    @abstractmethod
+    async def save_jobs(self, jobs: List[Dict]):
+        """Insert or replace job records (the job record fields plus updated_at)"""
+
+    @abstractmethod
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        """A stored job record, or None"""
+
+
+class JobQueue(ABC):
+    def __init__(self):
+        self.handlers: Dict[str, JobHandler] = {}
+        self.cleanups: Dict[str, JobCleanup] = {}
+
+    def register(self, kind: str, handler: JobHandler, cleanup: JobCleanup = None):
+        """Make handler run every job submitted as kind; cleanup(payload) runs instead for jobs that never start"""
+        self.handlers[kind] = handler
+        if cleanup is not None:
+            self.cleanups[kind] = cleanup
+
+    @abstractmethod
+    async def submit(self, kind: str, payload: Dict, owner: str = None) -> Dict:
+        """
+        Queue a job without waiting for it
+
+        Args:
+            kind: Registered handler name
+            payload: Handler input (JSON-serializable)
+            owner: User the job belongs to
+
+        Returns:
+            The job record (see get)
+
+        Raises:
+            JobQueueFull: The queue is at capacity
+        """
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """Job record (id, kind, owner, status, progress, result, error, timestamps), or None"""
+
+    async def shutdown(self):
+        """Stop taking and running jobs; jobs still waiting fail and their cleanup runs"""
+
+
+class LocalJobQueue(JobQueue):
+    def __init__(self, max_workers: int = 2, max_pending: int = 32, result_ttl_seconds: float = 3600,
+                 max_records: int = 10000, clock: Callable[[], float] = time.monotonic,
+                 store: JobStore = None, sync_seconds: float = 2.0):
+        """
+        In-process queue: jobs run as asyncio tasks on the server's event loop
+        (handlers push blocking work to threads themselves)
+
+        Args:
+            max_workers: Jobs run at once
+            max_pending: Jobs allowed to wait; more are rejected with JobQueueFull
+            result_ttl_seconds: How long finished jobs can be looked up (0 keeps them until max_records)
+            max_records: Finished jobs kept at most; the oldest are forgotten first
+            clock: Time source, injectable for tests
+            store: Shared job records, for servers running several worker
+                processes; without one only this process knows its jobs
+            sync_seconds: How often unfinished jobs' progress is written to the store
+        """
+        super().__init__()
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_records = max_records
+        self._clock = clock
+        self.store = store
+        self.sync_seconds = sync_seconds
+        self._jobs: OrderedDict = OrderedDict()
+        self._finished_at: Dict[str, float] = {}
+        self._queue: asyncio.Queue = None
+        self._workers = []
+        self._syncer: asyncio.Task = None
+        self.submitted = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def _start(self):
+        # The queue and workers belong to the loop that submits the first job
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.max_workers)]
+        if self.store is not None:
+            self._syncer = asyncio.create_task(self._sync_unfinished())
+
+    async def submit(self, kind: str, payload: Dict, owner: str = None) -> Dict:
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        if self._queue is None:
+            self._start()
+        self._expire()
+        job = {
+            'id': str(uuid.uuid4()),
+            'kind': kind,
+            'owner': owner,
+            'status': 'queued',
+            'progress': {},
+            'result': None,
+            'error': None,
+            'created_at': _now(),
+            'started_at': None,
+            'finished_at': None,
+        }
+        try:
+            self._queue.put_nowait((job, payload))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise JobQueueFull(f"{self._queue.qsize()} jobs already waiting")
+        self._jobs[job['id']] = job
+        self.submitted += 1
+        await self._sync([job])
+        return dict(job)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        self._expire()
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return {**job, 'progress': dict(job['progress'])}
+        # Accepted by another worker process, or before a restart
+        return await self._stored(job_id) if self.store is not None else None
+
+    async def _stored(self, job_id: str) -> Optional[Dict]:
+        try:
+            record = await self.store.get_job(job_id)
+        except Exception:
+            logger.exception("Reading job %s from the job store failed", job_id)
+            return None
+        if record is None:
+            return None
+        job = {field: record.get(field) for field in (
+            'id', 'kind', 'owner', 'status', 'progress', 'result', 'error', 'created_at', 'started_at', 'finished_at'
+        )}
+        job['progress'] = job['progress'] or {}
+        now = datetime.now(timezone.utc)
+        if job['status'] in ('succeeded', 'failed'):
+            finished = datetime.fromisoformat(job['finished_at'])
+            if self.result_ttl_seconds > 0 and (now - finished).total_seconds() > self.result_ttl_seconds:
+                return None
+        elif (now - datetime.fromisoformat(record['updated_at'])).total_seconds() > STALE_SYNC_INTERVALS * self.sync_seconds:
+            job['status'] = 'failed'
+            job['error'] = {'status_code': 503, 'detail': 'Server stopped before the job finished'}
+        return job
+
+    async def _sync(self, jobs: List[Dict]):
+        """Write job records to the store; the jobs keep running if it is unavailable"""
+        if self.store is None or not jobs:
+            return
+        updated_at = _now()
+        try:
+            await self.store.save_jobs([{**job, 'progress': dict(job['progress']), 'updated_at': updated_at}
+                                        for job in jobs])
+        except Exception:
+            logger.exception("Writing %d job(s) to the job store failed", len(jobs))
+
+    async def _sync_unfinished(self):
+        """Keep stored records of this process's unfinished jobs current (their progress, and alive)"""
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            await self._sync([job for job in self._jobs.values() if job['status'] in ('queued', 'running')])
+
+    async def _work(self):
+        while True:
+            job, payload = await self._queue.get()
+            try:
+                await self._run(job, payload)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict, payload: Dict):
+        job['status'] = 'running'
+        job['started_at'] = _now()
+        await self._sync([job])
+        try:
+            job['result'] = await self.handlers[job['kind']](payload, job['progress'].update)
+            job['status'] = 'succeeded'
+            self.succeeded += 1
+        except asyncio.CancelledError:
+            job['status'] = 'failed'
+            job['error'] = {'status_code': 503, 'detail': 'Server shut down before the job finished'}
+            raise
+        except HTTPException as e:
+            job['status'] = 'failed'
+            job['error'] = {'status_code': e.status_code, 'detail': e.detail}
+            self.failed += 1
+        except Exception:
+            logger.exception("Job %s (%s) failed", job['id'], job['kind'])
+            job['status'] = 'failed'
+            job['error'] = {'status_code': 500, 'detail': 'Job failed unexpectedly'}
+            self.failed += 1
+        finally:
+            job['finished_at'] = _now()
+            self._finished_at[job['id']] = self._clock()
+            await self._sync([job])
+
+    def _abandon(self, job: Dict, payload: Dict):
+        """Fail a job that will never start and release what its payload holds"""
+        job['status'] = 'failed'
+        job['error'] = {'status_code': 503, 'detail': 'Server shut down before the job started'}
+        job['finished_at'] = _now()
+        self._finished_at[job['id']] = self._clock()
+        cleanup = self.cleanups.get(job['kind'])
+        if cleanup is not None:
+            try:
+                cleanup(payload)
+            except Exception:
+                logger.exception("Cleanup of job %s (%s) failed", job['id'], job['kind'])
+
+    def _expire(self):
+        """Forget finished jobs past their TTL, and the oldest ones beyond max_records"""
+        now = self._clock()
+        for job_id, finished in list(self._finished_at.items()):
+            expired = self.result_ttl_seconds > 0 and now - finished > self.result_ttl_seconds
+            if expired or len(self._finished_at) > self.max_records:
+                del self._finished_at[job_id]
+                self._jobs.pop(job_id, None)
+            else:
+                break
+
+    async def shutdown(self):
+        if self._syncer is not None:
+            self._syncer.cancel()
+            await asyncio.gather(self._syncer, return_exceptions=True)
+            self._syncer = None
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Running jobs were cancelled inside their handlers; waiting ones never get there
+        abandoned = []
+        while self._queue is not None and not self._queue.empty():
+            job, payload = self._queue.get_nowait()
+            self._abandon(job, payload)
+            abandoned.append(job)
+        self._queue = None
+        await self._sync(abandoned)
+
+    def get_stats(self) -> Dict:
+        statuses = {status: 0 for status in JOB_STATUSES}
+        for job in self._jobs.values():
+            statuses[job['status']] += 1
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'waiting': self._queue.qsize() if self._queue is not None else 0,
+            'jobs': statuses,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+        }
@@ -52,6 +52,9 @@ class LoanService:
         # Ensure bounds
         final_acceptance_rate = max(10, min(95, final_acceptance_rate))
         
+        # Record which model made the decision
+        ml_result['feedback']['model_version'] = ml_result['model_version']
+        
         # Update loan with decision
         decision_data = {
             'ml_score': ml_result['ml_score'],
@@ -68,7 +71,8 @@ class LoanService:
             'ml_score': ml_result['ml_score'],
             'status': ml_result['status'],
             'feedback': ml_result['feedback'],
-            'message': self._get_decision_message(ml_result['status'])
+            'message': self._get_decision_message(ml_result['status']),
+            'model_version': ml_result['model_version']
         }
     
     async def get_user_loans(self, user_id: str) -> List[Dict]:
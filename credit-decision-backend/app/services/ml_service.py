@@ -1,74 +1,128 @@
-from app.ml.credit_score_model import credit_model
-from typing import Dict
+from app.ml.model_registry import model_registry
+from app.ml.prediction_cache import PredictionCache, feature_key
+from app.ml.inference_executor import (
+    InferenceExecutor, InferenceOverloaded, InferenceTimeout, evaluate_results, evaluate_scores
+)
+from app.ml.micro_batcher import MicroBatcher, MicroBatchOverloaded
+from app.ml.credit_score_model import load_credit_model
+from app.ml.shadow_scorer import ShadowScorer
+from app.config.settings import settings
+from fastapi import HTTPException, status
+from functools import partial
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
 
 class MLService:
+    def __init__(self):
+        self.cache = PredictionCache(settings.PREDICTION_CACHE_SIZE, settings.PREDICTION_CACHE_TTL_SECONDS)
+        # Keys already carry the model version; clearing just frees the old model's entries
+        model_registry.add_swap_listener(lambda previous, model: self.cache.clear())
+        self.executor = InferenceExecutor(
+            kind=settings.INFERENCE_EXECUTOR,
+            max_workers=settings.INFERENCE_WORKERS,
+            max_pending=settings.INFERENCE_MAX_PENDING,
+            timeout=settings.INFERENCE_TIMEOUT_SECONDS
+        )
+        # Neighbour explanations come from the scoring query itself, so they only cost formatting
+        self.evaluate = partial(evaluate_results, explain=True) if settings.NEIGHBOR_EXPLANATIONS else evaluate_results
+        # Concurrent /apply requests are coalesced into one vectorized model call
+        self.batcher = MicroBatcher(
+            lambda model, applications: self._run_inference(self.evaluate, model, applications),
+            window_ms=settings.MICRO_BATCH_WINDOW_MS,
+            max_batch_size=settings.MICRO_BATCH_MAX_SIZE,
+            max_queue=settings.MICRO_BATCH_MAX_QUEUE,
+            # Busy or timed-out scoring says nothing about the applicants; retrying them singly would only add load
+            batch_errors=(HTTPException,)
+        )
+        self.shadow = self._load_shadow(settings.SHADOW_MODEL_PATH) if settings.SHADOW_MODEL_PATH else None
+    
+    def _load_shadow(self, bundle_path: str):
+        """Shadow scorer for a candidate bundle; a candidate that fails to load only disables shadowing"""
+        try:
+            candidate = load_credit_model(bundle_path=bundle_path, strict=True)
+        except Exception as e:
+            logger.error("Shadow model %s not loaded, shadow scoring disabled: %s", bundle_path, e)
+            return None
+        return ShadowScorer(
+            candidate,
+            max_queue=settings.SHADOW_MAX_QUEUE,
+            batch_size=settings.SHADOW_BATCH_SIZE,
+            rate_tolerance=settings.SHADOW_RATE_TOLERANCE,
+            log_path=settings.SHADOW_LOG_PATH or None
+        )
+    
+    async def _run_inference(self, task, model, applications: List[Dict]) -> List[Dict]:
+        """Score off the event loop, mapping executor back-pressure to HTTP errors"""
+        try:
+            return await self.executor.run(task, model, applications)
+        except InferenceOverloaded:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Credit scoring is busy, please retry shortly"
+            )
+        except InferenceTimeout:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Credit scoring timed out, please retry"
+            )
+    
     async def predict_credit_score(self, loan_data: Dict) -> Dict:
         """Predict credit score and generate feedback"""
-        # Get prediction
-        ml_score, acceptance_rate = credit_model.predict(loan_data)
+        # Read the active model once so a concurrent reload cannot switch it mid-request
+        model = model_registry.current
         
-        # Generate feedback
-        feedback = self._generate_feedback(loan_data, ml_score, acceptance_rate)
+        key = feature_key(loan_data, model.model_version)
+        cached = self.cache.get(key)
+        if cached is not None:
+            if self.shadow is not None:
+                self.shadow.submit(loan_data, cached, model.model_version)
+            return cached
         
-        # Determine status
-        if acceptance_rate >= 70:
-            status = "approved"
-        elif acceptance_rate >= 50:
-            status = "processing"
+        # One evaluation gives the score, acceptance rate, status and feedback
+        if settings.MICRO_BATCH_MAX_SIZE > 1:
+            try:
+                result = await self.batcher.submit(model, loan_data)
+            except MicroBatchOverloaded:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Credit scoring is busy, please retry shortly"
+                )
         else:
-            status = "rejected"
+            result = (await self._run_inference(self.evaluate, model, [loan_data]))[0]
+        result = {**result, "model_version": model.model_version}
+        self.cache.put(key, result)
+        # Never waits: a full shadow queue drops the evaluation
+        if self.shadow is not None:
+            self.shadow.submit(loan_data, result, model.model_version)
+        return result
+    
+    async def predict_credit_scores_batch(self, applications: List[Dict]) -> Dict:
+        """Score many applicants with a single vectorized model call"""
+        if len(applications) > settings.MAX_BATCH_SCORE_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Batch too large. Maximum {settings.MAX_BATCH_SCORE_SIZE} applications per request"
+            )
         
+        model = model_registry.current
+        results = await self._run_inference(evaluate_scores, model, applications)
+        return {"count": len(results), "model_version": model.model_version, "results": results}
+    
+    def get_model_info(self) -> Dict:
+        """Active model details, including its version, the last reload and cache/executor counters"""
         return {
-            "ml_score": round(ml_score, 2),
-            "acceptance_rate": round(acceptance_rate, 2),
-            "status": status,
-            "feedback": feedback
+            **model_registry.get_model_info(),
+            "prediction_cache": self.cache.get_stats(),
+            "inference_executor": self.executor.get_stats(),
+            "micro_batcher": self.batcher.get_stats(),
+            "shadow": self.shadow.get_stats() if self.shadow is not None else None
         }
     
-    def _generate_feedback(self, loan_data: Dict, ml_score: float, acceptance_rate: float) -> Dict:
-        """Generate detailed feedback"""
-        feedback = {
-            "overall": "",
-            "strengths": [],
-            "concerns": [],
-            "recommendations": []
-        }
-        
-        debt_to_income = loan_data['total_debt_amount'] / max(loan_data['monthly_income'] * 12, 1)
-        emi_to_income = loan_data['monthly_emis'] / max(loan_data['monthly_income'], 1)
-        
-        # Overall message
-        if acceptance_rate >= 70:
-            feedback["overall"] = "Your loan application shows strong financial health and has a high probability of approval."
-        elif acceptance_rate >= 50:
-            feedback["overall"] = "Your application is under review. Some improvements could increase approval chances."
-        else:
-            feedback["overall"] = "Your application needs significant improvement before approval can be considered."
-        
-        # Strengths
-        if loan_data['total_assets'] > loan_data['total_debt_amount']:
-            feedback["strengths"].append("Strong asset-to-debt ratio")
-        if emi_to_income < 0.3:
-            feedback["strengths"].append("Manageable EMI obligations")
-        if loan_data['num_debts'] <= 2:
-            feedback["strengths"].append("Low number of existing debts")
-        
-        # Concerns
-        if debt_to_income > 0.5:
-            feedback["concerns"].append("High debt-to-income ratio")
-        if emi_to_income > 0.4:
-            feedback["concerns"].append("EMI burden is too high relative to income")
-        if loan_data['num_debts'] > 3:
-            feedback["concerns"].append("Multiple existing debt obligations")
-        
-        # Recommendations
-        if debt_to_income > 0.5:
-            feedback["recommendations"].append("Consider reducing existing debt before applying")
-        if emi_to_income > 0.4:
-            feedback["recommendations"].append("Try to consolidate or reduce EMI payments")
-        if ml_score < 60:
-            feedback["recommendations"].append("Build a stronger transaction history and maintain regular income")
-        
-        return feedback
+    def shutdown(self):
+        self.executor.shutdown()
+        if self.shadow is not None:
+            self.shadow.shutdown()
 
 ml_service = MLService()
@@ -0,0 +1,130 @@
+"""
+Statement Pool - parses the statements of a bulk upload in parallel
+Reading, cleaning, categorizing and keying a statement is CPU-bound pandas
+work that holds the GIL, so the files of one bulk upload are spread over a
+pool of worker processes. Each worker hands back only what the upload needs
+of its file: the compact analysis rows (FinancialAnalyzer.analysis_rows)
+with their de-duplication keys, and the cleaned transactions as JSON lines
+in a file next to the statement; merging happens in the caller.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException, UploadFile
+from app.utils.financial_analyzer import TRANSACTION_COLUMNS, financial_analyzer
+from app.utils.transaction_keys import TransactionKeys
+from app.utils.transaction_parser import transaction_parser
+
+
+def json_records(frame: pd.DataFrame) -> List[str]:
+    """One JSON object per transaction of a cleaned frame, as to_json(orient='records') writes them"""
+    if frame.empty:
+        return []
+    # Newlines inside values are escaped, so every line is one record
+    return frame.to_json(orient='records', lines=True).rstrip('\n').split('\n')
+
+
+def parse_statement(path: str, file_name: str) -> Dict:
+    """
+    Analysis rows and keys of one saved statement (runs in a worker)
+
+    Returns:
+        {'file_name', 'count', 'rows', 'keys', 'records'}, records being the
+        path of the transactions as JSON lines; or {'file_name', 'error':
+        {'status_code', 'detail'}} when the file cannot be parsed (exceptions
+        do not always survive the trip back)
+    """
+    keys = TransactionKeys()
+    rows, row_keys = [], []
+    records = f'{path}.jsonl'
+    try:
+        with open(path, 'rb') as f, open(records, 'w', encoding='utf-8') as out:
+            upload = UploadFile(f, filename=file_name, size=os.path.getsize(path))
+            for frame in transaction_parser.iter_frames(upload, max_bytes=0):
+                rows.append(financial_analyzer.analysis_rows(frame))
+                row_keys.append(keys(frame))
+                for record in json_records(frame):
+                    out.write(record)
+                    out.write('\n')
+    except HTTPException as e:
+        return {'file_name': file_name, 'error': {'status_code': e.status_code, 'detail': e.detail}}
+    if not rows:
+        rows = [financial_analyzer.analysis_rows(pd.DataFrame(columns=TRANSACTION_COLUMNS))]
+        row_keys = [np.empty(0, dtype=np.int64)]
+    rows = pd.concat(rows, ignore_index=True)
+    return {'file_name': file_name, 'count': len(rows), 'rows': rows, 'keys': np.concatenate(row_keys),
+            'records': records}
+
+
+def merge_statements(parsed: List[Dict]) -> Tuple[pd.DataFrame, np.ndarray, Iterator[str]]:
+    """
+    Analysis rows, keys and JSON records of parsed statements with every
+    transaction once: keys number identical rows within a statement, so an
+    equal key in a later statement (overlapping periods) is the same one
+    """
+    keys = np.concatenate([result['keys'] for result in parsed])
+    keep = np.zeros(len(keys), dtype=bool)
+    keep[np.unique(keys, return_index=True)[1]] = True
+    rows = pd.concat([result['rows'] for result in parsed], ignore_index=True)[keep].reset_index(drop=True)
+
+    def records() -> Iterator[str]:
+        offset = 0
+        for result in parsed:
+            kept = keep[offset:offset + result['count']]
+            offset += result['count']
+            with open(result['records'], encoding='utf-8') as f:
+                for record, wanted in zip(f, kept):
+                    if wanted:
+                        yield record.rstrip('\n')
+
+    return rows, keys[keep], records()
+
+
+class StatementPool:
+    def __init__(self, max_workers: int = 0, executor: Executor = None):
+        """
+        Args:
+            max_workers: Worker processes (0: one per CPU core); started on first use
+            executor: Run parse_statement here instead (e.g. a thread pool in tests)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = executor
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    async def parse(self, statements: List[Dict]) -> List[Dict]:
+        """
+        Parse saved statements ({'path', 'file_name'}) in parallel; results come back in input order
+
+        Raises:
+            HTTPException: 400 naming the first file that could not be parsed
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._pool()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, parse_statement, statement['path'], statement['file_name'])
+            for statement in statements
+        ))
+        for result in results:
+            if 'error' in result:
+                raise HTTPException(
+                    status_code=result['error']['status_code'],
+                    detail=f"{result['file_name']}: {result['error']['detail']}"
+                )
+        return results
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
@@ -1,55 +1,492 @@
 from app.utils.transaction_parser import transaction_parser
-from app.utils.financial_analyzer import financial_analyzer
+from app.utils.financial_analyzer import empty_aggregates, financial_analyzer, merge_aggregates
+from app.utils.transaction_keys import KeyDigest, TransactionKeys
 from app.db.repositories.transaction_repository import transaction_repository
+from app.db.repositories.job_repository import job_repository
+from app.config.settings import settings
+from app.services.job_queue import JobQueue, JobQueueFull, LocalJobQueue
+from app.services.statement_pool import StatementPool, json_records, merge_statements
 from fastapi import UploadFile, HTTPException, status
-from typing import Dict
+from fastapi.concurrency import run_in_threadpool
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Tuple
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+UPLOAD_JOB = 'transaction_upload'
+BULK_UPLOAD_JOB = 'transaction_bulk_upload'
 
 class TransactionService:
-    async def process_transaction_upload(self, user_id: str, file: UploadFile, monthly_income: float) -> Dict:
-        """Process uploaded transaction file"""
-        # Parse file
-        transactions = await transaction_parser.parse_file(file)
+    def __init__(self, jobs: JobQueue = None, statements: StatementPool = None):
+        """
+        Args:
+            jobs: Queue background uploads run on (defaults to an in-process LocalJobQueue
+                whose job records are shared through upload_jobs, see UPLOAD_JOB_STORE)
+            statements: Pool parsing the files of bulk uploads (defaults to BULK_PARSE_WORKERS processes)
+        """
+        self.jobs = jobs or LocalJobQueue(
+            max_workers=settings.UPLOAD_JOB_WORKERS,
+            max_pending=settings.UPLOAD_JOB_MAX_PENDING,
+            result_ttl_seconds=settings.UPLOAD_JOB_TTL_SECONDS,
+            store=self._job_store(),
+            sync_seconds=settings.UPLOAD_JOB_SYNC_SECONDS
+        )
+        self.jobs.register(UPLOAD_JOB, self._run_upload_job, cleanup=self._remove_upload)
+        self.jobs.register(BULK_UPLOAD_JOB, self._run_bulk_upload_job, cleanup=self._remove_bulk_upload)
+        self.statements = statements or StatementPool(settings.BULK_PARSE_WORKERS)
+    
+    @staticmethod
+    def _job_store():
+        if settings.UPLOAD_JOB_STORE == 'memory':
+            return None
+        if settings.UPLOAD_JOB_STORE != 'supabase':
+            raise ValueError(f"Unknown UPLOAD_JOB_STORE '{settings.UPLOAD_JOB_STORE}'. Expected supabase or memory")
+        return job_repository
+    
+    def _ingest(self, parts: Iterable[Tuple[pd.DataFrame, np.ndarray, Iterable[str]]],
+                progress: Callable[[Dict], None] = None) -> Tuple[IO, IO, int]:
+        """
+        Read a whole upload before anything about it is recorded
+        
+        Runs in a worker thread. Of each row only what aggregation needs is
+        kept (FinancialAnalyzer.analysis_rows) with its key, so a file that
+        fails partway leaves the user's keys and aggregates untouched. Both
+        are spilled to temporary files in pieces of STORED_CHUNK_ROWS: the
+        analysis rows and keys pickled for _merge_new_rows, the full rows
+        as JSON, one line per chunk, to be stored with the upload. Memory
+        held here is thus set by the chunk size, not the upload; what still
+        grows with it is TransactionKeys' count per distinct transaction,
+        and for bulk uploads the merged statements passed in as one part.
+        
+        Args:
+            parts: (analysis rows, their keys, their transactions as JSON records)
+        
+        Returns:
+            (spilled analysis pieces, spilled chunks, transaction count); both
+            files are rewound and the caller closes them
+        """
+        count = 0
+        pieces = tempfile.TemporaryFile(dir=self._upload_dir())
+        chunks = tempfile.TemporaryFile('w+', encoding='utf-8', dir=self._upload_dir())
+        try:
+            chunk = []
+            for part_rows, part_keys, records in parts:
+                for record in records:
+                    chunk.append(record)
+                    if len(chunk) == settings.STORED_CHUNK_ROWS:
+                        chunks.write(f"[{','.join(chunk)}]\n")
+                        chunk = []
+                for start in range(0, len(part_rows), settings.STORED_CHUNK_ROWS):
+                    end = start + settings.STORED_CHUNK_ROWS
+                    pickle.dump((part_rows.iloc[start:end], part_keys[start:end]), pieces, pickle.HIGHEST_PROTOCOL)
+                count += len(part_rows)
+                if progress:
+                    progress({'stage': 'analyzing', 'transactions': count})
+            if chunk:
+                chunks.write(f"[{','.join(chunk)}]\n")
+            pieces.seek(0)
+            chunks.seek(0)
+        except BaseException:
+            pieces.close()
+            chunks.close()
+            raise
+        return pieces, chunks, count
+    
+    @staticmethod
+    def _read_pieces(pieces: IO) -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+        """The (analysis rows, keys) pieces _ingest spilled, one at a time"""
+        while True:
+            try:
+                yield pickle.load(pieces)
+            except EOFError:
+                return
+    
+    async def _merge_new_rows(self, user_id: str, pieces: IO) -> Tuple[Dict, int]:
+        """
+        Claim an upload's keys and merge the rows not on file before into the user's aggregates
+        
+        Goes piece by piece: each piece's keys are claimed and its new rows
+        aggregated and folded in with merge_aggregates, then the total is
+        merged into the stored aggregates once. Claimed keys are spilled
+        too, so they can be released if the merge fails and a retried
+        upload counts them again.
+        
+        Returns:
+            (the user's aggregates, new transaction count)
+        """
+        new_aggregates = empty_aggregates(financial_analyzer.categories)
+        new_count = 0
+        with tempfile.TemporaryFile(dir=self._upload_dir()) as claimed_keys:
+            try:
+                for rows, keys in self._read_pieces(pieces):
+                    claimed = np.array(
+                        await transaction_repository.claim_transaction_keys(user_id, keys.tolist()), dtype=np.int64
+                    )
+                    if not len(claimed):
+                        continue
+                    claimed.tofile(claimed_keys)
+                    new_rows = rows[np.isin(keys, claimed)]
+                    piece_aggregates = await run_in_threadpool(financial_analyzer.aggregate_rows, new_rows)
+                    new_aggregates = merge_aggregates(new_aggregates, piece_aggregates)
+                    new_count += len(new_rows)
+                if not new_count:
+                    current = await transaction_repository.get_financial_aggregates(user_id)
+                    return (current['aggregates'] if current else new_aggregates), 0
+                aggregates = await self._update_aggregates(user_id, new_aggregates)
+            except BaseException:
+                claimed_keys.seek(0)
+                while True:
+                    claimed = np.fromfile(claimed_keys, dtype=np.int64, count=settings.STORED_CHUNK_ROWS)
+                    if not len(claimed):
+                        break
+                    await transaction_repository.release_transaction_keys(user_id, claimed.tolist())
+                raise
+        return aggregates, new_count
+    
+    async def _update_aggregates(self, user_id: str, new_aggregates: Dict) -> Dict:
+        """
+        Merge aggregates of new transactions into the user's running aggregates
+        
+        Optimistic: the merge is written only if no other upload (in any
+        process) saved the aggregates since they were read, else it is redone.
+        
+        Raises:
+            HTTPException: 503 when AGGREGATE_UPDATE_ATTEMPTS merges all lost to concurrent updates
+        """
+        for _ in range(settings.AGGREGATE_UPDATE_ATTEMPTS):
+            current = await transaction_repository.get_financial_aggregates(user_id)
+            if current:
+                aggregates, version = merge_aggregates(current['aggregates'], new_aggregates), current['version']
+            else:
+                aggregates, version = new_aggregates, None
+            if await transaction_repository.save_financial_aggregates(user_id, aggregates, version):
+                return aggregates
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Other uploads are updating your transaction history, please retry shortly"
+        )
+    
+    async def process_transaction_upload(self, user_id: str, file: UploadFile, monthly_income: float,
+                                         progress: Callable[[Dict], None] = None, file_hash: str = None) -> Dict:
+        """
+        Process uploaded transaction file (progress, if given, is told how far it got)
+        
+        Transactions already on file from earlier uploads are skipped, the
+        rest are merged into the user's running aggregates, and the
+        behaviour score is recomputed from those aggregates.
+        
+        A file the user already uploaded byte for byte, and one holding
+        exactly the transactions of an earlier upload, are not merged or
+        stored again: both get that upload's stored record back, re-scored
+        if monthly_income changed (see _repeat_upload). The file is hashed
+        while it is parsed, so a repeat file is caught before its keys are
+        claimed; one whose hash is already known is not parsed at all.
+        
+        Args:
+            file_hash: SHA-256 of the file, when already computed while saving it
+        """
+        user_id = str(user_id)
+        if file_hash is not None:
+            existing = await transaction_repository.find_transaction_upload(user_id, file_hash=file_hash)
+            if existing:
+                return await self._repeat_upload(user_id, existing, file.filename, monthly_income)
         
-        if not transactions:
+        # Stream, hash and parse in one pass off the event loop
+        digest = hashlib.sha256() if file_hash is None else None
+        keys = TransactionKeys()
+        parts = (
+            (financial_analyzer.analysis_rows(frame), keys(frame), json_records(frame))
+            for frame in transaction_parser.iter_frames(file, digest=digest)
+        )
+        ingested = await run_in_threadpool(self._ingest, parts, progress)
+        with ingested[0], ingested[1]:
+            if digest is not None:
+                file_hash = digest.hexdigest()
+                existing = await transaction_repository.find_transaction_upload(user_id, file_hash=file_hash)
+                if existing:
+                    return await self._repeat_upload(user_id, existing, file.filename, monthly_income)
+            return await self._save_ingested(
+                user_id, file.filename, file_hash, keys.digest(), ingested, monthly_income, progress
+            )
+    
+    async def _save_upload(self, user_id: str, file_name: str, file_hash: str, content_hash: str,
+                           ingested: Tuple[IO, IO, int], monthly_income: float,
+                           progress: Callable[[Dict], None] = None) -> Dict:
+        """Merge an ingested upload into the user's aggregates, score them and store the upload"""
+        with ingested[0], ingested[1]:
+            return await self._save_ingested(
+                user_id, file_name, file_hash, content_hash, ingested, monthly_income, progress
+            )
+    
+    async def _save_ingested(self, user_id: str, file_name: str, file_hash: str, content_hash: str,
+                             ingested: Tuple[IO, IO, int], monthly_income: float,
+                             progress: Callable[[Dict], None] = None) -> Dict:
+        pieces, chunks, count = ingested
+        if not count:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No valid transactions found in file"
             )
         
-        # Save transaction data
+        if progress:
+            progress({'stage': 'saving', 'transactions': count})
+        aggregates, new_count = await self._merge_new_rows(user_id, pieces)
+        if progress:
+            progress({'stage': 'saving', 'transactions': count, 'new_transactions': new_count})
+        if not new_count:
+            existing = await transaction_repository.find_transaction_upload(user_id, content_hash=content_hash)
+            if existing:
+                return await self._repeat_upload(user_id, existing, file_name, monthly_income, aggregates)
+        
+        analysis = financial_analyzer.score_aggregates(aggregates, monthly_income)
+        
+        # Save transaction data: the first chunk with the upload, the rest in transaction_chunks
+        stored_chunks = sum(1 for _ in chunks)
+        chunks.seek(0)
         transaction_data = {
             'user_id': user_id,
-            'file_name': file.filename,
-            'transaction_data': transactions
+            'file_name': file_name,
+            'transaction_data': json.loads(chunks.readline()),
+            'file_hash': file_hash,
+            'content_hash': content_hash,
+            'transactions_count': count,
+            'stored_chunks': stored_chunks
         }
         
         saved_transaction = await transaction_repository.create_transaction(transaction_data)
+        for index, chunk in enumerate(chunks, start=1):
+            await transaction_repository.save_transaction_chunk(saved_transaction['id'], index, json.loads(chunk))
+        await self._save_behavior(user_id, saved_transaction['id'], analysis, monthly_income)
         
-        # Analyze financial behavior
-        analysis = financial_analyzer.analyze_transactions(transactions, monthly_income)
-        
-        # Save financial behavior
+        return {
+            'id': saved_transaction['id'],
+            'user_id': user_id,
+            'file_name': file_name,
+            'transactions_count': count,
+            'new_transactions_count': new_count,
+            'upload_date': saved_transaction['upload_date'],
+            'message': f'Successfully uploaded and analyzed {count} transactions ({count - new_count} already on file)'
+        }
+    
+    @staticmethod
+    async def _save_behavior(user_id: str, transaction_id: str, analysis: Dict, monthly_income: float):
         behavior_data = {
             'user_id': user_id,
-            'transaction_id': saved_transaction['id'],
+            'transaction_id': transaction_id,
+            'monthly_income': monthly_income,
             'total_score': analysis['total_score'],
             'behavior_rating': analysis['behavior_rating'],
             'category_scores': analysis['category_scores'],
             'cash_inflow_pattern': analysis['cash_inflow_pattern'],
             'liquidity_resilience_days': analysis['liquidity_resilience_days'],
             'transaction_depth_days': analysis['transaction_depth_days'],
-            'has_stable_inflow': analysis['has_stable_inflow']
+            'has_stable_inflow': analysis['has_stable_inflow'],
+            'cash_flow': analysis['cash_flow']
         }
-        
         await transaction_repository.save_financial_behavior(behavior_data)
+    
+    async def _repeat_upload(self, user_id: str, existing: Dict, file_name: str, monthly_income: float,
+                             aggregates: Dict = None) -> Dict:
+        """
+        Response for an upload whose transactions are already on file
         
+        Nothing is parsed or stored again, but the latest behaviour score is
+        recomputed from the user's aggregates when it was made with another
+        monthly income, so a re-upload can still correct the income.
+        """
+        if aggregates is None:
+            current = await transaction_repository.get_financial_aggregates(user_id)
+            aggregates = current['aggregates'] if current else None
+        behavior = await transaction_repository.get_financial_behavior(user_id)
+        scored_income = behavior.get('monthly_income') if behavior else None
+        rescored = bool(aggregates) and (scored_income is None or float(scored_income) != float(monthly_income))
+        if rescored:
+            analysis = financial_analyzer.score_aggregates(aggregates, monthly_income)
+            await self._save_behavior(user_id, existing['id'], analysis, monthly_income)
+        
+        note = 're-scored with the new monthly income' if rescored else 'returning its stored analysis'
         return {
-            'id': saved_transaction['id'],
-            'user_id': user_id,
+            'id': existing['id'],
+            'user_id': existing['user_id'],
+            'file_name': file_name,
+            'transactions_count': existing['transactions_count'],
+            'new_transactions_count': 0,
+            'upload_date': existing['upload_date'],
+            'repeat_upload': True,
+            'message': f"Same transactions as '{existing['file_name']}'; {note}"
+        }
+    
+    async def submit_transaction_upload(self, user_id: str, file: UploadFile, monthly_income: float) -> Dict:
+        """
+        Queue an upload for background processing
+        
+        The file is checked (type, size) and copied to UPLOAD_JOB_DIR before
+        the request returns, since the upload itself is gone afterwards.
+        
+        Raises:
+            HTTPException: 400/413 for a bad file; 503 when the queue is full
+        """
+        fd, path = tempfile.mkstemp(prefix='upload-', dir=self._upload_dir())
+        os.close(fd)
+        try:
+            size, file_hash = await run_in_threadpool(transaction_parser.save_upload, file, path)
+        except BaseException:
+            os.remove(path)
+            raise
+        return await self._submit_job(UPLOAD_JOB, {
+            'user_id': str(user_id),
+            'path': path,
             'file_name': file.filename,
-            'transactions_count': len(transactions),
-            'upload_date': saved_transaction['upload_date'],
-            'message': f'Successfully uploaded and analyzed {len(transactions)} transactions'
+            'size': size,
+            'file_hash': file_hash,
+            'monthly_income': monthly_income
+        }, cleanup=lambda: os.remove(path))
+    
+    @staticmethod
+    def _remove_upload(payload: Dict):
+        if os.path.exists(payload['path']):
+            os.remove(payload['path'])
+    
+    @staticmethod
+    def _remove_bulk_upload(payload: Dict):
+        shutil.rmtree(payload['directory'], ignore_errors=True)
+    
+    @staticmethod
+    def _upload_dir() -> str:
+        directory = settings.UPLOAD_JOB_DIR or tempfile.gettempdir()
+        os.makedirs(directory, exist_ok=True)
+        return directory
+    
+    async def _submit_job(self, kind: str, payload: Dict, cleanup: Callable[[], None]) -> Dict:
+        """Queue a job for payload's user, running cleanup if it cannot be queued"""
+        try:
+            job = await self.jobs.submit(kind, payload, owner=payload['user_id'])
+        except JobQueueFull:
+            cleanup()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many uploads are being processed, please retry shortly"
+            )
+        except BaseException:
+            cleanup()
+            raise
+        return self._job_response(job)
+    
+    async def _run_upload_job(self, payload: Dict, progress: Callable[[Dict], None]) -> Dict:
+        try:
+            with open(payload['path'], 'rb') as f:
+                file = UploadFile(f, filename=payload['file_name'], size=payload['size'])
+                return await self.process_transaction_upload(
+                    payload['user_id'], file, payload['monthly_income'], progress, payload.get('file_hash')
+                )
+        finally:
+            self._remove_upload(payload)
+    
+    async def _save_bulk_upload(self, files: List[UploadFile]) -> Tuple[str, List[Dict]]:
+        """Save every statement of a bulk upload (zip archives unpacked) to a new directory"""
+        directory = tempfile.mkdtemp(prefix='bulk-upload-', dir=self._upload_dir())
+        statements = []
+        try:
+            for file in files:
+                statements += await run_in_threadpool(
+                    transaction_parser.save_statements, file, directory, settings.BULK_MAX_FILES - len(statements)
+                )
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        return directory, statements
+    
+    @staticmethod
+    def _bulk_file_name(files: List[UploadFile]) -> str:
+        return files[0].filename if len(files) == 1 else f'{len(files)} files'
+    
+    async def process_bulk_upload(self, user_id: str, files: List[UploadFile], monthly_income: float) -> Dict:
+        """
+        Analyze several statements (or zip archives of them) as one transaction history
+        
+        The statements are parsed in parallel by the statement pool, and a
+        transaction found in more than one of them (overlapping periods)
+        counts once. The result is merged and stored like a single upload.
+        """
+        directory, statements = await self._save_bulk_upload(files)
+        try:
+            return await self._process_statements(str(user_id), statements, monthly_income, self._bulk_file_name(files))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    
+    async def submit_bulk_upload(self, user_id: str, files: List[UploadFile], monthly_income: float) -> Dict:
+        """Queue a bulk upload for background processing (see process_bulk_upload and submit_transaction_upload)"""
+        directory, statements = await self._save_bulk_upload(files)
+        return await self._submit_job(BULK_UPLOAD_JOB, {
+            'user_id': str(user_id),
+            'directory': directory,
+            'statements': statements,
+            'file_name': self._bulk_file_name(files),
+            'monthly_income': monthly_income
+        }, cleanup=lambda: shutil.rmtree(directory, ignore_errors=True))
+    
+    async def _run_bulk_upload_job(self, payload: Dict, progress: Callable[[Dict], None]) -> Dict:
+        try:
+            return await self._process_statements(
+                payload['user_id'], payload['statements'], payload['monthly_income'], payload['file_name'], progress
+            )
+        finally:
+            self._remove_bulk_upload(payload)
+    
+    async def _process_statements(self, user_id: str, statements: List[Dict], monthly_income: float,
+                                  file_name: str, progress: Callable[[Dict], None] = None) -> Dict:
+        # The same set of files, in any order, is a repeat upload
+        file_hash = hashlib.sha256(''.join(sorted(s['sha256'] for s in statements)).encode()).hexdigest()
+        existing = await transaction_repository.find_transaction_upload(user_id, file_hash=file_hash)
+        if existing:
+            return await self._repeat_upload(user_id, existing, file_name, monthly_income)
+        
+        if progress:
+            progress({'stage': 'parsing', 'files': len(statements)})
+        # Workers return each file's analysis rows and keys; only merging them is left here
+        parsed = await self.statements.parse(statements)
+        rows = sum(result['count'] for result in parsed)
+        merged_rows, keys, records = await run_in_threadpool(merge_statements, parsed)
+        digest = KeyDigest()
+        digest.update(keys)
+        
+        ingested = await run_in_threadpool(self._ingest, [(merged_rows, keys, records)], progress)
+        result = await self._save_upload(user_id, file_name, file_hash, digest.hexdigest(), ingested, monthly_income, progress)
+        if not result.get('repeat_upload'):
+            count, new_count = result['transactions_count'], result['new_transactions_count']
+            result['message'] = (
+                f'Successfully uploaded and analyzed {count} transactions from {len(statements)} statements '
+                f'({rows - count} repeated across statements, {count - new_count} already on file)'
+            )
+        result['statements_count'] = len(statements)
+        return result
+    
+    async def get_upload_job(self, user_id: str, job_id: str) -> Dict:
+        """Status of a background upload; other users' jobs are reported as not found"""
+        job = await self.jobs.get(job_id)
+        if job is None or job['owner'] != str(user_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Upload job not found"
+            )
+        return self._job_response(job)
+    
+    @staticmethod
+    def _job_response(job: Dict) -> Dict:
+        return {
+            'job_id': job['id'],
+            'status': job['status'],
+            'progress': job['progress'],
+            'result': job['result'],
+            'error': job['error'],
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at']
         }
     
     async def get_financial_behavior(self, user_id: str) -> Dict:
@@ -1,7 +1,23 @@
-from typing import List, Dict, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
 from app.config.settings import settings
 from datetime import datetime, timedelta
-import re
+from itertools import islice
+import logging
+import numpy as np
+import pandas as pd
+from app.utils.keyword_matcher import KeywordMatcher
+from app.utils.transaction_categorizer import TransactionCategorizer
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_COLUMNS = ['date', 'description', 'amount', 'type']
+
+# Rows per DataFrame when analyzing a stream of transaction dicts
+CHUNK_ROWS = 100000
+
+# Columns of the monthly cash-flow matrix (see cash_flow_matrix)
+CASH_FLOW_COLUMNS = ['income', 'spending', 'credits', 'debits']
+INCOME, SPENDING, CREDITS, DEBITS = range(len(CASH_FLOW_COLUMNS))
 
 class FinancialAnalyzer:
     # Category keywords for classification
@@ -15,7 +31,19 @@ class FinancialAnalyzer:
         'entertainment': ['movie', 'cinema', 'netflix', 'spotify', 'gaming', 'entertainment', 'concert'],
     }
     
-    def __init__(self):
+    # Recurring inflow: income in at least this many months, at steady intervals
+    RECURRING_INFLOW_MONTHS = 3
+    RECURRING_INFLOW_REGULARITY = 0.5
+    # Stable inflow: income in most months, varying little from month to month
+    STABLE_INFLOW_PERIODICITY = 0.75
+    STABLE_INCOME_VARIATION = 0.5
+    
+    def __init__(self, categorizer: TransactionCategorizer = None):
+        """
+        Args:
+            categorizer: Learned categorizer for descriptions no keyword
+                matches (defaults to the one at CATEGORIZER_MODEL_PATH, if set)
+        """
         self.thresholds = {
             'transport': settings.TRANSPORT_THRESHOLD / 100,
             'education': settings.EDUCATION_THRESHOLD / 100,
@@ -26,44 +54,182 @@ class FinancialAnalyzer:
             'entertainment': settings.ENTERTAINMENT_THRESHOLD / 100,
             'others': settings.OTHERS_THRESHOLD / 100
         }
+        # Category order is match priority; 'others' is the fallback
+        self.matcher = KeywordMatcher(self.CATEGORY_KEYWORDS, 'others', memo_size=settings.CATEGORY_MEMO_SIZE)
+        self.categories = self.matcher.categories
+        if categorizer is None and settings.CATEGORIZER_MODEL_PATH:
+            categorizer = self._load_categorizer(settings.CATEGORIZER_MODEL_PATH)
+        self.categorizer = categorizer
+        if categorizer is not None:
+            # Categorizer class -> category index; unknown classes and UNKNOWN (-1, the last entry) are 'others'
+            others = self.matcher.default_index
+            self._learned_categories = np.array(
+                [self.categories.index(c) if c in self.categories else others for c in categorizer.classes] + [others]
+            )
+    
+    def _load_categorizer(self, path: str):
+        """Learned categorizer; one that fails to load only leaves the keyword rules in place"""
+        try:
+            return TransactionCategorizer.load(
+                path, min_confidence=settings.CATEGORIZER_MIN_CONFIDENCE, memo_size=settings.CATEGORY_MEMO_SIZE
+            )
+        except Exception as e:
+            logger.error("Categorizer %s not loaded, using keyword rules only: %s", path, e)
+            return None
     
     def categorize_transaction(self, description: str) -> str:
         """Categorize transaction based on description"""
-        description = description.lower()
+        if self.categorizer is not None:
+            return self.categories[self.categorize_descriptions([description])[0]]
+        return self.matcher.category(description)
+    
+    def categorize_descriptions(self, descriptions: np.ndarray) -> np.ndarray:
+        """
+        Category index (into self.categories) for every description
         
-        for category, keywords in self.CATEGORY_KEYWORDS.items():
-            if any(keyword in description for keyword in keywords):
-                return category
+        Keyword rules go first; with a learned categorizer, descriptions
+        they leave in 'others' are scored together in one batch.
+        """
+        categories = self.matcher.match_array(descriptions)
+        if self.categorizer is not None:
+            unmatched = np.flatnonzero(categories == self.matcher.default_index)
+            if len(unmatched):
+                predicted = self.categorizer.predict(np.asarray(descriptions, dtype=object)[unmatched])
+                categories[unmatched] = self._learned_categories[predicted]
+        return categories
+    
+    def analyze_transactions(self, transactions: Union[pd.DataFrame, Iterable[Dict]], monthly_income: float) -> Dict:
+        """
+        Analyze financial behavior from transactions
         
-        return 'others'
-    
-    def analyze_transactions(self, transactions: List[Dict], monthly_income: float) -> Dict:
-        """Analyze financial behavior from transactions"""
-        # Categorize all transactions
-        for trans in transactions:
-            if trans['type'] == 'debit':
-                trans['category'] = self.categorize_transaction(trans['description'])
+        Args:
+            transactions: DataFrame with the TRANSACTION_COLUMNS, or any
+                iterable of transaction dicts (a generator is consumed in
+                CHUNK_ROWS pieces, so it is never held whole)
+            monthly_income: Declared monthly income
+        """
+        if isinstance(transactions, pd.DataFrame):
+            return self.analyze_frames([transactions], monthly_income)
+        return self.analyze_frames(self._frames(transactions), monthly_income)
+    
+    @staticmethod
+    def _frames(transactions: Iterable[Dict]) -> Iterator[pd.DataFrame]:
+        rows = iter(transactions)
+        while True:
+            chunk = list(islice(rows, CHUNK_ROWS))
+            if not chunk:
+                return
+            yield pd.DataFrame.from_records(chunk, columns=TRANSACTION_COLUMNS)
+    
+    def analyze_frames(self, frames: Iterable[pd.DataFrame], monthly_income: float) -> Dict:
+        """
+        Analyze financial behavior from a stream of cleaned transaction DataFrames
         
-        # Calculate category-wise spending
-        category_spending = {cat: 0.0 for cat in self.thresholds.keys()}
-        total_spending = 0.0
-        total_income = 0.0
+        Every frame is reduced with vectorized masks and per-category sums,
+        so only running totals are kept between frames.
+        """
+        return self.score_aggregates(self.aggregate_frames(frames), monthly_income)
+    
+    def aggregate_frames(self, frames: Iterable[pd.DataFrame]) -> Dict:
+        """
+        Running totals for a stream of cleaned transaction DataFrames
+        
+        Returns:
+            JSON-ready aggregates: transaction, credit and debit counts,
+            total income and spending, spending per category, first and last
+            date, and the same sums per calendar month ('YYYY-MM'). Aggregates
+            of separate streams combine with merge_aggregates.
+        """
+        aggregates = empty_aggregates(self.categories)
+        for frame in frames:
+            if not frame.empty:
+                aggregates = merge_aggregates(aggregates, self.aggregate_rows(self.analysis_rows(frame)))
+        return aggregates
+    
+    def analysis_rows(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        What aggregation needs of each transaction of a cleaned frame, in
+        about 20 bytes a row: day (NaT when unusable), amount, credit and
+        debit flags, and the debit's category index (-1 for other rows).
+        Aggregate any subset of them with aggregate_rows.
+        """
+        types = frame['type'].to_numpy()
+        debit = types == 'debit'
+        day_codes, days = self._transaction_days(frame['date'].to_numpy())
+        categories = np.full(len(frame), -1, dtype=np.int16)
+        categories[debit] = self.categorize_descriptions(frame['description'].to_numpy()[debit])
+        return pd.DataFrame({
+            'day': days.to_numpy()[day_codes],
+            'amount': frame['amount'].to_numpy(dtype=np.float64),
+            'credit': types == 'credit',
+            'debit': debit,
+            'category': categories,
+        })
+    
+    def aggregate_rows(self, rows: pd.DataFrame) -> Dict:
+        """Aggregates (see aggregate_frames) of analysis_rows"""
+        if rows.empty:
+            return empty_aggregates(self.categories)
+        amounts = rows['amount'].to_numpy()
+        debit = rows['debit'].to_numpy()
+        credit = rows['credit'].to_numpy()
+        n_categories = len(self.categories)
+        
+        day_codes, days = pd.factorize(rows['day'].to_numpy(), use_na_sentinel=False)
+        days = pd.DatetimeIndex(days)
+        month_codes, months = pd.factorize(pd.Series(days.strftime('%Y-%m'), dtype=object).fillna(''))
+        row_months = month_codes[day_codes]
         
-        for trans in transactions:
-            if trans['type'] == 'debit':
-                category = trans.get('category', 'others')
-                amount = abs(trans['amount'])
-                category_spending[category] += amount
-                total_spending += amount
-            elif trans['type'] == 'credit':
-                total_income += trans['amount']
+        # Spending per (month, category) from debits; income and credit count per month from credits
+        debits = np.abs(amounts[debit])
+        categories = rows['category'].to_numpy()[debit].astype(np.intp)
+        spending = np.bincount(
+            row_months[debit] * n_categories + categories, weights=debits, minlength=len(months) * n_categories
+        ).reshape(len(months), n_categories)
+        income = np.bincount(row_months[credit], weights=amounts[credit], minlength=len(months))
+        credits = np.bincount(row_months[credit], minlength=len(months))
+        debit_counts = np.bincount(row_months[debit], minlength=len(months))
+        
+        valid_days = days.dropna()
+        return {
+            'transaction_count': len(rows),
+            'credit_count': int(credits.sum()),
+            'debit_count': int(debit_counts.sum()),
+            'total_income': float(amounts[credit].sum()),
+            'total_spending': float(debits.sum()),
+            'category_spending': dict(zip(self.categories, np.bincount(categories, weights=debits, minlength=n_categories).tolist())),
+            'first_date': valid_days.min().isoformat() if len(valid_days) else None,
+            'last_date': valid_days.max().isoformat() if len(valid_days) else None,
+            'monthly': {
+                month: {
+                    'income': income[i].item(),
+                    'spending': spending[i].sum().item(),
+                    'credits': int(credits[i]),
+                    'debits': int(debit_counts[i]),
+                    'category_spending': dict(zip(self.categories, spending[i].tolist())),
+                }
+                # Rows without a usable date only count towards the totals
+                for i, month in enumerate(months) if month
+            },
+        }
+    
+    def score_aggregates(self, aggregates: Dict, monthly_income: float) -> Dict:
+        """
+        Behaviour score from aggregates (of one statement or a user's merged history)
         
+        Scoring merged aggregates gives the same result as analyzing all of
+        their transactions at once. A category's percentage is its average
+        spending per month covered, against the monthly income, so a longer
+        history does not push the ratios up.
+        """
         # Calculate percentages and scores
         category_scores = {}
         points = 0
+        months = max(1, len(aggregates['monthly']))
         
-        for category, spending in category_spending.items():
-            percentage = (spending / monthly_income) if monthly_income > 0 else 0
+        for category in self.categories:
+            spending = aggregates['category_spending'].get(category, 0.0)
+            percentage = (spending / months / monthly_income) if monthly_income > 0 else 0
             threshold = self.thresholds[category]
             
             # Award point if within threshold
@@ -85,56 +251,161 @@ class FinancialAnalyzer:
         else:
             behavior_rating = 'bad'
         
-        # Additional metrics
-        cash_inflow_pattern = self._analyze_inflow_pattern(transactions)
-        liquidity_resilience_days = self._calculate_liquidity_resilience(transactions, total_spending)
-        transaction_depth_days = self._calculate_transaction_depth(transactions)
-        has_stable_inflow = self._check_stable_inflow(transactions)
-        
+        cash_flow = self._cash_flow_features(cash_flow_matrix(aggregates))
+        first_date, last_date = aggregates['first_date'], aggregates['last_date']
         return {
             'total_score': points,
             'behavior_rating': behavior_rating,
             'category_scores': category_scores,
-            'cash_inflow_pattern': cash_inflow_pattern,
-            'liquidity_resilience_days': liquidity_resilience_days,
-            'transaction_depth_days': transaction_depth_days,
-            'has_stable_inflow': has_stable_inflow
+            'cash_inflow_pattern': (
+                "recurring"
+                if cash_flow['inflow_months'] >= self.RECURRING_INFLOW_MONTHS
+                and cash_flow['inflow_regularity'] >= self.RECURRING_INFLOW_REGULARITY
+                else "irregular"
+            ),
+            'liquidity_resilience_days': cash_flow['liquidity_runway_days'],
+            # Number of days covered by transaction history
+            'transaction_depth_days': (
+                int((pd.Timestamp(last_date) - pd.Timestamp(first_date)).days) if first_date is not None else 0
+            ),
+            'has_stable_inflow': bool(
+                cash_flow['inflow_months'] >= 2
+                and cash_flow['inflow_periodicity'] >= self.STABLE_INFLOW_PERIODICITY
+                and cash_flow['income_variation'] <= self.STABLE_INCOME_VARIATION
+            ),
+            'cash_flow': cash_flow
         }
     
-    def _analyze_inflow_pattern(self, transactions: List[Dict]) -> str:
-        """Analyze if inflow is recurring"""
-        credit_transactions = [t for t in transactions if t['type'] == 'credit']
-        if len(credit_transactions) >= 3:
-            return "recurring"
-        return "irregular"
-    
-    def _calculate_liquidity_resilience(self, transactions: List[Dict], avg_monthly_spending: float) -> int:
-        """Calculate how many days user can survive without income"""
-        credit_sum = sum(t['amount'] for t in transactions if t['type'] == 'credit')
-        debit_sum = sum(abs(t['amount']) for t in transactions if t['type'] == 'debit')
+    @staticmethod
+    def _cash_flow_features(matrix: np.ndarray) -> Dict:
+        """
+        Time-structure features of a monthly cash-flow matrix
+        
+        - inflow_periodicity: share of months with at least one credit
+        - inflow_regularity: 1 - coefficient of variation of the gaps between
+          those months (1 for income every month or every quarter alike)
+        - income_variation: coefficient of variation of monthly income
+        - net_balance / min_balance: running income minus spending at the end
+          and at its lowest month end, from the start of the history
+        - liquidity_runway_days: days the final balance lasts at the
+          average monthly spending (30-day months)
+        """
+        income, spending = matrix[:, INCOME], matrix[:, SPENDING]
+        inflow_months = np.flatnonzero(matrix[:, CREDITS] > 0)
+        gaps = np.diff(inflow_months)
+        balance = np.cumsum(income - spending)
+        mean_income = income.mean() if len(income) else 0.0
+        mean_spending = spending.mean() if len(spending) else 0.0
+        net_balance = float(balance[-1]) if len(balance) else 0.0
         
-        balance = credit_sum - debit_sum
-        daily_spending = avg_monthly_spending / 30 if avg_monthly_spending > 0 else 0
+        regularity = max(0.0, 1 - gaps.std() / gaps.mean()) if len(gaps) else 0.0
+        variation = income.std() / mean_income if mean_income > 0 else 0.0
+        runway = int(net_balance / (mean_spending / 30)) if mean_spending > 0 else 0
+        return {
+            'months': len(matrix),
+            'inflow_months': len(inflow_months),
+            'inflow_periodicity': round(len(inflow_months) / len(matrix), 4) if len(matrix) else 0.0,
+            'inflow_regularity': round(float(regularity), 4),
+            'income_variation': round(float(variation), 4),
+            'net_balance': round(net_balance, 2),
+            'min_balance': round(float(balance.min()), 2) if len(balance) else 0.0,
+            'liquidity_runway_days': max(0, runway),
+        }
+    
+    @staticmethod
+    def _transaction_days(values: np.ndarray) -> Tuple[np.ndarray, pd.DatetimeIndex]:
+        """
+        Date of every transaction, as (code per row, distinct dates)
         
-        if daily_spending > 0:
-            resilience_days = int(balance / daily_spending)
-            return max(0, resilience_days)
-        return 0
-    
-    def _calculate_transaction_depth(self, transactions: List[Dict]) -> int:
-        """Calculate number of days covered by transaction history"""
-        if not transactions:
-            return 0
+        Strings are read up to the first space (the date part), as
+        datetime.fromisoformat(value.split()[0]) would, with one parse over
+        the distinct values; date/datetime objects are used as they are.
+        Time zones are converted to UTC. Values that are not an ISO date, or
+        not a real one ('31/01/2024', '2024-02-30'), become NaT.
+        """
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        uniques = np.asarray(uniques, dtype=object)
+        is_text = np.fromiter((isinstance(v, str) for v in uniques), dtype=bool, count=len(uniques))
+        keys = uniques.copy()
+        keys[is_text] = pd.Series(uniques[is_text], dtype=object).str.split(n=1).str[0].to_numpy()
+        key_codes, distinct = pd.factorize(keys, use_na_sentinel=False)
+        distinct = np.asarray(distinct, dtype=object)
+        text_keys = np.fromiter((isinstance(v, str) for v in distinct), dtype=bool, count=len(distinct))
         
-        dates = [datetime.fromisoformat(t['date'].split()[0]) if isinstance(t['date'], str) else t['date'] for t in transactions]
-        if dates:
-            date_range = (max(dates) - min(dates)).days
-            return date_range
-        return 0
-    
-    def _check_stable_inflow(self, transactions: List[Dict]) -> bool:
-        """Check if there's stable monthly inflow"""
-        credit_transactions = [t for t in transactions if t['type'] == 'credit']
-        return len(credit_transactions) >= 2
+        days = np.empty(len(distinct), dtype='datetime64[ns]')
+        days[text_keys] = pd.to_datetime(pd.Series(distinct[text_keys], dtype=object), format='ISO8601', utc=True, errors='coerce').dt.tz_localize(None).to_numpy()
+        if not text_keys.all():
+            days[~text_keys] = pd.to_datetime(pd.Series(distinct[~text_keys], dtype=object), utc=True, errors='coerce').dt.tz_localize(None).to_numpy()
+        return key_codes[codes], pd.DatetimeIndex(days)
+    
+
+def empty_aggregates(categories: List[str]) -> Dict:
+    """Aggregates of no transactions (see FinancialAnalyzer.aggregate_frames)"""
+    return {
+        'transaction_count': 0,
+        'credit_count': 0,
+        'debit_count': 0,
+        'total_income': 0.0,
+        'total_spending': 0.0,
+        'category_spending': {category: 0.0 for category in categories},
+        'first_date': None,
+        'last_date': None,
+        'monthly': {},
+    }
+
+
+def cash_flow_matrix(aggregates: Dict) -> np.ndarray:
+    """
+    Monthly cash flow as a (months, CASH_FLOW_COLUMNS) array
+    
+    Rows run over every calendar month from the first to the last with
+    transactions; months without any are zeros. Transactions without a
+    usable date are not in any month, so with no dated ones at all the
+    totals make up a single row.
+    """
+    monthly = aggregates['monthly']
+    if not monthly:
+        if not aggregates['transaction_count']:
+            return np.zeros((0, len(CASH_FLOW_COLUMNS)))
+        return np.array([[aggregates['total_income'], aggregates['total_spending'],
+                          aggregates['credit_count'], aggregates['debit_count']]], dtype=np.float64)
+    ordinals = pd.PeriodIndex(list(monthly), freq='M').asi8
+    rows = ordinals - ordinals.min()
+    matrix = np.zeros((rows.max() + 1, len(CASH_FLOW_COLUMNS)))
+    matrix[rows] = [[sums[column] for column in CASH_FLOW_COLUMNS] for sums in monthly.values()]
+    return matrix
+
+
+def _add_sums(a: Dict, b: Dict) -> Dict:
+    return {key: a.get(key, 0) + b.get(key, 0) for key in {**a, **b}}
+
+
+def merge_aggregates(a: Dict, b: Dict) -> Dict:
+    """
+    Aggregates of two disjoint sets of transactions combined
+    
+    Costs O(categories + months), whatever the number of transactions.
+    """
+    dates = [date for date in (a['first_date'], a['last_date'], b['first_date'], b['last_date']) if date is not None]
+    monthly = dict(a['monthly'])
+    for month, sums in b['monthly'].items():
+        if month in monthly:
+            sums = {
+                **_add_sums({k: v for k, v in monthly[month].items() if k != 'category_spending'},
+                            {k: v for k, v in sums.items() if k != 'category_spending'}),
+                'category_spending': _add_sums(monthly[month]['category_spending'], sums['category_spending']),
+            }
+        monthly[month] = sums
+    return {
+        'transaction_count': a['transaction_count'] + b['transaction_count'],
+        'credit_count': a['credit_count'] + b['credit_count'],
+        'debit_count': a['debit_count'] + b['debit_count'],
+        'total_income': a['total_income'] + b['total_income'],
+        'total_spending': a['total_spending'] + b['total_spending'],
+        'category_spending': _add_sums(a['category_spending'], b['category_spending']),
+        'first_date': min(dates, key=pd.Timestamp) if dates else None,
+        'last_date': max(dates, key=pd.Timestamp) if dates else None,
+        'monthly': dict(sorted(monthly.items())),
+    }
 
 financial_analyzer = FinancialAnalyzer()
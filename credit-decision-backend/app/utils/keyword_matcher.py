@@ -0,0 +1,145 @@
+"""
+Keyword Matcher - categorizes text by keyword with compiled regexes
+One regex of every keyword finds the leftmost keyword in a single scan; its
+category is the answer unless a higher-priority category also has a keyword
+in the text. That is settled by a second regex: a top-level alternation
+with one branch per higher-priority category, in order, each scanning for
+any of its keywords. The regex engine tries the branches in order, so the
+first category with a keyword anywhere in the text wins, exactly like
+checking the categories one by one.
+
+Texts are lower-cased and, when no keyword contains a digit or '#', have
+their digits masked, so descriptions that differ only by reference numbers
+share one entry in the bounded memo.
+"""
+
+import re
+import threading
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Dict, Hashable, Iterable, List, Optional
+
+_DIGITS = (ord('0'), ord('9'))
+_DIGIT_MASK = ord('#')
+_DIGIT_TABLE = str.maketrans('0123456789', '#' * 10)
+
+
+def mask_digits(text: pa.LargeStringArray) -> pa.LargeStringArray:
+    """
+    Replace every digit with '#', working on the UTF-8 byte buffer
+
+    Digit bytes never occur inside a multi-byte UTF-8 character, so this is
+    safe for any text. Reference numbers stop making descriptions distinct.
+    """
+    if len(text) == 0:
+        return text
+    validity, offsets, data = text.buffers()
+    chars = np.frombuffer(data, dtype=np.uint8).copy()
+    chars[(chars >= _DIGITS[0]) & (chars <= _DIGITS[1])] = _DIGIT_MASK
+    return pa.LargeStringArray.from_buffers(len(text), offsets, pa.py_buffer(chars), validity, text.null_count, text.offset)
+
+
+class BoundedMemo:
+    """Dict-backed memo that drops its oldest entries once max_size is reached (0 disables it)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: Dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: int = None) -> Optional[int]:
+        return self._entries.get(key, default)
+
+    def put(self, key: Hashable, value: int):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            while len(self._entries) >= self.max_size:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class KeywordMatcher:
+    def __init__(self, keywords: Dict[str, List[str]], default: str = 'others', memo_size: int = 100000):
+        """
+        Args:
+            keywords: Category -> keywords (matched as lower-case substrings),
+                in priority order
+            default: Category of text no keyword matches
+            memo_size: Distinct texts whose category is remembered (0 disables the memo)
+        """
+        self.categories = list(keywords) + [default]
+        self.default_index = len(keywords)
+        self._memo = BoundedMemo(memo_size)
+
+        # A keyword listed under several categories belongs to the first
+        self._keyword_index: Dict[str, int] = {}
+        for i, words in enumerate(keywords.values()):
+            for keyword in words:
+                self._keyword_index.setdefault(keyword, i)
+        self._any = re.compile('|'.join(map(re.escape, self._keyword_index))) if self._keyword_index else None
+        branches = [
+            (i, f"(?P<c{i}>.*?(?:{'|'.join(map(re.escape, words))}))")
+            for i, words in enumerate(keywords.values()) if words
+        ]
+        # _earlier[i] matches only the categories before category i (None when there are none)
+        self._earlier = []
+        for i in range(len(keywords)):
+            before = [branch for j, branch in branches if j < i]
+            self._earlier.append(re.compile('|'.join(before), re.DOTALL) if before else None)
+        # Masking digits cannot change a match as long as no keyword contains a digit or '#'
+        self.masks_digits = not any(re.search(r'[0-9#]', keyword) for words in keywords.values() for keyword in words)
+
+    def _match(self, text: str) -> int:
+        text = text.lower()
+        found = self._any.search(text) if self._any is not None else None
+        if found is None:
+            return self.default_index
+        index = self._keyword_index[found.group()]
+        if self._earlier[index] is not None:
+            earlier = self._earlier[index].match(text)
+            if earlier is not None:
+                index = int(earlier.lastgroup[1:])
+        return index
+
+    def _lookup(self, key: str) -> int:
+        index = self._memo.get(key)
+        if index is None:
+            index = self._match(key)
+            self._memo.put(key, index)
+        return index
+
+    def match(self, text: str) -> int:
+        """Category index (into self.categories) of one text"""
+        return self._lookup(text.translate(_DIGIT_TABLE) if self.masks_digits else text)
+
+    def category(self, text: str) -> str:
+        """Category of one text"""
+        return self.categories[self.match(text)]
+
+    def match_array(self, texts: Iterable) -> np.ndarray:
+        """
+        Category index for every text in a column (None counts as empty text)
+
+        The column is dictionary-encoded after masking, so each distinct
+        text is matched once (or found in the memo) and the result is
+        mapped back to every row.
+        """
+        text = pc.fill_null(pa.array(texts, type=pa.large_string(), from_pandas=True), '')
+        if self.masks_digits:
+            text = mask_digits(text)
+        encoded = pc.dictionary_encode(text)
+        lookup = self._lookup
+        unique_indices = np.fromiter(
+            (lookup(value) for value in encoded.dictionary.to_pylist()), dtype=np.intp, count=len(encoded.dictionary)
+        )
+        return unique_indices[encoded.indices.to_numpy(zero_copy_only=False)]
+
@@ -0,0 +1,188 @@
+"""
+Transaction Categorizer - learned categories for descriptions no keyword matches
+Descriptions are lower-cased, digit-masked and turned into hashed character
+n-gram counts (scaled by 1/sqrt(n-grams) per description). The n-grams are
+hashed straight from the Arrow UTF-8 buffer with numpy, so a whole
+statement becomes one sparse matrix, and scoring it is one sparse matrix
+multiply against the linear model's weights. Predictions are memoized per
+normalized description, since the same merchants recur across statements.
+
+A model is one .npz file holding the weights, the intercepts, the class
+names and a JSON string of its parameters (see scripts/train_categorizer.py).
+"""
+
+import json
+import os
+import tempfile
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from datetime import datetime, timezone
+from scipy import sparse
+from typing import Dict, Iterable, List, Tuple
+from app.utils.keyword_matcher import BoundedMemo, mask_digits
+
+CATEGORIZER_FORMAT_VERSION = 1
+DEFAULT_N_FEATURES = 1 << 18
+DEFAULT_NGRAM_RANGE = (3, 5)
+
+# Prediction when no class reaches the confidence threshold
+UNKNOWN = -1
+_MISSING = -2
+
+_HASH_PRIME = np.uint32(16777619)
+_HASH_MIX = np.uint32(2654435761)
+
+
+class CategorizerError(ValueError):
+    """Raised when a categorizer file is missing, corrupt or incompatible"""
+
+
+def normalize_descriptions(texts: Iterable) -> pa.LargeStringArray:
+    """Lower-case and digit-mask a column of descriptions (None counts as empty text)"""
+    text = pc.fill_null(pa.array(texts, type=pa.large_string(), from_pandas=True), '')
+    return mask_digits(pc.utf8_lower(text))
+
+
+def ngram_features(text: pa.LargeStringArray, n_features: int = DEFAULT_N_FEATURES,
+                   ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE) -> sparse.csr_matrix:
+    """
+    Hashed character n-gram matrix for normalized descriptions
+
+    Args:
+        text: Output of normalize_descriptions
+        n_features: Number of hash buckets (a power of two)
+        ngram_range: (min_n, max_n) n-gram lengths, in UTF-8 bytes
+
+    Returns:
+        (len(text), n_features) CSR matrix; repeated n-grams are summed by
+        the multiply rather than here
+    """
+    min_n, max_n = ngram_range
+    # Buckets come from the high bits of the mixed hash
+    shift = np.uint32(32 - (n_features.bit_length() - 1))
+    text = pa.concat_arrays([text]) if text.offset else text
+    offsets = np.frombuffer(text.buffers()[1], dtype=np.int64)[:len(text) + 1]
+    data = text.buffers()[2]
+    chars = np.frombuffer(data, dtype=np.uint8)[:offsets[-1]].astype(np.uint32) if data is not None else np.zeros(0, np.uint32)
+    lengths = np.diff(offsets)
+    # Row and end offset of the description each byte belongs to
+    ends = np.repeat(offsets[1:], lengths)
+    positions = np.arange(len(chars), dtype=np.int64)
+
+    # columns[p, n - min_n] is the bucket of the n-gram starting at byte p (-1 past the description's end)
+    columns = np.full((len(chars), max_n - min_n + 1), -1, dtype=np.int32)
+    rolling = np.zeros(len(chars), dtype=np.uint32)
+    with np.errstate(over='ignore'):
+        for n in range(1, max_n + 1):
+            span = len(chars) - n + 1
+            if span <= 0:
+                break
+            rolling[:span] = rolling[:span] * _HASH_PRIME + chars[n - 1:]
+            if n >= min_n:
+                inside = positions[:span] + n <= ends[:span]
+                buckets = ((rolling[:span] ^ np.uint32(n)) * _HASH_MIX) >> shift
+                columns[:span, n - min_n] = np.where(inside, buckets, -1)
+
+    valid = columns >= 0
+    counts = np.bincount(
+        np.repeat(np.arange(len(text)), lengths), weights=valid.sum(axis=1), minlength=len(text)
+    ).astype(np.int64)
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+    scale = np.repeat(1 / np.sqrt(np.maximum(counts, 1)), counts)
+    return sparse.csr_matrix((scale.astype(np.float32), columns[valid], indptr), shape=(len(text), n_features))
+
+
+class TransactionCategorizer:
+    def __init__(self, weights: np.ndarray, intercept: np.ndarray, classes: List[str],
+                 ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE, min_confidence: float = 0.5,
+                 memo_size: int = 100000, metadata: Dict = None):
+        """
+        Args:
+            weights: (n_features, n_classes) linear model weights
+            intercept: (n_classes,) intercepts
+            classes: Category names, in column order
+            ngram_range: n-gram lengths the model was trained with
+            min_confidence: Softmax probability below which a prediction is UNKNOWN
+            memo_size: Distinct descriptions whose prediction is remembered (0 disables the memo)
+            metadata: Training details recorded with the model
+        """
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        self.classes = list(classes)
+        self.n_features = self.weights.shape[0]
+        self.ngram_range = tuple(ngram_range)
+        self.min_confidence = min_confidence
+        self.metadata = metadata or {}
+        self._memo = BoundedMemo(memo_size)
+
+    def features(self, text: pa.LargeStringArray) -> sparse.csr_matrix:
+        return ngram_features(text, self.n_features, self.ngram_range)
+
+    def predict_proba(self, texts: Iterable) -> np.ndarray:
+        """(N, n_classes) class probabilities for raw descriptions"""
+        scores = self.features(normalize_descriptions(texts)) @ self.weights + self.intercept
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def predict(self, texts: Iterable) -> np.ndarray:
+        """
+        Class index (into self.classes) for every description, or UNKNOWN
+
+        Each distinct normalized description is looked up in the memo; the
+        rest are scored together in one sparse multiply.
+        """
+        encoded = pc.dictionary_encode(normalize_descriptions(texts))
+        keys = encoded.dictionary.to_pylist()
+        memo = self._memo
+        predictions = np.fromiter((memo.get(key, _MISSING) for key in keys), dtype=np.intp, count=len(keys))
+        missing = np.flatnonzero(predictions == _MISSING)
+        if len(missing):
+            scores = self.features(encoded.dictionary.take(missing)) @ self.weights + self.intercept
+            best = scores.argmax(axis=1)
+            # Softmax probability of the best class
+            confidence = 1 / np.exp(scores - scores[np.arange(len(best)), best][:, None]).sum(axis=1)
+            predicted = np.where(confidence >= self.min_confidence, best, UNKNOWN)
+            predictions[missing] = predicted
+            for i, value in zip(missing.tolist(), predicted.tolist()):
+                memo.put(keys[i], value)
+        return predictions[encoded.indices.to_numpy(zero_copy_only=False)]
+
+    def save(self, path: str):
+        """Write the model to one .npz file (atomically replacing any file at path)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        metadata = {
+            **self.metadata,
+            'format_version': CATEGORIZER_FORMAT_VERSION,
+            'ngram_range': list(self.ngram_range),
+            'saved_at': datetime.now(timezone.utc).isoformat(),
+        }
+        fd, staging = tempfile.mkstemp(prefix='.categorizer-', suffix='.npz', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, weights=self.weights, intercept=self.intercept,
+                         classes=np.array(self.classes, dtype=str), metadata=np.array(json.dumps(metadata)))
+            os.chmod(staging, 0o644)
+            os.replace(staging, path)
+        except BaseException:
+            if os.path.exists(staging):
+                os.remove(staging)
+            raise
+
+    @classmethod
+    def load(cls, path: str, min_confidence: float = 0.5, memo_size: int = 100000) -> 'TransactionCategorizer':
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                weights, intercept, classes = f['weights'], f['intercept'], f['classes'].tolist()
+                metadata = json.loads(str(f['metadata']))
+        except (OSError, KeyError, ValueError) as e:
+            raise CategorizerError(f"Cannot load categorizer {path}: {e}")
+        if metadata.get('format_version') != CATEGORIZER_FORMAT_VERSION:
+            raise CategorizerError(f"Unsupported categorizer format {metadata.get('format_version')} in {path}")
+        if weights.ndim != 2 or weights.shape[1] != len(classes) or intercept.shape != (len(classes),):
+            raise CategorizerError(f"Categorizer {path} has inconsistent weights")
+        if weights.shape[0] & (weights.shape[0] - 1):
+            raise CategorizerError(f"Categorizer {path} needs a power-of-two feature count")
+        return cls(weights, intercept, classes, ngram_range=metadata['ngram_range'],
+                   min_confidence=min_confidence, memo_size=memo_size, metadata=metadata)
@@ -0,0 +1,91 @@
+"""
+Transaction Keys - content identity of statement rows, for de-duplication
+A row's key is a 64-bit hash of its date part (up to the first space),
+description, amount (to the paisa) and type, plus how many
+identical rows came before it in the same upload. Re-uploading a statement,
+or one that overlaps an earlier one, reproduces the same keys, while two
+genuinely identical transactions on one day stay distinct.
+Since the keys do not depend on row order, their digest identifies an
+upload's transaction set whatever file it came in.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+# Fixed so keys stay comparable across processes and releases (16 characters)
+HASH_KEY = 'crudbud-txn-keys'
+_COLUMN_MIX = np.uint64(0x100000001B3)
+_OCCURRENCE_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _hash_text(values: np.ndarray, normalize=None) -> np.ndarray:
+    """uint64 hash of every value's text, computed once per distinct value"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    text = pd.Series(uniques, dtype=object).astype(str)
+    if normalize is not None:
+        text = normalize(text)
+    return pd.util.hash_array(text.to_numpy(dtype=object), hash_key=HASH_KEY)[codes]
+
+
+def content_hashes(frame: pd.DataFrame) -> np.ndarray:
+    """uint64 hash of (date part, description, amount, type) for every row of a cleaned frame"""
+    columns = [
+        _hash_text(frame['date'].to_numpy(), lambda text: text.str.split(n=1).str[0].fillna('')),
+        pd.util.hash_array(frame['description'].to_numpy(dtype=object), hash_key=HASH_KEY),
+        pd.util.hash_array(np.round(frame['amount'].to_numpy(dtype=np.float64) * 100).astype(np.int64)),
+        _hash_text(frame['type'].to_numpy()),
+    ]
+    combined = np.zeros(len(frame), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for column in columns:
+            combined = combined * _COLUMN_MIX ^ column
+    return pd.util.hash_array(combined)
+
+
+class KeyDigest:
+    """Order-independent digest of a set of keys, added in any number of parts"""
+
+    def __init__(self):
+        self.count = 0
+        self._sum = np.uint64(0)
+        self._square_sum = np.uint64(0)
+
+    def update(self, keys: np.ndarray):
+        keys = keys.view(np.uint64)
+        with np.errstate(over='ignore'):
+            self._sum += keys.sum(dtype=np.uint64)
+            self._square_sum += (keys * keys).sum(dtype=np.uint64)
+        self.count += len(keys)
+
+    def hexdigest(self) -> str:
+        return f'{self.count:x}-{int(self._sum):016x}{int(self._square_sum):016x}'
+
+
+class TransactionKeys:
+    """Keys for the frames of one upload, numbering repeated rows across frames"""
+
+    def __init__(self):
+        # Rows seen so far per content hash
+        self._seen: Dict[int, int] = {}
+        self._digest = KeyDigest()
+
+    def __call__(self, frame: pd.DataFrame) -> np.ndarray:
+        """int64 key for every row of the next frame of the upload"""
+        hashes = content_hashes(frame)
+        occurrence = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+        seen = self._seen
+        if seen:
+            occurrence += np.fromiter((seen.get(h, 0) for h in hashes.tolist()), dtype=np.int64, count=len(hashes))
+        values, counts = np.unique(hashes, return_counts=True)
+        for value, count in zip(values.tolist(), counts.tolist()):
+            seen[value] = seen.get(value, 0) + count
+        with np.errstate(over='ignore'):
+            mixed = hashes ^ (occurrence.astype(np.uint64) * _OCCURRENCE_MIX)
+        keys = pd.util.hash_array(mixed).view(np.int64)
+        self._digest.update(keys)
+        return keys
+
+    def digest(self) -> str:
+        """Identifies the transaction set of every frame so far, in any order or split"""
+        return self._digest.hexdigest()
@@ -1,56 +1,302 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from itertools import islice
+import numpy as np
 import pandas as pd
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional, Tuple
 from fastapi import UploadFile, HTTPException
-import io
+from fastapi.concurrency import run_in_threadpool
+from app.config.settings import settings
+from app.utils.financial_analyzer import CHUNK_ROWS, TRANSACTION_COLUMNS
+from app.utils.xlsx_reader import XlsxWorkbook
+
+# Bytes read from the upload per call
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+REQUIRED_COLUMNS = TRANSACTION_COLUMNS
+TEXT_DTYPES = {'date': str, 'description': str, 'type': str}
+# Leading rows of each Excel sheet searched for the header (exports often open with a title block)
+HEADER_SCAN_ROWS = 20
+
+
+class SizeLimitedReader(io.RawIOBase):
+    """
+    Read-only stream over an upload that fails once more than max_bytes
+    have been read, hashing the bytes (SHA-256 unless digest is given) as they pass
+    """
+
+    def __init__(self, raw, max_bytes: int, digest=None):
+        self.raw = raw
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self.digest = hashlib.sha256() if digest is None else digest
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.raw.read(len(buffer))
+        self.bytes_read += len(data)
+        if self.max_bytes and self.bytes_read > self.max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size is {self.max_bytes // (1024 * 1024)}MB"
+            )
+        self.digest.update(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def clean_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize raw rows column-wise: text columns as str, amounts as float,
+    types lower-cased. Rows whose amount is not a number are dropped.
+    """
+    amount = pd.to_numeric(df['amount'], errors='coerce').astype(np.float64)
+    valid = amount.notna().to_numpy()
+    # Lower-case each distinct type once
+    codes, uniques = pd.factorize(df['type'].to_numpy()[valid])
+    types = np.array([str(t).lower() for t in uniques] + [''], dtype=object)[codes]
+    return pd.DataFrame({
+        'date': df['date'].astype(str).to_numpy()[valid],
+        'description': df['description'].astype(str).to_numpy()[valid],
+        'amount': amount.to_numpy()[valid],
+        'type': types,
+    })
+
+
+def _header_positions(row) -> Optional[List[int]]:
+    """Positions of the REQUIRED_COLUMNS if row is a header holding all of them"""
+    names = ['' if value is None else str(value).strip() for value in row]
+    if all(column in names for column in REQUIRED_COLUMNS):
+        return [names.index(column) for column in REQUIRED_COLUMNS]
+    return None
+
+
+def _missing_sheet_error() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"No sheet has the required columns: {', '.join(REQUIRED_COLUMNS)}"
+    )
+
+
+def iter_xlsx_chunks(content: bytes, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Stream the REQUIRED_COLUMNS of an .xlsx workbook as raw DataFrames of up to chunk_rows rows
+
+    The first sheet with a header row among its first HEADER_SCAN_ROWS is
+    used. Its rows are parsed from the sheet XML as they are iterated,
+    converting only the required cells (see xlsx_reader). Empty cells come
+    out as ''.
+    """
+    workbook = XlsxWorkbook(content)
+    try:
+        for _, path in workbook.sheets:
+            for header_row, row in islice(workbook.iter_rows(path), HEADER_SCAN_ROWS):
+                positions = _header_positions(row)
+                if positions:
+                    break
+            else:
+                continue
+            rows = workbook.iter_rows(path, positions, min_row=header_row + 1)
+            while True:
+                batch = [values for _, values in islice(rows, chunk_rows)]
+                if not batch:
+                    return
+                yield pd.DataFrame(batch, columns=REQUIRED_COLUMNS, dtype=object).fillna('')
+        raise _missing_sheet_error()
+    finally:
+        workbook.close()
+
+
+def read_excel_frame(content: bytes) -> pd.DataFrame:
+    """
+    REQUIRED_COLUMNS of the first sheet with a header row, for workbooks
+    openpyxl cannot stream (legacy .xls), read whole through pandas
+    """
+    sheets = pd.read_excel(io.BytesIO(content), sheet_name=None, header=None, dtype=object)
+    for sheet in sheets.values():
+        for header_row, row in enumerate(sheet.head(HEADER_SCAN_ROWS).itertuples(index=False)):
+            positions = _header_positions(None if pd.isna(value) else value for value in row)
+            if positions:
+                frame = sheet.iloc[header_row + 1:, positions]
+                frame.columns = REQUIRED_COLUMNS
+                return frame.fillna('')
+    raise _missing_sheet_error()
+
 
 class TransactionParser:
     ALLOWED_EXTENSIONS = ['csv', 'xlsx', 'xls']
-    
-    async def parse_file(self, file: UploadFile) -> List[Dict]:
-        """Parse CSV or Excel file to transaction list"""
-        # Check file extension
+
+    def _check_upload(self, file: UploadFile, max_bytes: int) -> str:
+        """Validate the extension (and the declared size, when known); returns the extension"""
         file_ext = file.filename.split('.')[-1].lower()
         if file_ext not in self.ALLOWED_EXTENSIONS:
             raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed: {', '.join(self.ALLOWED_EXTENSIONS)}")
-        
-        # Read file content
-        content = await file.read()
-        
+        if max_bytes and file.size is not None and file.size > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB"
+            )
+        return file_ext
+
+    def iter_frames(self, file: UploadFile, max_bytes: int = None, digest=None) -> Iterator[pd.DataFrame]:
+        """
+        Stream cleaned transactions from an upload as DataFrames of up to CHUNK_ROWS rows
+
+        CSV files are decoded and parsed incrementally from UPLOAD_CHUNK_SIZE
+        reads, so memory stays bounded whatever the file size. Excel files
+        are read into memory (within the size limit) since they are zip
+        archives; .xlsx rows are then streamed from the sheet that has the
+        required columns (see iter_xlsx_chunks). This is blocking file I/O:
+        run it in a worker thread.
+
+        Args:
+            file: Uploaded statement
+            max_bytes: Size limit (defaults to MAX_UPLOAD_SIZE; 0 disables it)
+            digest: hashlib object fed every byte of the upload as it is read,
+                so it holds the file's hash once the frames are exhausted
+
+        Raises:
+            HTTPException: 400 for a bad file type, missing columns or
+                unparsable content; 413 as soon as the size limit is passed
+        """
+        max_bytes = settings.MAX_UPLOAD_SIZE if max_bytes is None else max_bytes
+        file_ext = self._check_upload(file, max_bytes)
+        file.file.seek(0)
+        reader = SizeLimitedReader(file.file, max_bytes, digest)
+
         try:
-            # Parse based on file type
             if file_ext == 'csv':
-                df = pd.read_csv(io.BytesIO(content))
-            else:
-                df = pd.read_excel(io.BytesIO(content))
-            
-            # Validate required columns
-            required_columns = ['date', 'description', 'amount', 'type']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Missing required columns: {', '.join(missing_columns)}"
+                # Text columns stay text; amounts are left to the C parser, falling
+                # back to per-value conversion in cleaning when a chunk has bad ones
+                chunks = pd.read_csv(
+                    io.BufferedReader(reader, UPLOAD_CHUNK_SIZE), dtype=TEXT_DTYPES, keep_default_na=False,
+                    encoding='utf-8-sig', encoding_errors='replace', on_bad_lines='skip', chunksize=CHUNK_ROWS
                 )
-            
-            # Convert to list of dicts
-            transactions = df.to_dict('records')
-            
-            # Clean and validate
-            cleaned_transactions = []
-            for trans in transactions:
-                try:
-                    cleaned_transactions.append({
-                        'date': str(trans['date']),
-                        'description': str(trans['description']),
-                        'amount': float(trans['amount']),
-                        'type': str(trans['type']).lower()
-                    })
-                except (ValueError, KeyError) as e:
-                    continue  # Skip invalid rows
-            
-            return cleaned_transactions
-        
+            else:
+                content = io.BufferedReader(reader, UPLOAD_CHUNK_SIZE).read()
+                if file_ext == 'xlsx':
+                    chunks = iter_xlsx_chunks(content)
+                else:
+                    chunks = iter([read_excel_frame(content)])
+
+            for i, chunk in enumerate(chunks):
+                # Validate required columns
+                missing_columns = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+                if i == 0 and missing_columns:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Missing required columns: {', '.join(missing_columns)}"
+                    )
+                frame = clean_transactions(chunk)
+                if len(frame):
+                    yield frame
+            # Bytes past the last row the parser asked for still count towards the hash
+            while reader.read(UPLOAD_CHUNK_SIZE):
+                pass
+
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Error parsing file: {str(e)}")
 
+    def save_upload(self, file: UploadFile, destination: str, max_bytes: int = None) -> Tuple[int, str]:
+        """
+        Copy an upload to a file, checking its type and size on the way (blocking I/O)
+
+        Returns:
+            (bytes written, SHA-256 of the upload)
+
+        Raises:
+            HTTPException: 400 for a bad file type; 413 once the size limit is passed
+        """
+        max_bytes = settings.MAX_UPLOAD_SIZE if max_bytes is None else max_bytes
+        self._check_upload(file, max_bytes)
+        file.file.seek(0)
+        reader = SizeLimitedReader(file.file, max_bytes)
+        with open(destination, 'wb') as out:
+            shutil.copyfileobj(reader, out, UPLOAD_CHUNK_SIZE)
+        return reader.bytes_read, reader.digest.hexdigest()
+
+    def save_statements(self, file: UploadFile, directory: str, max_files: int,
+                        max_bytes: int = None) -> List[Dict]:
+        """
+        Save one file of a bulk upload into directory: a statement as it is,
+        or each statement inside a zip archive (other members are ignored).
+        Blocking I/O.
+
+        Args:
+            max_files: Statements that may still be accepted
+            max_bytes: Size limit per statement (defaults to MAX_UPLOAD_SIZE; 0 disables it);
+                an archive may be max_files times as large
+
+        Returns:
+            [{'path', 'file_name', 'size', 'sha256'}] per statement
+
+        Raises:
+            HTTPException: 400 for a bad file type, a bad archive or too many
+                statements; 413 once a size limit is passed
+        """
+        max_bytes = settings.MAX_UPLOAD_SIZE if max_bytes is None else max_bytes
+        if file.filename.split('.')[-1].lower() != 'zip':
+            path = self._temp_path(directory)
+            size, digest = self.save_upload(file, path, max_bytes)
+            statements = [{'path': path, 'file_name': file.filename, 'size': size, 'sha256': digest}]
+        else:
+            statements = self._extract_statements(file, directory, max_files, max_bytes)
+        if len(statements) > max_files:
+            raise HTTPException(status_code=400, detail=f"Too many statements. Maximum is {settings.BULK_MAX_FILES}")
+        return statements
+
+    @staticmethod
+    def _temp_path(directory: str) -> str:
+        fd, path = tempfile.mkstemp(prefix='statement-', dir=directory)
+        os.close(fd)
+        return path
+
+    def _extract_statements(self, file: UploadFile, directory: str, max_files: int, max_bytes: int) -> List[Dict]:
+        archive_path = self._temp_path(directory)
+        try:
+            file.file.seek(0)
+            with open(archive_path, 'wb') as out:
+                shutil.copyfileobj(SizeLimitedReader(file.file, max_bytes * max(max_files, 1)), out, UPLOAD_CHUNK_SIZE)
+            statements = []
+            with zipfile.ZipFile(archive_path) as archive:
+                for info in archive.infolist():
+                    file_name = info.filename.split('/')[-1]
+                    extension = file_name.split('.')[-1].lower()
+                    hidden = info.filename.startswith('__MACOSX/') or file_name.startswith('.')
+                    if info.is_dir() or hidden or extension not in self.ALLOWED_EXTENSIONS:
+                        continue
+                    if len(statements) >= max_files:
+                        raise HTTPException(status_code=400, detail=f"Too many statements. Maximum is {settings.BULK_MAX_FILES}")
+                    path = self._temp_path(directory)
+                    # Sizes in the archive's directory can lie; count what actually decompresses
+                    with archive.open(info) as member, open(path, 'wb') as out:
+                        reader = SizeLimitedReader(member, max_bytes)
+                        shutil.copyfileobj(reader, out, UPLOAD_CHUNK_SIZE)
+                    statements.append({'path': path, 'file_name': file_name, 'size': reader.bytes_read,
+                                       'sha256': reader.digest.hexdigest()})
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail=f"{file.filename} is not a valid zip archive")
+        finally:
+            os.remove(archive_path)
+        if not statements:
+            raise HTTPException(status_code=400, detail=f"No statements found in {file.filename}")
+        return statements
+
+    def iter_transactions(self, file: UploadFile, max_bytes: int = None) -> Iterator[Dict]:
+        """Stream cleaned transactions from an upload, one dict at a time (see iter_frames)"""
+        for frame in self.iter_frames(file, max_bytes):
+            yield from frame.to_dict('records')
+
+    async def parse_file(self, file: UploadFile) -> List[Dict]:
+        """Parse CSV or Excel file to transaction list"""
+        return await run_in_threadpool(lambda: list(self.iter_transactions(file)))
+
 transaction_parser = TransactionParser()
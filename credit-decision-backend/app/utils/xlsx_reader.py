@@ -0,0 +1,343 @@
+"""
+XLSX Reader - fast row streaming for a few columns of a large worksheet
+openpyxl builds a cell record (coordinates, style, rich text objects) for
+every cell it reads, and in read-only mode it also scans a whole sheet up
+front when the file has no stored dimensions. For a long statement with many
+columns that dominates ingestion. Here the workbook metadata (sheets, shared
+strings, date styles) is read with ElementTree from the package parts; the
+sheet XML is decompressed in blocks, cut at row boundaries and tokenized with
+regular expressions, and only the requested columns are converted, with
+openpyxl's value rules for data_only reads (cached formula results, plain
+text for rich strings). When every cell carries its reference, as Excel and
+the common writers produce, the other columns' cells are skipped inside the
+regular expression engine.
+
+Only openpyxl's public helpers are used (number format tables and date
+conversion); test_xlsx_reader_matches_openpyxl checks the values against
+openpyxl's own reader, which catches a helper changing behaviour.
+"""
+
+import html
+import io
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.datetime import MAC_EPOCH, WINDOWS_EPOCH, from_excel, from_ISO8601
+
+# Decompressed sheet XML tokenized per block
+BLOCK_SIZE = 1 << 20
+
+_PREFIX = rb'(?:[\w.-]+:)?'
+_SHEET_DATA_START = re.compile(rb'<([\w.-]+:)?sheetData\b[^>]*?(/?)>')
+# A row start (group 1), or a cell (attributes in group 2, content in group 3)
+_TOKEN = re.compile(
+    rb'<' + _PREFIX + rb'(?:(row\b[^>]*)>|c\b([^>]*?)(?:/>|>(.*?)</' + _PREFIX + rb'c>))', re.S
+)
+_ROW_NUMBER = re.compile(rb'\sr="(\d+)"')
+_REFERENCE = re.compile(rb'\sr="([A-Z]+)')
+_TYPE = re.compile(rb'\st="(\w+)"')
+_STYLE = re.compile(rb'\ss="(\d+)"')
+_VALUE = re.compile(rb'<' + _PREFIX + rb'v>(.*?)</' + _PREFIX + rb'v>', re.S)
+_TEXT = re.compile(rb'<' + _PREFIX + rb't\b[^>]*?(?:/>|>(.*?)</' + _PREFIX + rb't>)', re.S)
+_PHONETIC = re.compile(rb'<' + _PREFIX + rb'rPh\b.*?</' + _PREFIX + rb'rPh>', re.S)
+_UNREFERENCED_CELL = re.compile(rb'<' + _PREFIX + rb'c(?=[\s/>])(?![^>]*?\sr=")')
+
+
+def _column_letters(column: int) -> bytes:
+    """Reference letters of a 0-based column (27 -> b'AB')"""
+    letters = b''
+    column += 1
+    while column:
+        column, remainder = divmod(column - 1, 26)
+        letters = bytes([65 + remainder]) + letters
+    return letters
+
+
+def _cell_pattern(prefix: bytes, columns: List[int]) -> re.Pattern:
+    """
+    Cells of the given columns only, as (letters, row number, type, style, content);
+    the type and style are read wherever they sit among the attributes
+    """
+    prefix = re.escape(prefix)
+    letters = b'|'.join(_column_letters(column) for column in columns)
+    return re.compile(
+        rb'<' + prefix + rb'c\b(?=[^>]*?\sr="(' + letters + rb')(\d+)")'
+        rb'(?=(?:[^>]*?\st="(\w+)")?)(?=(?:[^>]*?\ss="(\d+)")?)[^>]*?'
+        rb'(?:/>|>(.*?)</' + prefix + rb'c>)', re.S
+    )
+
+
+def _text(raw: bytes) -> str:
+    text = raw.decode('utf-8')
+    return html.unescape(text) if '&' in text else text
+
+
+def _number(text: str):
+    if '.' in text or 'E' in text or 'e' in text:
+        return float(text)
+    return int(text)
+
+
+def _local(name: str) -> str:
+    """Tag or attribute name without its namespace"""
+    return name.rsplit('}', 1)[-1]
+
+
+def _attribute(element: ET.Element, name: str) -> Optional[str]:
+    """Attribute by local name, whatever its namespace (r:id in transitional and strict files)"""
+    for key, value in element.attrib.items():
+        if _local(key) == name:
+            return value
+    return None
+
+
+def _string_item_text(item: ET.Element) -> str:
+    """Plain text of a shared string item: its text runs, without phonetic runs"""
+    parts = []
+    for child in item:
+        tag = _local(child.tag)
+        if tag == 't':
+            parts.append(child.text or '')
+        elif tag == 'r':
+            parts.extend(t.text or '' for t in child if _local(t.tag) == 't')
+    return ''.join(parts)
+
+
+def _column_index(letters: bytes, cache: dict) -> int:
+    """0-based column of a reference's letters (b'AB' -> 27)"""
+    index = cache.get(letters)
+    if index is None:
+        index = 0
+        for letter in letters:
+            index = index * 26 + letter - 64
+        index = cache[letters] = index - 1
+    return index
+
+
+class XlsxWorkbook:
+    def __init__(self, content: bytes):
+        """
+        Open an .xlsx workbook for streaming its worksheets' rows
+
+        Raises:
+            zipfile.BadZipFile, ET.ParseError, KeyError or ValueError for a
+            file that is not a readable workbook
+        """
+        self._archive = zipfile.ZipFile(io.BytesIO(content))
+        try:
+            self._names = set(self._archive.namelist())
+            package = self._relationships('')
+            workbook = next((path for kind, path in package.values() if kind == 'officeDocument'), 'xl/workbook.xml')
+            parts = self._relationships(workbook)
+            root = ET.fromstring(self._archive.read(workbook))
+            date1904 = False
+            # (title, path in the archive) of each worksheet, in workbook order
+            self.sheets: List[Tuple[str, str]] = []
+            for element in root.iter():
+                tag = _local(element.tag)
+                if tag == 'workbookPr':
+                    date1904 = element.get('date1904', '').lower() in ('1', 'true')
+                elif tag == 'sheet':
+                    kind, path = parts.get(_attribute(element, 'id'), (None, None))
+                    if kind == 'worksheet' and path in self._names:
+                        self.sheets.append((element.get('name'), path))
+            self._epoch = MAC_EPOCH if date1904 else WINDOWS_EPOCH
+            by_kind = {kind: path for kind, path in parts.values()}
+            self._shared_strings = self._read_shared_strings(by_kind.get('sharedStrings'))
+            self._date_styles = self._read_date_styles(by_kind.get('styles'))
+        except BaseException:
+            self._archive.close()
+            raise
+        self._dates = {}
+
+    def close(self):
+        self._archive.close()
+
+    def _relationships(self, part: str) -> Dict[str, Tuple[str, str]]:
+        """Relationship id -> (type, e.g. 'worksheet'; target's path in the archive) of a part ('' for the package)"""
+        directory, name = posixpath.split(part)
+        rels_path = posixpath.join(directory, '_rels', f'{name}.rels')
+        if rels_path not in self._names:
+            return {}
+        relationships = {}
+        for rel in ET.fromstring(self._archive.read(rels_path)):
+            target = rel.get('Target', '')
+            if rel.get('TargetMode') == 'External' or not target:
+                continue
+            if target.startswith('/'):
+                path = target.lstrip('/')
+            else:
+                path = posixpath.normpath(posixpath.join(directory, target))
+            relationships[rel.get('Id')] = (rel.get('Type', '').rsplit('/', 1)[-1], path)
+        return relationships
+
+    def _read_shared_strings(self, path: Optional[str]) -> List[str]:
+        if path not in self._names:
+            return []
+        strings = []
+        with self._archive.open(path) as source:
+            for _, element in ET.iterparse(source):
+                if _local(element.tag) == 'si':
+                    # Escaped underscores are dropped, as openpyxl reads them
+                    strings.append(_string_item_text(element).replace('x005F_', ''))
+                    element.clear()
+        return strings
+
+    def _read_date_styles(self, path: Optional[str]) -> Set[int]:
+        """Indexes of the cell styles (a cell's s attribute) whose number format is a date or time"""
+        if path not in self._names:
+            return set()
+        root = ET.fromstring(self._archive.read(path))
+        formats = dict(BUILTIN_FORMATS)
+        cell_formats = []
+        for element in root:
+            tag = _local(element.tag)
+            if tag == 'numFmts':
+                formats.update((int(f.get('numFmtId')), f.get('formatCode')) for f in element if f.get('numFmtId'))
+            elif tag == 'cellXfs':
+                cell_formats = [formats.get(int(xf.get('numFmtId', 0))) for xf in element]
+        return {index for index, fmt in enumerate(cell_formats) if fmt and is_date_format(fmt)}
+
+    def _convert(self, data_type: bytes, style: bytes, content: bytes):
+        """Value of a cell from its type and style attributes (b'' when absent) and inner XML"""
+        if not content:
+            return None
+        if data_type == b'inlineStr':
+            if b'rPh' in content:
+                content = _PHONETIC.sub(b'', content)
+            return _text(b''.join(_TEXT.findall(content)))
+        if content.startswith(b'<v>') and content.endswith(b'</v>'):
+            raw = content[3:-4]
+        else:
+            match = _VALUE.search(content)
+            raw = match.group(1) if match else None
+        if not raw:
+            return None
+        if data_type in (b'', b'n'):
+            if style and int(style) in self._date_styles:
+                # Statements repeat the same few hundred dates
+                value = self._dates.get(raw)
+                if value is None:
+                    try:
+                        value = from_excel(_number(raw.decode()), self._epoch)
+                    except (OverflowError, ValueError):
+                        value = '#VALUE!'
+                    self._dates[raw] = value
+                return value
+            return _number(raw.decode())
+        text = _text(raw)
+        if data_type == b's':
+            return self._shared_strings[int(text)]
+        if data_type == b'b':
+            return bool(int(text))
+        if data_type == b'd':
+            return from_ISO8601(text)
+        return text
+
+    def _blocks(self, path: str) -> Iterator[Tuple[bytes, bytes]]:
+        """(namespace prefix, row XML) for the sheet, in blocks that each end at a row boundary"""
+        with self._archive.open(path) as source:
+            buffer = b''
+            while True:
+                block = source.read(BLOCK_SIZE)
+                buffer += block
+                match = _SHEET_DATA_START.search(buffer)
+                if match or not block:
+                    break
+            if not match or match.group(2):
+                return
+            prefix = match.group(1) or b''
+            row_end = b'</' + prefix + b'row>'
+            buffer = buffer[match.end():]
+            while True:
+                cut = buffer.rfind(row_end)
+                if cut >= 0:
+                    cut += len(row_end)
+                    yield prefix, buffer[:cut]
+                    buffer = buffer[cut:]
+                block = source.read(BLOCK_SIZE)
+                if not block:
+                    return
+                buffer += block
+
+    def iter_rows(self, path: str, columns: List[int] = None, min_row: int = 1) -> Iterator[Tuple[int, list]]:
+        """
+        (row number, values) for a worksheet's rows from min_row on (1-based).
+        Values are the given 0-based columns in that order, or every column
+        up to the last filled one when columns is None; empty cells are None.
+
+        Rows missing from the XML (entirely empty rows) are skipped, unlike
+        openpyxl, which yields them as all None; so are rows without a
+        value in any of the columns.
+        """
+        blocks = self._blocks(path)
+        first = next(blocks, None)
+        if first is None:
+            return
+        blocks = chain([first], blocks)
+        # Writers either reference every cell or leave the references out altogether
+        if columns is None or _UNREFERENCED_CELL.search(first[1]):
+            yield from self._iter_positional_rows(blocks, columns, min_row)
+            return
+
+        pattern = _cell_pattern(first[0], columns)
+        slots = {_column_letters(column): slot for slot, column in enumerate(columns)}
+        width = len(columns)
+        convert = self._convert
+        values = None
+        current = None
+        row_number = 0
+        for _, block in blocks:
+            for letters, number, data_type, style, content in pattern.findall(block):
+                if number != current:
+                    if values is not None:
+                        yield row_number, values
+                    current = number
+                    row_number = int(number)
+                    values = None if row_number < min_row else [None] * width
+                if values is not None:
+                    values[slots[letters]] = convert(data_type, style, content)
+        if values is not None:
+            yield row_number, values
+
+    def _iter_positional_rows(self, blocks: Iterator[Tuple[bytes, bytes]], columns: Optional[List[int]],
+                              min_row: int) -> Iterator[Tuple[int, list]]:
+        """iter_rows for any sheet: every cell is tokenized and cells without a reference follow the previous one"""
+        slots = None if columns is None else {column: slot for slot, column in enumerate(columns)}
+        letters = {}
+        values = None
+        row_number = 0
+        column = -1
+        for _, block in blocks:
+            for row, attributes, content in _TOKEN.findall(block):
+                if row:
+                    # A new row: hand over the previous one
+                    if values is not None and row_number >= min_row:
+                        yield row_number, values
+                    match = _ROW_NUMBER.search(row)
+                    row_number = int(match.group(1)) if match else row_number + 1
+                    values = [] if slots is None else [None] * len(slots)
+                    column = -1
+                    continue
+                if row_number < min_row:
+                    continue
+                match = _REFERENCE.search(attributes)
+                column = _column_index(match.group(1), letters) if match else column + 1
+                slot = column if slots is None else slots.get(column)
+                if slot is None:
+                    continue
+                match = _TYPE.search(attributes)
+                data_type = match.group(1) if match else b''
+                match = _STYLE.search(attributes)
+                value = self._convert(data_type, match.group(1) if match else b'', content)
+                if slots is None:
+                    values.extend([None] * (column - len(values)))
+                    values.append(value)
+                else:
+                    values[slot] = value
+        if values is not None and row_number >= min_row:
+            yield row_number, values
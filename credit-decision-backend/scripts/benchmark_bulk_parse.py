@@ -0,0 +1,82 @@
+"""
+Benchmark Bulk Statement Parsing
+Parses a batch of generated .xlsx statements one after another in this
+process, then through StatementPool with each worker count, and checks that
+every run gives the same analysis rows and keys. Parsing, categorization
+and keying all run in the workers; the "merge" column is what is left for
+the server process (de-duplicating across statements and collecting the
+JSON records). Parallel parsing only pays off with more than one CPU core;
+the pool's process start-up is included.
+
+Usage:
+    python scripts/benchmark_bulk_parse.py
+    python scripts/benchmark_bulk_parse.py --files 24 --rows 20000 --workers 1,2,4,8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.benchmark_excel import make_workbook
+from app.services.statement_pool import StatementPool, merge_statements, parse_statement
+
+
+def save_statements(directory: str, n_files: int, n_rows: int):
+    statements = []
+    for i in range(n_files):
+        path = os.path.join(directory, f'statement-{i}.xlsx')
+        with open(path, 'wb') as f:
+            f.write(make_workbook(n_rows, seed=i))
+        statements.append({'path': path, 'file_name': f'statement-{i}.xlsx'})
+    return statements
+
+
+def same(results, expected) -> bool:
+    return all(a['rows'].equals(b['rows']) and np.array_equal(a['keys'], b['keys'])
+               for a, b in zip(results, expected))
+
+
+def merge_seconds(results) -> float:
+    start = time.perf_counter()
+    _, _, records = merge_statements(results)
+    for _ in records:
+        pass
+    return time.perf_counter() - start
+
+
+def run(n_files: int, n_rows: int, workers):
+    with tempfile.TemporaryDirectory() as directory:
+        statements = save_statements(directory, n_files, n_rows)
+        print(f"{n_files} statements x {n_rows:,} rows, {os.cpu_count()} CPU cores")
+
+        start = time.perf_counter()
+        expected = [parse_statement(s['path'], s['file_name']) for s in statements]
+        serial = time.perf_counter() - start
+        print(f"{'serial':>10}  {serial:>8.3f}s")
+
+        for count in workers:
+            pool = StatementPool(count)
+            start = time.perf_counter()
+            results = asyncio.run(pool.parse(statements))
+            seconds = time.perf_counter() - start
+            pool.shutdown()
+            print(f"{count:>2} workers  {seconds:>8.3f}s  {serial / seconds:>5.1f}x  "
+                  f"merge {merge_seconds(results):.3f}s  {'✓' if same(results, expected) else '✗'}")
+            if not same(results, expected):
+                print("✗ Pool results differ from serial parsing")
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=12)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated worker counts')
+    args = parser.parse_args()
+    run(args.files, args.rows, [int(n) for n in args.workers.split(',')])
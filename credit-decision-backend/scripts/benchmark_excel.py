@@ -0,0 +1,98 @@
+"""
+Benchmark Excel Statement Parsing
+Compares the old whole-workbook read (pd.read_excel with the default
+openpyxl engine, every column, then cleaning) with TransactionParser's
+read-only streaming path on a generated .xlsx statement, and checks that
+both give the same cleaned transactions. The workbook carries the extra
+columns real bank exports have (reference, balance, branch, ...), which the
+streaming path skips.
+
+Usage:
+    python scripts/benchmark_excel.py
+    python scripts/benchmark_excel.py --rows 10000,200000 --repeats 3
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import numpy as np
+import openpyxl
+import pandas as pd
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import UploadFile
+from app.utils.transaction_parser import clean_transactions, transaction_parser
+
+EXTRA_COLUMNS = ['reference', 'value_date', 'cheque_no', 'balance', 'branch', 'channel']
+
+
+def make_workbook(n_rows: int, seed: int = 7) -> bytes:
+    """An .xlsx statement with n_rows transactions and EXTRA_COLUMNS around the required ones"""
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, 1, 1)
+    days = rng.integers(0, 365, n_rows).tolist()
+    amounts = rng.uniform(10, 50000, n_rows).round(2).tolist()
+    credits = (rng.random(n_rows) < 0.2).tolist()
+    merchants = ['SWIGGY', 'UBER', 'AMAZON', 'DMART', 'NETFLIX', 'SALARY', 'RENT', 'APOLLO', 'UPI TRANSFER']
+    picks = rng.integers(0, len(merchants), n_rows).tolist()
+    refs = rng.integers(10 ** 9, 10 ** 10, n_rows).tolist()
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Statement')
+    sheet.append(['date', 'reference', 'description', 'value_date', 'cheque_no', 'amount', 'type', 'balance',
+                  'branch', 'channel'])
+    balance = 100000.0
+    for i in range(n_rows):
+        date = start + timedelta(days=days[i])
+        balance += amounts[i] if credits[i] else -amounts[i]
+        sheet.append([date, f'REF{refs[i]}', f'{merchants[picks[i]]} {refs[i] % 10000}', date, None,
+                      amounts[i], 'Credit' if credits[i] else 'Debit', round(balance, 2), 'MUMBAI MAIN', 'UPI'])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def read_whole(content: bytes) -> pd.DataFrame:
+    """The previous path: full workbook model, every column"""
+    return clean_transactions(pd.read_excel(io.BytesIO(content)))
+
+
+def read_streaming(content: bytes) -> pd.DataFrame:
+    upload = UploadFile(io.BytesIO(content), filename='statement.xlsx', size=len(content))
+    return pd.concat(list(transaction_parser.iter_frames(upload, max_bytes=0)), ignore_index=True)
+
+
+def best_of(fn, content: bytes, repeats: int):
+    best, result = None, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(content)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def run(sizes, repeats: int):
+    print(f"{'rows':>9}  {'size':>8}  {'read_excel':>11}  {'streaming':>10}  {'speedup':>8}  same")
+    for n_rows in sizes:
+        content = make_workbook(n_rows)
+        whole_seconds, whole = best_of(read_whole, content, repeats)
+        stream_seconds, streamed = best_of(read_streaming, content, repeats)
+        same = whole.equals(streamed)
+        print(f"{n_rows:>9,}  {len(content) / 2 ** 20:>6.1f}MB  {whole_seconds:>10.3f}s  {stream_seconds:>9.3f}s  "
+              f"{whole_seconds / stream_seconds:>7.1f}x  {'✓' if same else '✗'}")
+        if not same:
+            print("✗ Cleaned transactions differ between the two paths")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000,10000,200000', help='Comma-separated statement sizes')
+    parser.add_argument('--repeats', type=int, default=1)
+    args = parser.parse_args()
+    run([int(n) for n in args.rows.split(',')], args.repeats)
@@ -0,0 +1,137 @@
+"""
+Benchmark Inference Executors
+Fires concurrent single-applicant scoring requests (the /api/loans/apply
+model call) through each inference executor and reports throughput, request
+latency and event-loop lag. Lag is measured by a ticker coroutine that
+should wake every --tick-ms; any delay beyond that is time the loop was
+blocked and every other request on the worker had to wait.
+
+Usage:
+    python scripts/benchmark_inference_executor.py
+    python scripts/benchmark_inference_executor.py --concurrency 200 --rows 200000 --executors inline,thread,process
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ml.credit_score_model import load_credit_model
+from app.ml.inference_executor import InferenceExecutor, evaluate_results
+from app.ml.model_bundle import save_bundle
+
+
+def make_bundle(path: str, n_rows: int, seed: int = 42):
+    """Write a synthetic model bundle with n_rows reference rows"""
+    rng = np.random.default_rng(seed)
+    reference = rng.normal(size=(n_rows, 6)).astype(np.float32)
+    labels = (reference @ np.array([-0.8, -1.0, -1.2, 0.9, 1.1, -0.2]) > 0).astype(np.int64)
+    save_bundle(
+        path, reference, labels,
+        scaler_mean=np.array([2.0, 60000.0, 6000.0, 250000.0, 55000.0, 2.0]),
+        scaler_scale=np.array([1.5, 40000.0, 4000.0, 150000.0, 30000.0, 0.8]),
+        classes=['N', 'Y'], n_neighbors=6, model_version=f'benchmark-{n_rows}'
+    )
+
+
+def make_applicants(n: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'num_debts': int(rng.integers(0, 8)),
+            'total_debt_amount': float(rng.integers(0, 200000)),
+            'monthly_emis': float(rng.integers(0, 20000)),
+            'total_assets': float(rng.integers(0, 600000)),
+            'monthly_income': float(rng.integers(10000, 150000)),
+            'city_tier': f"tier_{rng.integers(1, 4)}",
+        }
+        for _ in range(n)
+    ]
+
+
+async def measure(executor: InferenceExecutor, model, applicants, tick_ms: float):
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        interval = tick_ms / 1000
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append((time.perf_counter() - start - interval) * 1000)
+
+    async def request(applicant, arrived: float):
+        # Latency counts from arrival, so time spent waiting for a blocked loop is included
+        await executor.run(evaluate_results, model, [applicant])
+        return (time.perf_counter() - arrived) * 1000
+
+    # Warm the pool (process workers load the model here)
+    warmup = time.perf_counter()
+    await asyncio.gather(*(request(a, warmup) for a in applicants[:executor.max_workers]))
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(tick_ms / 1000 * 3)
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(request(a, start) for a in applicants))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+
+    return {
+        'executor': executor.kind,
+        'requests': len(applicants),
+        'throughput_rps': round(len(applicants) / elapsed, 1),
+        'latency_p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'latency_p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'loop_lag_p50_ms': round(float(np.percentile(lags, 50)), 2),
+        'loop_lag_p99_ms': round(float(np.percentile(lags, 99)), 2),
+        'loop_lag_max_ms': round(float(np.max(lags)), 2),
+    }
+
+
+def run(rows: int, concurrency: int, kinds, workers: int, tick_ms: float):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        bundle_path = os.path.join(workdir, 'credit_model')
+        make_bundle(bundle_path, rows)
+        model = load_credit_model(bundle_path=bundle_path, strict=True)
+        applicants = make_applicants(concurrency)
+
+        for kind in kinds:
+            executor = InferenceExecutor(kind=kind, max_workers=workers, max_pending=concurrency, timeout=0)
+            try:
+                row = asyncio.run(measure(executor, model, applicants, tick_ms))
+            finally:
+                executor.shutdown()
+            results.append(row)
+            print(f"   {kind:<8} {row['throughput_rps']:>8.1f} req/s   latency p50 {row['latency_p50_ms']:>8.2f}ms "
+                  f"p99 {row['latency_p99_ms']:>8.2f}ms   loop lag p50 {row['loop_lag_p50_ms']:>7.2f}ms "
+                  f"p99 {row['loop_lag_p99_ms']:>7.2f}ms max {row['loop_lag_max_ms']:>7.2f}ms")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='Reference rows in the synthetic model')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--executors', default='inline,thread,process')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--tick-ms', type=float, default=5.0)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("INFERENCE EXECUTOR BENCHMARK")
+    print("=" * 60)
+    print(f"{args.concurrency} concurrent requests, {args.rows:,} reference rows\n")
+    results = run(args.rows, args.concurrency, args.executors.split(','), args.workers, args.tick_ms)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
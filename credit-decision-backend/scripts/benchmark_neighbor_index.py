@@ -0,0 +1,126 @@
+"""
+Benchmark Neighbour Indexes
+Compares single-query p50/p99 latency and agreement with brute-force search
+for every neighbour index as the reference set grows (1k -> 5M rows by default)
+
+Usage:
+    python scripts/benchmark_neighbor_index.py
+    python scripts/benchmark_neighbor_index.py --sizes 1000,100000 --queries 500 --n-probe 1,8,32
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ml.neighbor_index import build_index, load_index, neighbor_vote
+
+N_FEATURES = 6
+N_NEIGHBORS = 6
+
+
+def make_reference(path: str, n_rows: int, seed: int = 42, chunk: int = 1000000):
+    """Write a synthetic scaled reference set (float32 memmap) and its labels"""
+    rng = np.random.default_rng(seed)
+    reference = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(n_rows, N_FEATURES))
+    labels = np.empty(n_rows, dtype=np.int64)
+    weights = np.array([-0.8, -1.0, -1.2, 0.9, 1.1, -0.2])
+    for start in range(0, n_rows, chunk):
+        stop = min(start + chunk, n_rows)
+        block = rng.normal(size=(stop - start, N_FEATURES))
+        reference[start:stop] = block
+        labels[start:stop] = (block @ weights + rng.normal(scale=0.8, size=stop - start) > 0).astype(np.int64)
+    reference.flush()
+    del reference
+    return np.load(path, mmap_mode='r'), labels
+
+
+def time_queries(index, queries: np.ndarray):
+    """Time one query at a time (the online scoring pattern)"""
+    latencies = np.empty(len(queries))
+    distances = np.empty((len(queries), N_NEIGHBORS))
+    indices = np.empty((len(queries), N_NEIGHBORS), dtype=np.int64)
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        d, idx = index.query(queries[i:i + 1], N_NEIGHBORS)
+        latencies[i] = time.perf_counter() - start
+        distances[i], indices[i] = d[0], idx[0]
+    return latencies * 1000, distances, indices
+
+
+def run(sizes, n_queries: int, n_probes, kinds):
+    results = []
+    queries = np.random.default_rng(7).normal(size=(n_queries, N_FEATURES))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_rows in sizes:
+            print(f"\nReference set: {n_rows:,} rows")
+            reference, labels = make_reference(os.path.join(workdir, f'reference_{n_rows}.npy'), n_rows)
+
+            brute = build_index('brute', reference)
+            brute_ms, brute_d, brute_idx = time_queries(brute, queries)
+            brute_class = neighbor_vote(labels[brute_idx], brute_d, 2).argmax(axis=1)
+
+            configs = [('brute', {}, brute_ms, brute_idx, brute_d, 0.0)]
+            for kind in kinds:
+                if kind == 'brute':
+                    continue
+                for params in ([{'n_probe': p} for p in n_probes] if kind == 'ivf' else [{}]):
+                    start = time.perf_counter()
+                    index = build_index(kind, reference, **params)
+                    index.save(os.path.join(workdir, f'{kind}_{n_rows}'))
+                    index = load_index(os.path.join(workdir, f'{kind}_{n_rows}'), **params)
+                    build_s = time.perf_counter() - start
+                    ms, d, idx = time_queries(index, queries)
+                    configs.append((kind, params, ms, idx, d, build_s))
+                    del index
+
+            for kind, params, ms, idx, d, build_s in configs:
+                recall = np.mean([len(np.intersect1d(a, b)) / N_NEIGHBORS for a, b in zip(idx, brute_idx)])
+                agreement = np.mean(neighbor_vote(labels[idx], d, 2).argmax(axis=1) == brute_class)
+                row = {
+                    'rows': n_rows,
+                    'index': kind,
+                    'params': params,
+                    'build_s': round(build_s, 3),
+                    'p50_ms': round(float(np.percentile(ms, 50)), 3),
+                    'p99_ms': round(float(np.percentile(ms, 99)), 3),
+                    'recall': round(float(recall), 4),
+                    'class_agreement': round(float(agreement), 4),
+                }
+                results.append(row)
+                label = kind + (f" (n_probe={params['n_probe']})" if params else '')
+                print(f"   {label:<22} build {row['build_s']:>8.3f}s   p50 {row['p50_ms']:>8.3f}ms   "
+                      f"p99 {row['p99_ms']:>8.3f}ms   recall {row['recall']:.4f}   agreement {row['class_agreement']:.4f}")
+
+            del reference
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000,5000000')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--n-probe', default='1,4,16')
+    parser.add_argument('--indexes', default='brute,kd_tree,ball_tree,ivf')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("NEIGHBOUR INDEX BENCHMARK")
+    print("=" * 60)
+    results = run(
+        [int(s) for s in args.sizes.split(',')],
+        args.queries,
+        [int(p) for p in args.n_probe.split(',')],
+        args.indexes.split(',')
+    )
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
@@ -0,0 +1,98 @@
+"""
+Benchmark Single-Row Preprocessing and Scoring
+Compares per-call latency of sklearn (StandardScaler.transform +
+KNeighborsClassifier.predict_proba) with the exported-array fast path
+(FeaturePipeline.scale_features + KNNKernel.predict_proba) for one applicant,
+and checks that both give the same probabilities. CreditScoreModel uses the
+kernel up to KERNEL_MAX_ROWS reference rows and a KD-tree above that.
+
+Usage:
+    python scripts/benchmark_preprocessing.py
+    python scripts/benchmark_preprocessing.py --rows 44,1000,10000 --calls 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ml.preprocessor import FeaturePipeline, KNNKernel
+
+
+def make_dataset(n_rows: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(0, 8, n_rows), rng.uniform(0, 5e5, n_rows), rng.uniform(0, 3e4, n_rows),
+        rng.uniform(0, 2e6, n_rows), rng.uniform(5e3, 2e5, n_rows), rng.integers(1, 4, n_rows),
+    ]).astype(np.float64)
+    y = (X[:, 4] / 1e5 - X[:, 1] / 5e5 + 0.3 * rng.normal(size=n_rows) > 0).astype(np.int64)
+    return X, y
+
+
+def time_calls(fn, rows: np.ndarray) -> np.ndarray:
+    latencies = np.empty(len(rows))
+    for i in range(len(rows)):
+        start = time.perf_counter()
+        fn(rows[i:i + 1])
+        latencies[i] = time.perf_counter() - start
+    return latencies * 1e6
+
+
+def run(sizes, n_calls: int, n_neighbors: int):
+    results = []
+    for n_rows in sizes:
+        X, y = make_dataset(n_rows)
+        scaler = StandardScaler().fit(X)
+        knn = KNeighborsClassifier(n_neighbors=n_neighbors).fit(scaler.transform(X), y)
+        pipeline = FeaturePipeline.from_scaler(scaler)
+        kernel = KNNKernel.from_classifier(knn)
+        queries = make_dataset(n_calls, seed=7)[0]
+
+        sklearn_path = lambda row: knn.predict_proba(scaler.transform(row))
+        fast_path = lambda row: kernel.predict_proba(pipeline.scale_features(row))
+
+        # Warm up both paths, then check they agree on every query
+        time_calls(sklearn_path, queries[:50])
+        time_calls(fast_path, queries[:50])
+        agree = np.allclose(sklearn_path(queries), fast_path(queries), rtol=0, atol=1e-12)
+
+        sklearn_us = time_calls(sklearn_path, queries)
+        fast_us = time_calls(fast_path, queries)
+        row = {
+            'rows': n_rows,
+            'sklearn_p50_us': round(float(np.percentile(sklearn_us, 50)), 1),
+            'sklearn_p99_us': round(float(np.percentile(sklearn_us, 99)), 1),
+            'fast_p50_us': round(float(np.percentile(fast_us, 50)), 1),
+            'fast_p99_us': round(float(np.percentile(fast_us, 99)), 1),
+            'speedup_p50': round(float(np.percentile(sklearn_us, 50) / np.percentile(fast_us, 50)), 1),
+            'identical_probabilities': bool(agree),
+        }
+        results.append(row)
+        print(f"   {n_rows:>9,} rows   sklearn p50 {row['sklearn_p50_us']:>9.1f}us p99 {row['sklearn_p99_us']:>9.1f}us   "
+              f"fast p50 {row['fast_p50_us']:>9.1f}us p99 {row['fast_p99_us']:>9.1f}us   "
+              f"x{row['speedup_p50']:<6} {'✓' if agree else '✗'} parity")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='44,1000,10000', help='Reference set sizes')
+    parser.add_argument('--calls', type=int, default=1000)
+    parser.add_argument('--n-neighbors', type=int, default=6)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SINGLE-ROW PREPROCESSING BENCHMARK")
+    print("=" * 60)
+    results = run([int(s) for s in args.rows.split(',')], args.calls, args.n_neighbors)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
@@ -0,0 +1,343 @@
+"""
+Benchmark Suite - scoring and transaction analysis hot paths
+Times the request-path code at input sizes from 1 to 1M applicants or
+transactions and saves the results as a JSON baseline; --compare checks a
+run against a saved baseline and exits non-zero on regressions.
+
+Cases:
+    model.predict           CreditScoreModel.predict, one applicant per call
+    ml.predict_credit_score MLService.predict_credit_score, concurrent requests
+    analyzer.analyze        FinancialAnalyzer.analyze_transactions on one history
+    analyzer.analyze_frame  the same, given the history as a DataFrame
+    parser.parse_file       TransactionParser.iter_frames over one CSV upload (no size limit)
+    parser.parse_excel      the same over an .xlsx upload
+    loan.process            LoanService.process_loan_application end to end,
+                            with in-memory stand-ins for the Supabase repositories
+
+Each case runs --repeats times per size (once from LARGE_INPUT items up) and
+keeps the fastest run. Sizes whose projected time exceeds --budget seconds
+are skipped and reported as such.
+
+Usage:
+    python scripts/benchmark_suite.py --save benchmarks/baseline.json
+    python scripts/benchmark_suite.py --compare benchmarks/baseline.json --threshold 0.2
+    python scripts/benchmark_suite.py --cases analyzer.analyze,parser.parse_file --sizes 1,1000,1000000
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+import numpy as np
+import openpyxl
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import UploadFile
+from app.ml.model_registry import model_registry
+from app.services import loan_service as loan_service_module
+from app.services.loan_service import loan_service
+from app.services.ml_service import ml_service
+from app.utils.financial_analyzer import FinancialAnalyzer, financial_analyzer
+from app.utils.transaction_parser import transaction_parser
+
+DEFAULT_SIZES = '1,100,10000,100000,1000000'
+# From this many items a case runs once instead of --repeats times
+LARGE_INPUT = 100000
+# Slowdowns smaller than this are timer noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.001
+
+
+class InMemoryLoanRepository:
+    """Local stand-in for LoanRepository (same async interface, no database)"""
+
+    def __init__(self):
+        self.loans = {}
+
+    async def create_loan_application(self, loan_data):
+        loan = {**loan_data, 'id': str(uuid.uuid4()), 'created_at': datetime.now(timezone.utc).isoformat()}
+        self.loans[loan['id']] = loan
+        return loan
+
+    async def get_loan_by_id(self, loan_id):
+        return self.loans.get(str(loan_id))
+
+    async def get_user_loans(self, user_id):
+        return [loan for loan in self.loans.values() if loan['user_id'] == str(user_id)]
+
+    async def update_loan_decision(self, loan_id, decision_data):
+        loan = self.loans.get(str(loan_id))
+        if loan is not None:
+            loan.update(decision_data)
+        return loan
+
+
+class InMemoryTransactionRepository:
+    """Local stand-in for TransactionRepository; half the users have a financial behaviour record"""
+
+    def __init__(self, behaviors):
+        self.behaviors = behaviors
+
+    async def get_financial_behavior(self, user_id):
+        return self.behaviors.get(str(user_id))
+
+
+def make_applicants(n: int, seed: int = 7):
+    """Distinct synthetic applicants (so the prediction cache never hits)"""
+    rng = np.random.default_rng(seed)
+    columns = {
+        'num_debts': rng.integers(0, 8, n).tolist(),
+        'total_debt_amount': rng.uniform(0, 200000, n).round(2).tolist(),
+        'monthly_emis': rng.uniform(0, 20000, n).round(2).tolist(),
+        'total_assets': rng.uniform(0, 600000, n).round(2).tolist(),
+        'monthly_income': rng.uniform(10000, 150000, n).round(2).tolist(),
+        'city_tier': [f'tier_{t}' for t in rng.integers(1, 4, n)],
+    }
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def make_transactions(n: int, seed: int = 7):
+    """Synthetic bank statement rows: keyword and unmatched descriptions, ~20% credits, one year of dates"""
+    rng = np.random.default_rng(seed)
+    keywords = [k for words in FinancialAnalyzer.CATEGORY_KEYWORDS.values() for k in words]
+    words = np.array(keywords + ['transfer', 'payment', 'upi', 'neft', 'pos', 'atm'])
+    start = datetime(2025, 1, 1)
+    descriptions = [f"{a.upper()} {b} REF{r}" for a, b, r in
+                    zip(rng.choice(words, n), rng.choice(words, n), rng.integers(10000, 99999, n))]
+    dates = [(start + timedelta(days=int(d))).strftime('%Y-%m-%d') for d in rng.integers(0, 365, n)]
+    types = np.where(rng.random(n) < 0.2, 'credit', 'debit').tolist()
+    amounts = rng.uniform(10, 50000, n).round(2).tolist()
+    return [{'date': d, 'description': s, 'amount': a, 'type': t}
+            for d, s, a, t in zip(dates, descriptions, amounts, types)]
+
+
+def timed_calls(fn, items):
+    latencies = np.empty(len(items))
+    for i, item in enumerate(items):
+        start = time.perf_counter()
+        fn(item)
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+
+async def timed_requests(coro_fn, items, concurrency: int):
+    """Await coro_fn(item) for every item, concurrency at a time; per-request latencies"""
+    latencies = np.empty(len(items))
+
+    async def one(i):
+        start = time.perf_counter()
+        await coro_fn(items[i])
+        latencies[i] = time.perf_counter() - start
+
+    for offset in range(0, len(items), concurrency):
+        await asyncio.gather(*(one(i) for i in range(offset, min(offset + concurrency, len(items)))))
+    return latencies
+
+
+# Each case prepares its inputs for a size (untimed) and returns the timed run
+def case_model_predict(size, args, loop):
+    model = model_registry.current
+    applicants = make_applicants(size)
+    return lambda: timed_calls(model.predict, applicants)
+
+
+def case_ml_predict(size, args, loop):
+    applicants = make_applicants(size)
+
+    def run():
+        ml_service.cache.clear()
+        return loop.run_until_complete(timed_requests(ml_service.predict_credit_score, applicants, args.concurrency))
+    return run
+
+
+def case_analyzer(size, args, loop):
+    transactions = make_transactions(size)
+    return lambda: financial_analyzer.analyze_transactions(transactions, 60000.0)
+
+
+def case_analyzer_frame(size, args, loop):
+    transactions = pd.DataFrame(make_transactions(size))
+    return lambda: financial_analyzer.analyze_transactions(transactions, 60000.0)
+
+
+def case_parser(size, args, loop):
+    content = pd.DataFrame(make_transactions(size)).to_csv(index=False).encode()
+
+    def run():
+        # Large sizes exceed MAX_UPLOAD_SIZE; the limit is not what is being measured
+        upload = UploadFile(io.BytesIO(content), filename='transactions.csv', size=len(content))
+        for _ in transaction_parser.iter_frames(upload, max_bytes=0):
+            pass
+    return run
+
+
+def case_parser_excel(size, args, loop):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Statement')
+    sheet.append(['date', 'description', 'amount', 'type'])
+    for transaction in make_transactions(size):
+        sheet.append(list(transaction.values()))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    content = buffer.getvalue()
+
+    def run():
+        upload = UploadFile(io.BytesIO(content), filename='transactions.xlsx', size=len(content))
+        for _ in transaction_parser.iter_frames(upload, max_bytes=0):
+            pass
+    return run
+
+
+def case_loan_process(size, args, loop):
+    applicants = make_applicants(size)
+    users = [str(uuid.uuid4()) for _ in range(min(size, 1000))]
+    behaviors = {user: {'behavior_rating': ['good', 'average', 'bad'][i % 3], 'total_score': 8 - i % 8}
+                 for i, user in enumerate(users[::2])}
+    requests = [(users[i % len(users)], applicant) for i, applicant in enumerate(applicants)]
+
+    def run():
+        ml_service.cache.clear()
+        loan_service_module.loan_repository = InMemoryLoanRepository()
+        loan_service_module.transaction_repository = InMemoryTransactionRepository(behaviors)
+        return loop.run_until_complete(timed_requests(
+            lambda request: loan_service.process_loan_application(request[0], dict(request[1])),
+            requests, args.concurrency
+        ))
+    return run
+
+
+CASES = {
+    'model.predict': ('applicants', case_model_predict),
+    'ml.predict_credit_score': ('applicants', case_ml_predict),
+    'analyzer.analyze': ('transactions', case_analyzer),
+    'analyzer.analyze_frame': ('transactions', case_analyzer_frame),
+    'parser.parse_file': ('transactions', case_parser),
+    'parser.parse_excel': ('transactions', case_parser_excel),
+    'loan.process': ('applications', case_loan_process),
+}
+
+
+def measure(name, size, args, loop):
+    run = CASES[name][1](size, args, loop)
+    best, best_latencies = None, None
+    for _ in range(args.repeats if size < LARGE_INPUT else 1):
+        start = time.perf_counter()
+        latencies = run()
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best, best_latencies = seconds, latencies
+    result = {
+        'seconds': round(best, 6),
+        'per_item_us': round(best / size * 1e6, 2),
+        'items_per_second': round(size / best, 1),
+    }
+    if isinstance(best_latencies, np.ndarray):
+        result['p50_us'] = round(float(np.percentile(best_latencies, 50)) * 1e6, 1)
+        result['p99_us'] = round(float(np.percentile(best_latencies, 99)) * 1e6, 1)
+    return result
+
+
+def run_suite(args):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = {}
+    try:
+        for name in args.cases:
+            unit = CASES[name][0]
+            results[name] = {}
+            previous = None
+            print(f"\n{name} ({unit})")
+            for size in args.sizes:
+                if previous:
+                    projected = previous[1] * size / previous[0] * (args.repeats if size < LARGE_INPUT else 1)
+                    if projected > args.budget:
+                        print(f"   {size:>9,}   ⚠ skipped (projected {projected:.0f}s > budget {args.budget:.0f}s)")
+                        results[name][str(size)] = {'skipped': True}
+                        continue
+                result = measure(name, size, args, loop)
+                previous = (size, result['seconds'])
+                results[name][str(size)] = result
+                latency = f"   p50 {result['p50_us']:>9.1f}us p99 {result['p99_us']:>9.1f}us" if 'p50_us' in result else ''
+                print(f"   {size:>9,}   {result['seconds']:>10.4f}s   {result['per_item_us']:>9.2f}us/item   "
+                      f"{result['items_per_second']:>12,.0f}/s{latency}")
+    finally:
+        # Stop the micro-batcher's collector before closing the loop
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        ml_service.shutdown()
+        loop.close()
+    return results
+
+
+def compare(baseline, current, threshold: float):
+    """Print per-case changes; returns the (case, size) pairs slower than baseline by more than threshold"""
+    regressions = []
+    print(f"\nComparison with baseline from {baseline.get('created_at')} (threshold +{threshold:.0%})")
+    if baseline.get('environment') != current.get('environment'):
+        print("⚠ Baseline was recorded on a different environment; timings may not be comparable")
+    for name, sizes in current['results'].items():
+        for size, result in sizes.items():
+            before = baseline['results'].get(name, {}).get(size)
+            if not before or before.get('skipped') or result.get('skipped'):
+                continue
+            change = result['seconds'] / before['seconds'] - 1
+            regressed = change > threshold and result['seconds'] - before['seconds'] > MIN_REGRESSION_SECONDS
+            if regressed:
+                regressions.append((name, size))
+            marker = '✗ REGRESSION' if regressed else ('✓ faster' if change < -threshold else '')
+            print(f"   {name:<24} {int(size):>9,}   {before['seconds']:>10.4f}s -> {result['seconds']:>10.4f}s   "
+                  f"{change:>+8.1%}   {marker}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', default=','.join(CASES), help='Comma-separated cases to run')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Comma-separated input sizes')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=64, help='In-flight requests for the async cases')
+    parser.add_argument('--budget', type=float, default=60.0, help='Skip sizes projected to take longer (seconds)')
+    parser.add_argument('--save', help='Write the results to this JSON baseline')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown before flagging (0.2 = 20%%)')
+    args = parser.parse_args()
+    args.cases = [c for c in args.cases.split(',') if c]
+    unknown = [c for c in args.cases if c not in CASES]
+    if unknown:
+        parser.error(f"Unknown cases {', '.join(unknown)}. Available: {', '.join(CASES)}")
+    args.sizes = sorted(int(s) for s in args.sizes.split(','))
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print("=" * 60)
+    print("BENCHMARK SUITE")
+    print("=" * 60)
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'environment': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'model_version': model_registry.version,
+        'results': run_suite(args),
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Baseline written to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s) beyond +{args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✓ No regressions")
@@ -0,0 +1,99 @@
+"""
+Train the Learned Transaction Categorizer
+Fits a multinomial logistic regression on hashed character n-grams of
+labelled descriptions and saves it as one .npz file. The backend uses it
+for debits the keyword rules leave in 'others' once CATEGORIZER_MODEL_PATH
+points at the file.
+
+The CSV needs a description column and a category column; categories
+should be FinancialAnalyzer categories (unknown ones are kept, but the
+analyzer counts them as 'others').
+
+Usage:
+    python scripts/train_categorizer.py --data data/labelled_descriptions.csv
+    python scripts/train_categorizer.py --data labels.csv --n-features 262144 --ngram-range 3,5 --C 10
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.model_selection import train_test_split
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.utils.transaction_categorizer import (
+    DEFAULT_N_FEATURES, TransactionCategorizer, ngram_features, normalize_descriptions
+)
+
+MODEL_SAVE_PATH = os.path.join(BACKEND_DIR, 'app', 'ml', 'models', 'categorizer.npz')
+
+
+def train(descriptions, categories, n_features: int, ngram_range, C: float) -> TransactionCategorizer:
+    """Fit the categorizer on raw descriptions and their category labels"""
+    X = ngram_features(normalize_descriptions(descriptions), n_features, ngram_range)
+    model = LogisticRegression(C=C, max_iter=1000)
+    model.fit(X, categories)
+    weights, intercept = model.coef_.T, model.intercept_
+    if len(model.classes_) == 2:
+        # Binary logistic regression is a softmax with the first class pinned at zero
+        weights = np.hstack([np.zeros_like(weights), weights])
+        intercept = np.concatenate([[0.0], intercept])
+    return TransactionCategorizer(
+        weights, intercept, model.classes_.tolist(), ngram_range=ngram_range,
+        metadata={'n_samples': len(categories), 'C': C}
+    )
+
+
+def main(args):
+    df = pd.read_csv(args.data, dtype=str, keep_default_na=False)
+    missing = [col for col in (args.text_column, args.label_column) if col not in df.columns]
+    if missing:
+        sys.exit(f"✗ Missing columns: {', '.join(missing)}")
+    df = df[df[args.label_column] != '']
+    print(f"✓ Loaded {len(df)} labelled descriptions, {df[args.label_column].nunique()} categories")
+
+    ngram_range = tuple(int(n) for n in args.ngram_range.split(','))
+    train_df, test_df = train_test_split(df, test_size=args.test_size, random_state=42)
+
+    start = time.perf_counter()
+    categorizer = train(train_df[args.text_column], train_df[args.label_column], args.n_features, ngram_range, args.C)
+    print(f"✓ Trained in {time.perf_counter() - start:.1f}s")
+
+    predicted = categorizer.predict_proba(test_df[args.text_column]).argmax(axis=1)
+    predicted = np.array(categorizer.classes)[predicted]
+    accuracy = accuracy_score(test_df[args.label_column], predicted)
+    print(f"\nHold-out accuracy: {accuracy:.4f}")
+    print(classification_report(test_df[args.label_column], predicted, zero_division=0))
+
+    # Refit on everything before saving
+    categorizer = train(df[args.text_column], df[args.label_column], args.n_features, ngram_range, args.C)
+    categorizer.metadata['holdout_accuracy'] = round(float(accuracy), 4)
+    categorizer.save(args.output)
+    print(f"✓ Categorizer saved to {args.output}")
+    print(f"  Set CATEGORIZER_MODEL_PATH={args.output} to use it")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', required=True, help='Labelled descriptions CSV')
+    parser.add_argument('--output', default=MODEL_SAVE_PATH)
+    parser.add_argument('--text-column', default='description')
+    parser.add_argument('--label-column', default='category')
+    parser.add_argument('--n-features', type=int, default=DEFAULT_N_FEATURES, help='Hash buckets (a power of two)')
+    parser.add_argument('--ngram-range', default='3,5', help='min,max n-gram length')
+    parser.add_argument('--C', type=float, default=10.0, help='Inverse regularization strength')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TRANSACTION CATEGORIZER TRAINING")
+    print("=" * 60)
+    main(parse_args())
@@ -1,204 +1,412 @@
 """
 Train KNN Credit Score Model
-This script trains the KNN classifier and saves the model and scaler
+Runs a cross-validated grid search over n_neighbors, distance metric, vote
+weighting and feature scaler in a process pool, then trains the winner and
+saves it as a model bundle
 Run this script once to generate the model files before starting the backend
+
+Usage:
+    python scripts/train_model.py
+    python scripts/train_model.py --data data/loans.csv --n-neighbors 5,7,9,15 --folds 5 --workers 16
+    python scripts/train_model.py --scalers standard --metrics euclidean --weights uniform --n-neighbors 6
 """
 
-import pandas as pd
-import numpy as np
-import pickle
+import argparse
+import json
 import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
 from sklearn.neighbors import KNeighborsClassifier
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler, RobustScaler, StandardScaler
+from sklearn.model_selection import StratifiedKFold, train_test_split
 from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
 
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.ml.feature_engineering import FEATURE_ORDER
+from app.ml.preprocessor import KERNEL_MAX_ROWS, FeaturePipeline, KNNKernel
+from app.ml.model_bundle import save_bundle, load_bundle
+
 # Configuration
-DATA_PATH = 'D:/TeamArise(windsirf)/credit-decision-backend/data/data.csv'  # Path to your training data
-MODEL_SAVE_PATH = 'D:/TeamArise(windsirf)/credit-decision-backend/app/ml/models/knn_model.pkl'
-SCALER_SAVE_PATH = 'D:/TeamArise(windsirf)/credit-decision-backend/app/ml/models/scaler.pkl'
-LABEL_ENCODER_SAVE_PATH = 'D:/TeamArise(windsirf)/credit-decision-backend/app/ml/models/label_encoder.pkl'
-
-def train_model():
-    """Train the KNN credit score model"""
-    
+DATA_PATH = os.path.join(BACKEND_DIR, 'data', 'data.csv')  # Path to your training data
+BUNDLE_SAVE_PATH = os.path.join(BACKEND_DIR, 'app', 'ml', 'models', 'credit_model')
+
+SCALERS = {
+    'standard': StandardScaler,
+    'minmax': MinMaxScaler,
+    'robust': RobustScaler,
+}
+
+# Metrics the scoring service can serve (model bundles and neighbour indexes are euclidean)
+SERVABLE_METRICS = ['euclidean']
+
+# Rows timed one at a time per candidate to estimate online inference latency
+LATENCY_SAMPLES = 100
+
+
+def load_dataset(path: str, chunk_size: int):
+    """
+    Stream the CSV in chunks, encoding each chunk with the shared feature pipeline
+
+    Returns:
+        (X, y) - raw feature matrix in FEATURE_ORDER and string labels
+        (target is the last column)
+    """
+    pipeline = FeaturePipeline()
+    X_parts, y_parts = [], []
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        missing = [col for col in FEATURE_ORDER if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"Dataset is missing feature columns: {', '.join(missing)}")
+        X_parts.append(pipeline.features(chunk))
+        y_parts.append(chunk.iloc[:, -1].astype(str).to_numpy())
+    if not X_parts:
+        raise ValueError(f"Dataset {path} is empty")
+    return np.concatenate(X_parts), np.concatenate(y_parts)
+
+
+def scaler_arrays(scaler) -> tuple:
+    """Express a fitted scaler as (X - center) / scale, the form a model bundle stores"""
+    if isinstance(scaler, StandardScaler):
+        return scaler.mean_, scaler.scale_
+    if isinstance(scaler, MinMaxScaler):
+        data_range = np.where(scaler.data_range_ == 0, 1.0, scaler.data_range_)
+        return scaler.data_min_, data_range
+    return scaler.center_, scaler.scale_
+
+
+# Worker state: the search data is memory-mapped once per process
+_search = {}
+
+
+def _init_worker(data_dir: str, folds: int, seed: int):
+    X = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r')
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    _search.update(X=X, y=y, folds=list(splitter.split(np.zeros(len(y)), y)))
+
+
+def evaluate_candidate(candidate: dict, fold: int) -> dict:
+    """Fit one candidate on one fold and score the held-out part"""
+    X, y = _search['X'], _search['y']
+    train_idx, test_idx = _search['folds'][fold]
+
+    start = time.perf_counter()
+    scaler = SCALERS[candidate['scaler']]().fit(X[train_idx])
+    classifier = KNeighborsClassifier(
+        n_neighbors=min(candidate['n_neighbors'], len(train_idx)),
+        metric=candidate['metric'],
+        weights=candidate['weights']
+    ).fit(scaler.transform(X[train_idx]), y[train_idx])
+    fit_s = time.perf_counter() - start
+
+    X_test = scaler.transform(X[test_idx])
+    start = time.perf_counter()
+    y_pred = classifier.predict(X_test)
+    batch_s = time.perf_counter() - start
+
+    latencies = []
+    for row in X[test_idx[:LATENCY_SAMPLES]]:
+        start = time.perf_counter()
+        classifier.predict_proba(scaler.transform(row.reshape(1, -1)))
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        **candidate,
+        'fold': fold,
+        'accuracy': float(accuracy_score(y[test_idx], y_pred)),
+        'fit_s': fit_s,
+        'batch_us_per_row': batch_s / len(test_idx) * 1e6,
+        'single_row_us': float(np.median(latencies)) * 1e6,
+    }
+
+
+def grid_search(X: np.ndarray, y: np.ndarray, candidates: list, folds: int, workers: int, seed: int) -> list:
+    """Run every (candidate, fold) pair in a process pool and aggregate per candidate"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        np.save(os.path.join(data_dir, 'X.npy'), X)
+        np.save(os.path.join(data_dir, 'y.npy'), y)
+
+        runs = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data_dir, folds, seed)) as pool:
+            futures = [
+                pool.submit(evaluate_candidate, candidate, fold)
+                for candidate, fold in product(candidates, range(folds))
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                key = tuple(result[name] for name in ('n_neighbors', 'metric', 'weights', 'scaler'))
+                runs.setdefault(key, []).append(result)
+                if done % max(1, len(futures) // 10) == 0 or done == len(futures):
+                    print(f"   {done}/{len(futures)} fold fits done")
+
+    report = []
+    for (n_neighbors, metric, weights, scaler), fold_runs in runs.items():
+        accuracy = np.array([r['accuracy'] for r in fold_runs])
+        report.append({
+            'n_neighbors': n_neighbors,
+            'metric': metric,
+            'weights': weights,
+            'scaler': scaler,
+            'cv_accuracy': round(float(accuracy.mean()), 4),
+            'cv_std': round(float(accuracy.std()), 4),
+            'fit_s': round(float(np.mean([r['fit_s'] for r in fold_runs])), 4),
+            'batch_us_per_row': round(float(np.mean([r['batch_us_per_row'] for r in fold_runs])), 2),
+            'single_row_us': round(float(np.median([r['single_row_us'] for r in fold_runs])), 1),
+        })
+    # Best accuracy first; ties go to the faster, then the simpler (smaller k) model
+    report.sort(key=lambda r: (-r['cv_accuracy'], r['single_row_us'], r['n_neighbors']))
+    return report
+
+
+def stratified_sample(X: np.ndarray, y: np.ndarray, n_rows: int, seed: int):
+    if len(y) <= n_rows:
+        return X, y
+    X_sample, _, y_sample, _ = train_test_split(X, y, train_size=n_rows, random_state=seed, stratify=y)
+    return X_sample, y_sample
+
+
+def train_model(args):
+    """Search, train and export the KNN credit score model"""
+
     print("="*60)
     print("TRAINING KNN CREDIT SCORE MODEL")
     print("="*60)
-    
+
     # 1. Load Dataset
     print("\n1. Loading dataset...")
+    start = time.perf_counter()
     try:
-        dataset = pd.read_csv(DATA_PATH)
-        print(f"   ✓ Dataset loaded: {dataset.shape[0]} rows, {dataset.shape[1]} columns")
-        print(f"\n   Dataset Info:")
-        dataset.info()
+        X, y = load_dataset(args.data, args.chunk_size)
     except FileNotFoundError:
-        print(f"   ✗ Error: Dataset not found at {DATA_PATH}")
+        print(f"   ✗ Error: Dataset not found at {args.data}")
         print(f"   Please ensure data.csv is in the ./data/ directory")
-        return
-    
-    # 2. Prepare Features and Target
-    print("\n2. Preparing features and target...")
-    X = dataset.iloc[:, :-1].values  # All columns except last
-    y = dataset.iloc[:, -1].values   # Last column (target)
-    
-    print(f"   Features shape: {X.shape}")
-    print(f"   Target shape: {y.shape}")
-    
-    # 3. Encode Target Variable
-    print("\n3. Encoding target variable...")
-    # Ensure y is string to avoid issues with boolean interpretation
-    y = y.astype(str)
-    
+        return None
+    except ValueError as e:
+        print(f"   ✗ Error: {str(e)}")
+        return None
+    print(f"   ✓ Dataset loaded: {X.shape[0]:,} rows in {time.perf_counter() - start:.1f}s")
+
+    # 2. Encode Target Variable
+    print("\n2. Encoding target variable...")
     le = LabelEncoder()
     y_encoded = le.fit_transform(y)
     print(f"   Classes: {le.classes_}")
-    print(f"   Encoded values: {np.unique(y_encoded)}")
-    
-    # 4. Split Dataset
-    print("\n4. Splitting dataset (80% train, 20% test)...")
+    print(f"   Class counts: {np.bincount(y_encoded).tolist()}")
+
+    # 3. Split Dataset
+    print(f"\n3. Splitting dataset ({100 - args.test_size * 100:.0f}% train, {args.test_size * 100:.0f}% test)...")
     # Identify stratify parameter might cause issues if classes are too small
     stratify_param = y_encoded if len(np.unique(y_encoded)) > 1 and np.min(np.bincount(y_encoded)) > 1 else None
-    
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y_encoded, test_size=0.2, random_state=42, stratify=stratify_param
-    )
-    print(f"   Training set: {X_train.shape[0]} samples")
-    print(f"   Test set: {X_test.shape[0]} samples")
-    
-    # 5. Feature Scaling
-    print("\n5. Scaling features with StandardScaler...")
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-    print("   ✓ Features scaled")
-    
-    # 6. Train KNN Classifier
-    print("\n6. Training KNN Classifier...")
-    classifier = KNeighborsClassifier(
-        n_neighbors=6,
-        metric='minkowski',
-        p=2
+        X, y_encoded, test_size=args.test_size, random_state=args.seed, stratify=stratify_param
     )
-    classifier.fit(X_train_scaled, y_train)
+    print(f"   Training set: {X_train.shape[0]:,} samples")
+    print(f"   Test set: {X_test.shape[0]:,} samples")
+
+    # 4. Cross-validated Grid Search
+    candidates = [
+        {'n_neighbors': k, 'metric': metric, 'weights': weights, 'scaler': scaler}
+        for k, metric, weights, scaler in product(args.n_neighbors, args.metrics, args.weights, args.scalers)
+    ]
+    X_search, y_search = stratified_sample(X_train, y_train, args.cv_sample, args.seed)
+    folds = max(2, min(args.folds, int(np.min(np.bincount(y_search)))))
+    print(f"\n4. Grid search: {len(candidates)} candidates x {folds} folds on {len(y_search):,} rows "
+          f"({args.workers} workers)...")
+    start = time.perf_counter()
+    report = grid_search(X_search, y_search, candidates, folds, args.workers, args.seed)
+    print(f"   ✓ Search finished in {time.perf_counter() - start:.1f}s\n")
+    print(f"   {'k':>3} {'metric':<10} {'weights':<9} {'scaler':<9} {'cv acc':>7} {'std':>6} "
+          f"{'fit s':>7} {'us/row':>8} {'1-row us':>9}")
+    for r in report[:args.top]:
+        print(f"   {r['n_neighbors']:>3} {r['metric']:<10} {r['weights']:<9} {r['scaler']:<9} "
+              f"{r['cv_accuracy']:>7.4f} {r['cv_std']:>6.4f} {r['fit_s']:>7.3f} "
+              f"{r['batch_us_per_row']:>8.2f} {r['single_row_us']:>9.1f}")
+
+    servable = [r for r in report if r['metric'] in SERVABLE_METRICS]
+    if not servable:
+        print(f"   ✗ Error: No candidate uses a servable metric ({', '.join(SERVABLE_METRICS)})")
+        return None
+    best = servable[0]
+    if best['cv_accuracy'] < report[0]['cv_accuracy']:
+        print(f"\n   ⚠ Best candidate uses the {report[0]['metric']} metric, which the scoring service "
+              f"cannot serve; exporting the best {'/'.join(SERVABLE_METRICS)} candidate")
+    print(f"\n   Selected: k={best['n_neighbors']}, {best['metric']}, {best['weights']} weights, "
+          f"{best['scaler']} scaler (cv accuracy {best['cv_accuracy']:.4f})")
+
+    # 5. Train the selected model on the full training set
+    print("\n5. Training selected model...")
+    scaler = SCALERS[best['scaler']]().fit(X_train)
+    pipeline = FeaturePipeline.from_arrays(*scaler_arrays(scaler), n_samples=len(X_train))
+    X_train_scaled = pipeline.scale_features(X_train)
+    if len(X_train) <= KERNEL_MAX_ROWS:
+        scorer = KNNKernel(X_train_scaled, y_train, len(le.classes_), best['n_neighbors'], best['weights'])
+    else:
+        # Large reference sets are served from a KD-tree; evaluate the same way
+        scorer = KNeighborsClassifier(n_neighbors=best['n_neighbors'], weights=best['weights'],
+                                      algorithm='kd_tree', n_jobs=args.workers).fit(X_train_scaled, y_train)
     print("   ✓ Model trained")
-    
-    # 7. Evaluate Model
-    print("\n7. Evaluating model...")
-    y_pred = classifier.predict(X_test_scaled)
+
+    # 6. Evaluate Model
+    print("\n6. Evaluating model on the held-out test set...")
+    y_pred = scorer.predict_proba(pipeline.scale_features(X_test)).argmax(axis=1)
     accuracy = accuracy_score(y_test, y_pred)
-    
+
     print(f"\n   Accuracy: {accuracy:.4f} ({accuracy*100:.2f}%)")
     print("\n   Confusion Matrix:")
     print(confusion_matrix(y_test, y_pred))
     print("\n   Classification Report:")
-    print(classification_report(y_test, y_pred, target_names=le.classes_))
-    
-    # 8. Save Model and Scaler
-    print("\n8. Saving model and scaler...")
-    
-    # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(MODEL_SAVE_PATH), exist_ok=True)
-    
+    print(classification_report(y_test, y_pred, labels=range(len(le.classes_)), target_names=le.classes_,
+                                zero_division=0))
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'selected': best, 'test_accuracy': round(float(accuracy), 4), 'candidates': report}, f, indent=2)
+        print(f"   ✓ Search report written to {args.report}")
+
+    if args.dry_run:
+        print("\n   Dry run: model bundle not written")
+        return report
+
+    # 7. Save Model Bundle
+    print("\n7. Saving model bundle...")
     try:
-        # Save KNN model
-        with open(MODEL_SAVE_PATH, 'wb') as f:
-            pickle.dump(classifier, f)
-        print(f"   ✓ Model saved to: {MODEL_SAVE_PATH}")
-        
-        # Save scaler
-        with open(SCALER_SAVE_PATH, 'wb') as f:
-            pickle.dump(scaler, f)
-        print(f"   ✓ Scaler saved to: {SCALER_SAVE_PATH}")
-        
-        # Save label encoder (optional, for reference)
-        with open(LABEL_ENCODER_SAVE_PATH, 'wb') as f:
-            pickle.dump(le, f)
-        print(f"   ✓ Label encoder saved to: {LABEL_ENCODER_SAVE_PATH}")
-        
+        bundle = save_bundle(
+            args.output,
+            reference=X_train_scaled,
+            labels=y_train,
+            scaler_mean=pipeline.mean,
+            scaler_scale=pipeline.scale,
+            classes=le.classes_,
+            n_neighbors=best['n_neighbors'],
+            weights=best['weights'],
+            metrics={
+                'accuracy': round(float(accuracy), 4),
+                'n_train': int(len(y_train)),
+                'n_test': int(len(y_test)),
+                'cv_accuracy': best['cv_accuracy'],
+                'cv_folds': folds,
+                'scaler': best['scaler'],
+            }
+        )
+        print(f"   ✓ Model bundle {bundle.version} saved to: {args.output}")
     except Exception as e:
         print(f"   ✗ Error saving files: {str(e)}")
-        return
-    
-    # 9. Test Saved Model
-    print("\n9. Testing saved model...")
+        return None
+
+    # 8. Test Saved Model
+    print("\n8. Testing saved model...")
     try:
-        with open(MODEL_SAVE_PATH, 'rb') as f:
-            loaded_model = pickle.load(f)
-        with open(SCALER_SAVE_PATH, 'rb') as f:
-            loaded_scaler = pickle.load(f)
-        
-        # Make a test prediction
-        test_sample = X_test_scaled[0:1]
-        prediction = loaded_model.predict(test_sample)
-        probability = loaded_model.predict_proba(test_sample)
-        
-        print(f"   ✓ Model loaded successfully")
-        print(f"   Test prediction: {le.classes_[prediction[0]]}")
+        loaded = load_bundle(args.output, verify=True)
+        loaded_pipeline = FeaturePipeline.from_arrays(loaded.scaler_mean, loaded.scaler_scale)
+        loaded_model = KNeighborsClassifier(n_neighbors=loaded.params['n_neighbors'], weights=loaded.params['weights'])
+        loaded_model.fit(np.asarray(loaded.reference), np.asarray(loaded.labels))
+        probability = loaded_model.predict_proba(loaded_pipeline.scale_features(X_test[0:1]))
+
+        print(f"   ✓ Bundle loaded and checksums verified")
+        print(f"   Test prediction: {loaded.classes[int(probability[0].argmax())]}")
         print(f"   Prediction probability: {probability[0]}")
-        
+
     except Exception as e:
         print(f"   ✗ Error testing saved model: {str(e)}")
-        return
-    
+        return None
+
     print("\n" + "="*60)
     print("MODEL TRAINING COMPLETED SUCCESSFULLY!")
     print("="*60)
     print("\nNext steps:")
-    print("1. Copy the trained model files to your backend:")
-    print(f"   - {MODEL_SAVE_PATH}")
-    print(f"   - {SCALER_SAVE_PATH}")
-    print("2. Start your FastAPI backend")
+    print(f"1. Point ML_MODEL_PATH at the bundle (default: {BUNDLE_SAVE_PATH})")
+    print("2. Start your FastAPI backend, or POST /api/model/reload on a running one")
     print("3. The model will be automatically loaded")
     print("\n" + "="*60)
+    return report
 
 
-def test_prediction():
+def test_prediction(bundle_path: str = BUNDLE_SAVE_PATH):
     """Test the model with sample data"""
     print("\n" + "="*60)
     print("TESTING MODEL WITH SAMPLE DATA")
     print("="*60)
-    
+
     try:
-        # Load model and scaler
-        with open(MODEL_SAVE_PATH, 'rb') as f:
-            model = pickle.load(f)
-        with open(SCALER_SAVE_PATH, 'rb') as f:
-            scaler = pickle.load(f)
-        
-        # Sample loan application data
-        # [num_debts, total_debt_amount, monthly_emis, total_assets, monthly_income, city_tier]
-        sample_data = np.array([
-            [2, 50000, 5000, 200000, 50000, 1],  # Good candidate
-            [5, 150000, 15000, 100000, 30000, 2],  # Risky candidate
-            [0, 0, 0, 300000, 80000, 1]  # Excellent candidate
-        ])
-        
-        # Scale data
-        sample_scaled = scaler.transform(sample_data)
-        
+        # Load model bundle
+        bundle = load_bundle(bundle_path)
+        model = KNeighborsClassifier(n_neighbors=bundle.params['n_neighbors'], weights=bundle.params['weights'])
+        model.fit(np.asarray(bundle.reference), np.asarray(bundle.labels))
+        pipeline = FeaturePipeline.from_arrays(bundle.scaler_mean, bundle.scaler_scale)
+
+        # Sample loan application data, as the API receives it
+        sample_data = pd.DataFrame([
+            [2, 50000, 5000, 200000, 50000, 'tier_1'],  # Good candidate
+            [5, 150000, 15000, 100000, 30000, 'tier_2'],  # Risky candidate
+            [0, 0, 0, 300000, 80000, 'tier_1']  # Excellent candidate
+        ], columns=FEATURE_ORDER)
+
+        # Encode and scale data
+        sample_scaled = pipeline.transform(sample_data)
+
         # Predict
         predictions = model.predict(sample_scaled)
         probabilities = model.predict_proba(sample_scaled)
-        
+
         print("\nSample Predictions:")
         for i, (pred, prob) in enumerate(zip(predictions, probabilities)):
             print(f"\nCandidate {i+1}:")
-            print(f"  Input: {sample_data[i]}")
+            print(f"  Input: {sample_data.iloc[i].tolist()}")
             print(f"  Prediction: {'Approved' if pred == 1 else 'Rejected'}")
             print(f"  Confidence: {prob[pred]*100:.2f}%")
             print(f"  Probabilities: [Rejected: {prob[0]*100:.1f}%, Approved: {prob[1]*100:.1f}%]")
-        
+
     except Exception as e:
         print(f"Error testing predictions: {str(e)}")
-    
+
     print("\n" + "="*60)
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=DATA_PATH, help='Training CSV (features + target as last column)')
+    parser.add_argument('--output', default=BUNDLE_SAVE_PATH, help='Model bundle directory to write')
+    parser.add_argument('--n-neighbors', default='3,5,6,7,9,11,15')
+    parser.add_argument('--metrics', default='euclidean,manhattan')
+    parser.add_argument('--weights', default='uniform,distance')
+    parser.add_argument('--scalers', default='standard,minmax,robust')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=500000, help='CSV rows read per chunk')
+    parser.add_argument('--cv-sample', type=int, default=200000,
+                        help='Training rows used for the search (the winner is trained on all of them)')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--top', type=int, default=15, help='Candidates to print')
+    parser.add_argument('--report', help='Write the full search report (JSON) here')
+    parser.add_argument('--dry-run', action='store_true', help='Search and evaluate without writing a bundle')
+    parser.add_argument('--no-smoke-test', action='store_true',
+                        help='Skip the sample applicant predictions on the written bundle')
+    args = parser.parse_args(argv)
+
+    args.n_neighbors = [int(k) for k in args.n_neighbors.split(',')]
+    args.metrics = args.metrics.split(',')
+    args.weights = args.weights.split(',')
+    args.scalers = args.scalers.split(',')
+    unknown = [s for s in args.scalers if s not in SCALERS]
+    if unknown:
+        parser.error(f"Unknown scaler(s) {', '.join(unknown)}. Expected {', '.join(SCALERS)}")
+    return args
+
+
 if __name__ == "__main__":
+    args = parse_args()
     # Train the model
-    train_model()
-    
+    report = train_model(args)
+
     # Test with sample data
-    test_prediction()
+    if report is not None and not args.dry_run and not args.no_smoke_test:
+        test_prediction(args.output)
@@ -0,0 +1,106 @@
+"""
+Incrementally Update the KNN Credit Model
+Appends newly decided loans (or a labelled CSV) to the model bundle's
+reference set and publishes a new model version without retraining. Run
+with --compact periodically to fold appended segments back in, rescale the
+reference set if the scaler statistics drifted, and prebuild the index.
+
+A running backend picks the new version up through its bundle watcher
+(MODEL_RELOAD_POLL_SECONDS) or POST /api/model/reload.
+
+Usage:
+    python scripts/update_model.py                       # decided loans since the last update
+    python scripts/update_model.py --csv data/new_outcomes.csv
+    python scripts/update_model.py --compact --index kd_tree --index-dir ./app/ml/models/index
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.ml.model_bundle import load_bundle
+from app.ml.model_updater import DEFAULT_RESCALE_DRIFT, append_outcomes, compact_bundle, decided_outcomes
+
+BUNDLE_PATH = os.path.join(BACKEND_DIR, 'app', 'ml', 'models', 'credit_model')
+
+
+async def fetch_decided_loans(since: str, after_id: str, page_size: int):
+    """All decided loans after the (since, after_id) position, paged by (created_at, id)"""
+    from app.db.repositories.loan_repository import loan_repository
+    loans = []
+    while True:
+        page = await loan_repository.get_decided_loans(since=since, after_id=after_id, limit=page_size)
+        loans.extend(page)
+        if len(page) < page_size:
+            return loans
+        # Resume after the last loan itself: others may share its timestamp
+        since, after_id = page[-1]['created_at'], page[-1]['id']
+
+
+def load_outcomes(args, bundle):
+    """(features, labels, watermark, watermark id) from a labelled CSV or the loan_applications table"""
+    if args.csv:
+        # Same layout as the training data: feature columns, outcome in the last column
+        df = pd.read_csv(args.csv)
+        return df, df.iloc[:, -1].astype(str).tolist(), None, None
+    since = args.since or bundle.updates.get('last_outcome_at')
+    after_id = None if args.since else bundle.updates.get('last_outcome_id')
+    print(f"Fetching decided loans{f' created after {since}' if since else ''}...")
+    loans = asyncio.run(fetch_decided_loans(since, after_id, args.page_size))
+    features, labels, watermark = decided_outcomes(loans)
+    # Loans come ordered by (created_at, id), so the last one is the watermark's position
+    return features, labels, watermark, loans[-1]['id'] if loans else None
+
+
+def main(args):
+    bundle = load_bundle(args.bundle)
+    print(f"✓ Current model {bundle.version}: {len(bundle)} rows, {bundle.segments} appended segments")
+
+    if not args.compact_only:
+        features, labels, watermark, watermark_id = load_outcomes(args, bundle)
+        if len(labels) == 0:
+            print("⚠ No new labelled outcomes")
+        else:
+            start = time.perf_counter()
+            bundle = append_outcomes(args.bundle, features, labels, watermark=watermark,
+                                     watermark_id=watermark_id)
+            print(f"✓ Appended {len(labels)} rows in {time.perf_counter() - start:.3f}s -> {bundle.version} "
+                  f"(scaler drift {bundle.updates['scaler_drift']:.4f})")
+
+    if args.compact or args.compact_only:
+        start = time.perf_counter()
+        bundle = compact_bundle(args.bundle, rescale=args.rescale, drift_threshold=args.drift_threshold,
+                                index_type=args.index, index_dir=args.index_dir)
+        rescaled = bundle.updates.get('rescaled_at') == bundle.updates.get('compacted_at')
+        print(f"✓ Compacted in {time.perf_counter() - start:.3f}s -> {bundle.version} "
+              f"({len(bundle)} rows{', rescaled' if rescaled else ''})")
+
+    print(f"\nModel version {bundle.version} published at {args.bundle}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bundle', default=BUNDLE_PATH, help='Model bundle directory')
+    parser.add_argument('--csv', help='Labelled outcomes CSV instead of the loan_applications table')
+    parser.add_argument('--since', help='Only use loans created after this timestamp (default: last update)')
+    parser.add_argument('--page-size', type=int, default=10000)
+    parser.add_argument('--compact', action='store_true', help='Compact after appending')
+    parser.add_argument('--compact-only', action='store_true', help='Compact without appending')
+    parser.add_argument('--rescale', choices=['auto', 'always', 'never'], default='auto')
+    parser.add_argument('--drift-threshold', type=float, default=DEFAULT_RESCALE_DRIFT)
+    parser.add_argument('--index', help='Neighbour index to prebuild when compacting (brute, kd_tree, ball_tree, ivf)')
+    parser.add_argument('--index-dir', help='Persisted index root (NEIGHBOR_INDEX_DIR)')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("INCREMENTAL CREDIT MODEL UPDATE")
+    print("=" * 60)
+    main(parse_args())
@@ -0,0 +1,6 @@
+import os
+
+# Settings are read at import time; use placeholders when no .env is present
+if not os.path.exists(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')):
+    for key in ('SUPABASE_URL', 'SUPABASE_KEY', 'SUPABASE_ANON_KEY', 'JWT_SECRET'):
+        os.environ.setdefault(key, 'test')
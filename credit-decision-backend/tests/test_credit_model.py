@@ -0,0 +1,370 @@
+import time
+import numpy as np
+import pytest
+from app.ml.credit_score_model import CreditScoreModel, FEATURE_ORDER
+from app.ml.model_bundle import SegmentedRows
+
+APPLICANTS = [
+    {"num_debts": 2, "total_debt_amount": 50000, "monthly_emis": 5000,
+     "total_assets": 200000, "monthly_income": 50000, "city_tier": "tier_1"},
+    {"num_debts": 6, "total_debt_amount": 900000, "monthly_emis": 30000,
+     "total_assets": 100000, "monthly_income": 25000, "city_tier": "tier_1"},
+    {"num_debts": 0, "total_debt_amount": 0, "monthly_emis": 0,
+     "total_assets": 300000, "monthly_income": 80000, "city_tier": "tier_3"},
+    {"num_debts": 4, "total_debt_amount": 150000, "monthly_emis": 15000,
+     "total_assets": 0, "monthly_income": 30000, "city_tier": "tier_2"},
+]
+
+@pytest.fixture(scope="module")
+def model():
+    return CreditScoreModel()
+
+def test_predict_batch_matches_predict(model):
+    """Batch scoring returns the same values as scoring one applicant at a time"""
+    ml_scores, acceptance_rates = model.predict_batch(APPLICANTS)
+    assert ml_scores.shape == (len(APPLICANTS),)
+    for i, applicant in enumerate(APPLICANTS):
+        assert model.predict(applicant) == (round(ml_scores[i], 2), round(acceptance_rates[i], 2))
+
+def test_predict_batch_accepts_feature_array(model):
+    """An encoded (N, 6) array gives the same result as the dict input"""
+    X = np.array([[2, 50000, 5000, 200000, 50000, 1],
+                  [0, 0, 0, 300000, 80000, 3]], dtype=float)
+    from_array = model.predict_batch(X)
+    from_dicts = model.predict_batch([APPLICANTS[0], APPLICANTS[2]])
+    np.testing.assert_allclose(from_array[0], from_dicts[0])
+    np.testing.assert_allclose(from_array[1], from_dicts[1])
+    assert np.all((from_array[1] >= 10) & (from_array[1] <= 95))
+
+def test_predict_batch_rejects_wrong_shape(model):
+    """Arrays that do not match FEATURE_ORDER are rejected"""
+    with pytest.raises(ValueError):
+        model.predict_batch(np.zeros((3, len(FEATURE_ORDER) - 1)))
+
+def test_rule_engine_feedback(model):
+    """Statuses and feedback come out of the same rule evaluation"""
+    evaluation = model.evaluate_batch(APPLICANTS)
+    assert len(evaluation) == len(APPLICANTS)
+    risky = evaluation.result(1)
+    assert "High debt-to-income ratio" in risky["feedback"]["concerns"]
+    assert "Multiple existing debt obligations" in risky["feedback"]["concerns"]
+    assert "high_emi" in evaluation.codes(1)
+    assert "Low number of existing debts" in evaluation.feedback(2)["strengths"]
+    assert list(evaluation.statuses) == [evaluation.result(i)["status"] for i in range(len(APPLICANTS))]
+
+def test_rule_table_is_data():
+    """A policy change is an edit to the rule table, not to code"""
+    from app.ml.decision_rules import RuleEngine
+    rules = {
+        "bounds": {"min": 0, "max": 100},
+        "adjustments": [{"name": "tier", "clauses": [
+            {"when": [["city_tier", "==", 3]], "adjustment": 20, "code": "tier_3_bonus"}
+        ]}],
+        "decision": [
+            {"when": [["acceptance_rate", ">=", 60]], "status": "approved", "code": "ok", "message": "ok"},
+            {"when": [], "status": "rejected", "code": "no", "message": "no"}
+        ],
+        "feedback": []
+    }
+    engine = RuleEngine(rules)
+    X = np.array([[0, 0, 0, 0, 1000, 3], [0, 0, 0, 0, 1000, 1]], dtype=float)
+    evaluation = engine.evaluate(X, np.array([50.0, 50.0]))
+    assert list(evaluation.acceptance_rates) == [70.0, 50.0]
+    assert list(evaluation.statuses) == ["approved", "rejected"]
+    with pytest.raises(ValueError):
+        RuleEngine({**rules, "feedback": [{"section": "strengths", "code": "x", "message": "x",
+                                           "when": [["unknown_metric", ">", 1]]}]})
+
+def test_model_bundle_round_trip(model, tmp_path):
+    """A saved bundle reloads memory-mapped and scores identically"""
+    from app.ml.model_bundle import load_bundle
+    bundle = model.save_model(str(tmp_path / "bundle"))
+    assert isinstance(load_bundle(bundle.path).reference, np.memmap)
+    reloaded = CreditScoreModel(bundle_path=bundle.path)
+    assert reloaded.model_format == "bundle"
+    assert reloaded.get_model_info()["model_version"] == bundle.version
+    np.testing.assert_array_equal(reloaded.predict_batch(APPLICANTS)[0], model.predict_batch(APPLICANTS)[0])
+    # 'sklearn' is the deprecated name of the exact kernel
+    aliased = CreditScoreModel(bundle_path=bundle.path, index_type="sklearn")
+    assert aliased.index_type == "exact" and aliased.kernel is not None
+    assert aliased.get_model_info()["neighbor_index"] == "exact"
+
+def test_model_bundle_rejects_feature_schema_mismatch(model, tmp_path):
+    """Bundles whose feature order differs from FEATURE_ORDER are refused"""
+    import json
+    from app.ml.model_bundle import load_bundle, ModelBundleError, MANIFEST_FILE
+    bundle = model.save_model(str(tmp_path / "bundle"))
+    manifest_path = tmp_path / "bundle" / MANIFEST_FILE
+    manifest = json.loads(manifest_path.read_text())
+    manifest["features"] = list(reversed(manifest["features"]))
+    manifest_path.write_text(json.dumps(manifest))
+    with pytest.raises(ModelBundleError):
+        load_bundle(bundle.path)
+
+def test_model_bundle_publish_never_leaves_path_missing(model, tmp_path):
+    """Readers always find a complete bundle while new versions are published"""
+    import os
+    import threading
+    from app.ml.model_bundle import load_bundle
+    path = str(tmp_path / "bundle")
+    model.save_model(path)
+    # A bundle written as a plain directory is moved under the symlink on the next publish
+    os.replace(os.path.realpath(path), str(tmp_path / "plain"))
+    os.remove(path)
+    os.replace(str(tmp_path / "plain"), path)
+
+    errors, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                load_bundle(path)
+            except Exception as e:
+                errors.append(e)
+
+    model.save_model(path)
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        versions = [model.save_model(path).version for _ in range(10)]
+    finally:
+        done.set()
+        reader.join()
+    assert errors == []
+    assert os.path.islink(path) and load_bundle(path).version == versions[-1]
+    # Only the current and the previous version are kept
+    assert len([name for name in os.listdir(tmp_path) if name.startswith(".bundle.")]) == 2
+
+def test_registry_reload_swaps_model(model, tmp_path):
+    """A reload publishes the new model; a failed reload keeps the old one"""
+    import asyncio
+    from app.ml.model_registry import ModelRegistry
+    bundle = model.save_model(str(tmp_path / "bundle"))
+    registry = ModelRegistry(model)
+    swaps = []
+    registry.add_swap_listener(lambda old, new: swaps.append((old.model_version, new.model_version)))
+
+    in_flight = registry.current
+    result = asyncio.run(registry.reload(bundle.path))
+    assert result["model_version"] == bundle.version
+    assert registry.current is not in_flight
+    assert registry.current.model_format == "bundle"
+    assert swaps == [(model.model_version, bundle.version)]
+    # A request that already took the old model keeps using it
+    assert in_flight.predict_batch(APPLICANTS)[0].shape == (len(APPLICANTS),)
+
+    with pytest.raises(Exception):
+        asyncio.run(registry.reload(str(tmp_path / "missing")))
+    assert registry.version == bundle.version
+
+def test_prediction_cache_lru_ttl_and_version():
+    """Cache keys normalize features and include the model version; entries evict and expire"""
+    from app.ml.prediction_cache import PredictionCache, feature_key
+    now = [0.0]
+    cache = PredictionCache(max_size=2, ttl_seconds=10, clock=lambda: now[0])
+
+    applicant = dict(APPLICANTS[0])
+    retry = {**applicant, 'monthly_income': str(applicant['monthly_income']), 'amount_requested': 1}
+    assert feature_key(applicant, 'v1') == feature_key(retry, 'v1')
+    assert feature_key(applicant, 'v1') != feature_key(applicant, 'v2')
+
+    cache.put(('a',), {'ml_score': 1.0})
+    cached = cache.get(('a',))
+    cached['ml_score'] = 99.0
+    assert cache.get(('a',)) == {'ml_score': 1.0}
+
+    cache.put(('b',), {})
+    cache.put(('c',), {})
+    assert cache.get(('a',)) is None and cache.evictions == 1
+
+    now[0] = 11.0
+    assert cache.get(('c',)) is None and cache.expirations == 1
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses']) == (2, 2)
+
+def test_inference_executor_matches_inline_and_bounds_queue(model):
+    """Pooled inference returns the inline result; excess requests are rejected"""
+    import asyncio
+    from app.ml.inference_executor import (
+        InferenceExecutor, InferenceOverloaded, InferenceTimeout, evaluate_results
+    )
+    inline = InferenceExecutor(kind='inline')
+    pooled = InferenceExecutor(kind='thread', max_workers=2, max_pending=1, timeout=0.05)
+
+    def slow(model, features):
+        time.sleep(0.2)
+        return evaluate_results(model, features)
+
+    async def scenario():
+        expected = await inline.run(evaluate_results, model, APPLICANTS)
+        assert await pooled.run(evaluate_results, model, APPLICANTS) == expected
+        with pytest.raises(InferenceTimeout):
+            await pooled.run(slow, model, APPLICANTS)
+        # The timed-out call still occupies the only slot until it finishes
+        with pytest.raises(InferenceOverloaded):
+            await pooled.run(evaluate_results, model, APPLICANTS)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pooled.shutdown()
+    assert pooled.get_stats()['rejected'] == 1 and pooled.get_stats()['timeouts'] == 1
+
+def test_micro_batcher_coalesces_requests(model):
+    """Concurrent submissions share one model call and each gets its own row back"""
+    import asyncio
+    from app.ml.inference_executor import evaluate_results
+    from app.ml.micro_batcher import MicroBatcher
+    calls = []
+
+    async def run_batch(batch_model, applications):
+        calls.append(len(applications))
+        return evaluate_results(batch_model, applications)
+
+    batcher = MicroBatcher(run_batch, window_ms=20, max_batch_size=len(APPLICANTS))
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(model, a) for a in APPLICANTS))
+
+    assert asyncio.run(scenario()) == evaluate_results(model, APPLICANTS)
+    assert calls == [len(APPLICANTS)]
+    stats = batcher.get_stats()
+    assert stats['batches'] == 1 and stats['mean_batch_size'] == len(APPLICANTS)
+
+def test_micro_batcher_fails_only_the_bad_request(model):
+    """A batch that fails is scored one request at a time, unless the error is about the call itself"""
+    import asyncio
+    from app.ml.inference_executor import evaluate_results
+    from app.ml.micro_batcher import MicroBatcher
+    bad = {**APPLICANTS[0], 'monthly_income': 'not a number'}
+    calls = []
+
+    async def run_batch(batch_model, applications):
+        calls.append(len(applications))
+        return evaluate_results(batch_model, applications)
+
+    batcher = MicroBatcher(run_batch, window_ms=20, max_batch_size=len(APPLICANTS) + 1)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(model, a) for a in [bad] + APPLICANTS), return_exceptions=True)
+
+    failed, *scored = asyncio.run(scenario())
+    assert isinstance(failed, Exception) and scored == evaluate_results(model, APPLICANTS)
+    assert calls == [len(APPLICANTS) + 1] + [1] * (len(APPLICANTS) + 1)
+    assert batcher.get_stats()['split_batches'] == 1
+
+    async def busy(batch_model, applications):
+        calls.append(len(applications))
+        raise TimeoutError("scoring timed out")
+
+    calls.clear()
+    batcher = MicroBatcher(busy, window_ms=20, max_batch_size=len(APPLICANTS), batch_errors=(TimeoutError,))
+
+    async def busy_scenario():
+        return await asyncio.gather(*(batcher.submit(model, a) for a in APPLICANTS), return_exceptions=True)
+
+    assert all(isinstance(e, TimeoutError) for e in asyncio.run(busy_scenario())) and calls == [len(APPLICANTS)]
+
+def test_feature_pipeline_inputs_agree(model):
+    """Dicts, DataFrames (label or numeric tiers) and arrays encode to the same matrix"""
+    import pandas as pd
+    from app.ml.feature_engineering import build_feature_matrix, encode_city_tier
+
+    X = build_feature_matrix(APPLICANTS)
+    frame = pd.DataFrame(APPLICANTS)
+    numeric = frame.assign(city_tier=encode_city_tier(frame['city_tier']))
+    assert np.array_equal(build_feature_matrix(frame), X)
+    assert np.array_equal(build_feature_matrix(numeric), X)
+    assert np.array_equal(build_feature_matrix(X), X)
+    assert encode_city_tier(['tier_1', 'tier_3', 'unknown', 7]).tolist() == [1.0, 3.0, 2.0, 2.0]
+    assert np.allclose(model.predict_batch(frame)[1], model.predict_batch(APPLICANTS)[1])
+    with pytest.raises(ValueError):
+        build_feature_matrix(frame.drop(columns=['monthly_emis']))
+
+def test_incremental_update_appends_and_compacts(model, tmp_path):
+    """Appended outcomes publish a new version; compaction folds them in and rescales like a refit"""
+    from sklearn.preprocessing import StandardScaler
+    from app.ml.feature_engineering import build_feature_matrix
+    from app.ml.model_updater import append_outcomes, compact_bundle, decided_outcomes
+    bundle = model.save_model(str(tmp_path / "bundle"))
+    base_raw = bundle.reference * bundle.scaler_scale + bundle.scaler_mean
+
+    loans = [dict(a, status=s, created_at=f"2026-01-0{i + 1}") for i, (a, s) in
+             enumerate(zip(APPLICANTS, ["approved", "rejected", "processing", "approved"]))]
+    X, labels, watermark = decided_outcomes(loans)
+    assert labels == ["True", "False", "True"] and watermark == "2026-01-04"
+    appended = append_outcomes(bundle.path, X, labels, watermark=watermark, watermark_id="loan-4")
+    assert appended.version != bundle.version and appended.segments == 1
+    assert len(appended) == len(bundle) + 3 and appended.updates["last_outcome_at"] == watermark
+    assert appended.updates["last_outcome_id"] == "loan-4"
+    # Base rows are untouched; new rows use the serving scaler
+    np.testing.assert_array_equal(appended.reference[:len(bundle)], bundle.reference)
+    np.testing.assert_allclose(appended.reference[len(bundle):],
+                               (X - bundle.scaler_mean) / bundle.scaler_scale, rtol=1e-6, atol=1e-6)
+    reloaded = CreditScoreModel(bundle_path=appended.path)
+    assert reloaded.model_version == appended.version and len(reloaded.reference) == len(appended)
+    # Segments stay separate memory-mapped files; a scan over them scores like the in-memory kernel
+    assert isinstance(appended.reference, SegmentedRows)
+    assert all(isinstance(part, np.memmap) for part in appended.reference.parts + appended.labels.parts)
+    scanned = CreditScoreModel(bundle_path=appended.path, index_type="brute")
+    assert scanned.neighbor_index.reference is scanned.reference
+    np.testing.assert_allclose(scanned.predict_batch(APPLICANTS)[0], reloaded.predict_batch(APPLICANTS)[0])
+
+    compacted = compact_bundle(appended.path, rescale="always")
+    assert compacted.segments == 0 and compacted.manifest["format_version"] == 1
+    refit = StandardScaler().fit(np.vstack([base_raw, X]))
+    np.testing.assert_allclose(compacted.scaler_mean, refit.mean_, rtol=1e-6)
+    np.testing.assert_allclose(compacted.scaler_scale, refit.scale_, rtol=1e-6)
+    np.testing.assert_allclose(compacted.reference, refit.transform(np.vstack([base_raw, X])), atol=1e-4)
+    np.testing.assert_array_equal(compacted.labels, appended.labels)
+    with pytest.raises(ValueError):
+        append_outcomes(compacted.path, build_feature_matrix(APPLICANTS[:1]), ["maybe"])
+
+def test_shadow_scorer_records_disagreements_and_drops_when_full(model, tmp_path):
+    """Shadow evaluations never block: a full queue drops them; disagreements are logged"""
+    import json
+    import threading
+    from app.ml.inference_executor import evaluate_scores
+    from app.ml.shadow_scorer import ShadowScorer
+
+    release = threading.Event()
+    class GatedModel:
+        model_version = "candidate"
+        def evaluate_batch(self, features):
+            release.wait(5)
+            return model.evaluate_batch(features)
+
+    log_path = tmp_path / "shadow.jsonl"
+    shadow = ShadowScorer(GatedModel(), max_queue=2, batch_size=1, rate_tolerance=1.0, log_path=str(log_path))
+    production = evaluate_scores(model, APPLICANTS)
+    production[0] = {**production[0], "status": "other", "acceptance_rate": production[0]["acceptance_rate"] + 50}
+    accepted = [shadow.submit(a, p, "prod") for a, p in zip(APPLICANTS, production)]
+    time.sleep(0.05)
+    # The worker holds one applicant, two wait in the queue, the rest are dropped
+    accepted += [shadow.submit(a, p, "prod") for a, p in zip(APPLICANTS, production)]
+    release.set()
+    shadow.shutdown()
+
+    stats = shadow.get_stats()
+    assert stats["dropped"] == accepted.count(False) > 0
+    assert stats["evaluated"] == accepted.count(True) and stats["errors"] == 0
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert records and all(r["candidate_version"] == "candidate" for r in records)
+    assert stats["status_disagreements"] == sum(r["production"]["status"] == "other" for r in records) >= 1
+
+def test_neighbor_explanations_reuse_the_scoring_query(model):
+    """Explanations come from the same kneighbors call and do not change the scores"""
+    from unittest import mock
+    plain = model.evaluate_batch(APPLICANTS)
+    with mock.patch.object(model, "kneighbors", wraps=model.kneighbors) as kneighbors:
+        explained = model.evaluate_batch(APPLICANTS, explain=True)
+    assert kneighbors.call_count == 1
+    np.testing.assert_array_equal(explained.ml_scores, plain.ml_scores)
+    assert "neighbors" not in plain.result(0)["feedback"]
+
+    for i in range(len(APPLICANTS)):
+        neighbors = explained.result(i)["feedback"]["neighbors"]
+        assert len(neighbors["nearest"]) == neighbors["k"] == model.n_neighbors
+        assert neighbors["approved_vote_share"] * 100 == pytest.approx(explained.ml_scores[i], abs=0.01)
+        assert sum(neighbors["distance_share"].values()) == pytest.approx(1, abs=1e-3)
+        assert [n["distance"] for n in neighbors["nearest"]] == sorted(n["distance"] for n in neighbors["nearest"])
@@ -0,0 +1,112 @@
+import pandas as pd
+from app.utils.financial_analyzer import financial_analyzer, merge_aggregates
+from app.utils.transaction_keys import TransactionKeys
+
+JANUARY = [
+    {"date": "2025-01-01", "description": "Salary", "amount": 50000.0, "type": "credit"},
+    {"date": "2025-01-03", "description": "Uber ride", "amount": 350.5, "type": "debit"},
+    {"date": "2025-01-03", "description": "Uber ride", "amount": 350.5, "type": "debit"},
+    {"date": "2025-01-20 18:30:00", "description": "Swiggy", "amount": 800.0, "type": "debit"},
+]
+FEBRUARY = [
+    {"date": "2025-02-01", "description": "Salary", "amount": 50000.0, "type": "credit"},
+    {"date": "2025-02-10", "description": "DMart groceries", "amount": 2400.0, "type": "debit"},
+]
+
+def frame(rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["date", "description", "amount", "type"])
+
+def test_merged_aggregates_score_like_one_combined_statement():
+    january = financial_analyzer.aggregate_frames([frame(JANUARY)])
+    february = financial_analyzer.aggregate_frames([frame(FEBRUARY[:1]), frame(FEBRUARY[1:])])
+    merged = merge_aggregates(january, february)
+
+    assert financial_analyzer.score_aggregates(merged, 30000) == financial_analyzer.analyze_transactions(JANUARY + FEBRUARY, 30000)
+    assert merged["transaction_count"] == 6 and merged["credit_count"] == 2
+    assert merged["first_date"].startswith("2025-01-01") and merged["last_date"].startswith("2025-02-10")
+    assert list(merged["monthly"]) == ["2025-01", "2025-02"]
+    assert merged["monthly"]["2025-01"]["spending"] == 1501.0 and merged["monthly"]["2025-01"]["debits"] == 3
+    assert merged["monthly"]["2025-02"]["category_spending"]["groceries"] == 2400.0
+
+def test_consecutive_monthly_uploads_score_like_one():
+    """Category percentages are per month covered, so another month of the same spending scores the same"""
+    march = [dict(row, date=row["date"].replace("2025-01", "2025-03")) for row in JANUARY]
+    one = financial_analyzer.analyze_transactions(JANUARY, 30000)
+    merged = merge_aggregates(financial_analyzer.aggregate_frames([frame(JANUARY)]),
+                              financial_analyzer.aggregate_frames([frame(march)]))
+    two = financial_analyzer.score_aggregates(merged, 30000)
+
+    assert two["total_score"] == one["total_score"] and two["behavior_rating"] == one["behavior_rating"]
+    for category, score in two["category_scores"].items():
+        assert score["percentage"] == one["category_scores"][category]["percentage"]
+        assert score["spending"] == round(2 * one["category_scores"][category]["spending"], 2)
+
+def test_keys_repeat_across_uploads_but_not_within_one():
+    first = TransactionKeys()(frame(JANUARY))
+    # The two identical Uber rows on one day are different transactions
+    assert len(set(first.tolist())) == 4
+
+    # Re-uploading an overlapping statement, split differently and formatted differently, gives the same keys
+    reupload = frame(JANUARY[2:] + FEBRUARY)
+    reupload.loc[1, "date"] = "2025-01-20 09:00:00"
+    keys = TransactionKeys()
+    again = list(keys(frame(JANUARY[:2]))) + list(keys(reupload))
+    assert again[:4] == first.tolist()
+    assert len(set(again) - set(first.tolist())) == 2
+
+def test_digest_identifies_the_transaction_set_in_any_order():
+    def digest(*frames):
+        keys = TransactionKeys()
+        for f in frames:
+            keys(f)
+        return keys.digest()
+
+    rows = JANUARY + FEBRUARY
+    assert digest(frame(rows)) == digest(frame(rows[::-1])) == digest(frame(rows[:3]), frame(rows[3:]))
+    assert digest(frame(rows)) != digest(frame(rows[1:]))
+    # Dropping one of the identical Uber rows is a different set
+    assert digest(frame(rows)) != digest(frame(rows[:2] + rows[3:]))
+
+def test_cash_flow_features_follow_the_monthly_time_structure():
+    """Income every quarter is regular but not stable; balances run month by month, gaps included"""
+    rows = []
+    for month in range(1, 13):
+        if month % 3 == 1:
+            rows.append({"date": f"2025-{month:02d}-01", "description": "Bonus", "amount": 60000.0, "type": "credit"})
+        if month != 6:  # no transactions at all in June
+            rows.append({"date": f"2025-{month:02d}-15", "description": "Rent", "amount": 20000.0, "type": "debit"})
+    analysis = financial_analyzer.analyze_transactions(rows, 30000)
+    cash_flow = analysis["cash_flow"]
+
+    assert cash_flow["months"] == 12 and cash_flow["inflow_months"] == 4
+    assert cash_flow["inflow_periodicity"] == 0.3333 and cash_flow["inflow_regularity"] == 1.0
+    assert analysis["cash_inflow_pattern"] == "recurring" and not analysis["has_stable_inflow"]
+    # 240000 in, 220000 out; the low point is March's month end, after three months of rent
+    assert cash_flow["net_balance"] == 20000.0 and cash_flow["min_balance"] == 0.0
+    # 20000 at 220000 / 12 a month
+    assert analysis["liquidity_resilience_days"] == cash_flow["liquidity_runway_days"] == 32
+
+    steady = financial_analyzer.analyze_transactions(JANUARY + FEBRUARY, 30000)
+    assert steady["has_stable_inflow"] and steady["cash_flow"]["income_variation"] == 0.0
+
+def test_any_subset_of_analysis_rows_aggregates_like_its_transactions():
+    """An upload is reduced to analysis rows once; the rows found new are aggregated later"""
+    rows = financial_analyzer.analysis_rows(frame(JANUARY + FEBRUARY))
+    new = [True, False, True, False, True, True]
+    expected = financial_analyzer.aggregate_frames([frame([r for r, keep in zip(JANUARY + FEBRUARY, new) if keep])])
+    assert financial_analyzer.aggregate_rows(rows[new]) == expected
+    assert financial_analyzer.aggregate_rows(rows.iloc[:0])["transaction_count"] == 0
+
+def test_unusable_dates_only_count_towards_the_totals():
+    """Non-ISO or impossible dates become NaT instead of failing the upload"""
+    rows = JANUARY + [
+        {"date": "31/01/2025", "description": "Swiggy", "amount": 100.0, "type": "debit"},
+        {"date": "2025-02-30", "description": "Swiggy", "amount": 200.0, "type": "debit"},
+    ]
+    days = financial_analyzer.analysis_rows(frame(rows))["day"]
+    assert days.isna().tolist() == [False] * len(JANUARY) + [True, True]
+
+    aggregates = financial_analyzer.aggregate_frames([frame(rows)])
+    assert aggregates["transaction_count"] == 6 and aggregates["total_spending"] == 1801.0
+    assert list(aggregates["monthly"]) == ["2025-01"] and aggregates["monthly"]["2025-01"]["spending"] == 1501.0
+    assert financial_analyzer.analyze_transactions(rows, 30000)["transaction_depth_days"] == 19
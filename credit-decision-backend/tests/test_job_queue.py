@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from datetime import datetime, timedelta, timezone
+from app.services.job_queue import JobQueueFull, JobStore, LocalJobQueue
+
+def test_jobs_run_in_the_background_with_progress_and_errors():
+    async def handler(payload, progress):
+        progress({'stage': 'working'})
+        await asyncio.sleep(0.01)
+        if payload['fail'] == 'http':
+            raise HTTPException(status_code=400, detail="No valid transactions found in file")
+        if payload['fail'] == 'crash':
+            raise RuntimeError("boom")
+        return {'doubled': payload['n'] * 2}
+
+    async def scenario():
+        jobs = LocalJobQueue(max_workers=2, max_pending=10)
+        jobs.register('double', handler)
+        submitted = [await jobs.submit('double', {'n': 21, 'fail': fail}, owner='u1') for fail in (None, 'http', 'crash')]
+        assert all(job['status'] == 'queued' for job in submitted)
+        await jobs._queue.join()
+        done = [await jobs.get(job['id']) for job in submitted]
+        await jobs.shutdown()
+        return jobs, done
+
+    jobs, (ok, bad_file, crashed) = asyncio.run(scenario())
+    assert ok['status'] == 'succeeded' and ok['result'] == {'doubled': 42}
+    assert ok['progress'] == {'stage': 'working'} and ok['owner'] == 'u1' and ok['finished_at']
+    assert bad_file['status'] == 'failed' and bad_file['error']['status_code'] == 400
+    assert crashed['error'] == {'status_code': 500, 'detail': 'Job failed unexpectedly'}
+    assert jobs.get_stats()['succeeded'] == 1 and jobs.get_stats()['failed'] == 2
+
+def test_full_queue_rejects_and_finished_jobs_expire():
+    now = [0.0]
+    release = None
+
+    async def handler(payload, progress):
+        await release.wait()
+        return {}
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        jobs = LocalJobQueue(max_workers=1, max_pending=2, result_ttl_seconds=60, clock=lambda: now[0])
+        jobs.register('wait', handler)
+        first = await jobs.submit('wait', {})
+        await asyncio.sleep(0)  # the worker takes the first job
+        waiting = [await jobs.submit('wait', {}) for _ in range(2)]
+        with pytest.raises(JobQueueFull):
+            await jobs.submit('wait', {})
+        with pytest.raises(ValueError):
+            await jobs.submit('unknown', {})
+        release.set()
+        await jobs._queue.join()
+        assert (await jobs.get(first['id']))['status'] == 'succeeded'
+        now[0] = 61
+        gone = await jobs.get(waiting[0]['id'])
+        stats = jobs.get_stats()
+        await jobs.shutdown()
+        return gone, stats
+
+    gone, stats = asyncio.run(scenario())
+    assert gone is None
+    assert stats['rejected'] == 1 and stats['jobs']['succeeded'] == 0
+
+def test_shutdown_fails_waiting_jobs_and_cleans_them_up():
+    """Jobs still queued at shutdown never reach their handler, so their cleanup releases the payload"""
+    started, cleaned = asyncio.Event(), []
+
+    async def handler(payload, progress):
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        finally:
+            cleaned.append(('handler', payload['n']))
+
+    async def scenario():
+        jobs = LocalJobQueue(max_workers=1, max_pending=5)
+        jobs.register('slow', handler, cleanup=lambda payload: cleaned.append(('cleanup', payload['n'])))
+        submitted = [await jobs.submit('slow', {'n': n}) for n in range(3)]
+        await started.wait()
+        await jobs.shutdown()
+        return [await jobs.get(job['id']) for job in submitted]
+
+    running, *waiting = asyncio.run(scenario())
+    assert sorted(cleaned) == [('cleanup', 1), ('cleanup', 2), ('handler', 0)]
+    assert running['status'] == 'failed' and running['error']['status_code'] == 503
+    assert all(job['status'] == 'failed' and job['error']['detail'] == 'Server shut down before the job started'
+               and job['finished_at'] for job in waiting)
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self.records = {}
+
+    async def save_jobs(self, jobs):
+        self.records.update((job['id'], dict(job)) for job in jobs)
+
+    async def get_job(self, job_id):
+        return self.records.get(job_id)
+
+def test_jobs_are_visible_to_every_worker_through_the_store():
+    """Another process's queue reports a job from the shared store, and a job nobody keeps alive fails"""
+    store, release = MemoryJobStore(), None
+
+    async def handler(payload, progress):
+        progress({'stage': 'parsing'})
+        await release.wait()
+        return {'done': payload['n']}
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        accepting = LocalJobQueue(max_workers=1, store=store, sync_seconds=0.01)
+        other = LocalJobQueue(store=store, sync_seconds=0.01)
+        accepting.register('upload', handler)
+        job = await accepting.submit('upload', {'n': 1}, owner='u1')
+        await asyncio.sleep(0.05)
+        running = await other.get(job['id'])
+        release.set()
+        await accepting._queue.join()
+        done = await other.get(job['id'])
+        missing = await other.get('unknown')
+        await accepting.shutdown()
+        return running, done, missing
+
+    running, done, missing = asyncio.run(scenario())
+    assert running['status'] == 'running' and running['progress'] == {'stage': 'parsing'} and running['owner'] == 'u1'
+    assert done['status'] == 'succeeded' and done['result'] == {'done': 1} and missing is None
+
+    # The accepting worker died: its record stopped being refreshed
+    stale = (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat()
+    store.records['lost'] = {**store.records[done['id']], 'id': 'lost', 'status': 'running', 'finished_at': None,
+                             'updated_at': stale}
+    lost = asyncio.run(LocalJobQueue(store=store).get('lost'))
+    assert lost['status'] == 'failed' and lost['error']['status_code'] == 503
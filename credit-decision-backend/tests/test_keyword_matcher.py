@@ -0,0 +1,40 @@
+import random
+from app.utils.keyword_matcher import KeywordMatcher
+from app.utils.financial_analyzer import FinancialAnalyzer
+
+KEYWORDS = FinancialAnalyzer.CATEGORY_KEYWORDS
+
+def categorize_by_scanning(description: str) -> str:
+    """The original categorizer: each category's keywords in turn"""
+    description = description.lower()
+    for category, keywords in KEYWORDS.items():
+        if any(keyword in description for keyword in keywords):
+            return category
+    return 'others'
+
+def test_matches_keyword_scan_in_priority_order():
+    """The compiled matcher agrees with scanning category by category, scalar and vectorized"""
+    rng = random.Random(3)
+    words = [k for keywords in KEYWORDS.values() for k in keywords] + ['upi', 'neft', 'xyz', '4417', '/']
+    descriptions = [
+        ' '.join(rng.choice(words).upper() if rng.random() < 0.3 else rng.choice(words) for _ in range(rng.randint(0, 4)))
+        for _ in range(5000)
+    ] + ['', 'Movie at the MALL via Uber', 'emi\nswiggy']
+    expected = [categorize_by_scanning(d) for d in descriptions]
+
+    matcher = KeywordMatcher(KEYWORDS)
+    assert [matcher.category(d) for d in descriptions] == expected
+    assert [matcher.categories[i] for i in KeywordMatcher(KEYWORDS).match_array(descriptions)] == expected
+    # The mall comes before the movie in the text, but transport outranks both
+    assert matcher.category('Movie at the MALL via Uber') == 'transport'
+
+def test_memo_is_bounded_and_ignores_reference_numbers():
+    matcher = KeywordMatcher({'food': ['swiggy'], 'rent': ['rent', 'swiggy']}, memo_size=2)
+    assert matcher.category('UPI/1234/SWIGGY') == 'food'
+    assert matcher.category('UPI/9876/SWIGGY') == 'food'
+    assert len(matcher._memo) == 1
+    assert [matcher.category(d) for d in ['rent 01', 'misc', 'rent 02']] == ['rent', 'others', 'rent']
+    assert len(matcher._memo) == 2
+    assert list(matcher.match_array(['x', None, 'Swiggy 7'])) == [2, 2, 0]
+    # Keywords with digits turn masking off
+    assert KeywordMatcher({'atm': ['atm 24x7']}).category('ATM 24X7') == 'atm'
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from sklearn.neighbors import KNeighborsClassifier
+from app.ml.neighbor_index import build_index, load_index, neighbor_vote, INDEX_TYPES
+
+rng = np.random.default_rng(7)
+REFERENCE = rng.normal(size=(2000, 6))
+LABELS = (REFERENCE[:, 0] + 0.5 * rng.normal(size=2000) > 0).astype(int)
+QUERIES = rng.normal(size=(50, 6))
+
+@pytest.mark.parametrize("kind", ["brute", "kd_tree", "ball_tree"])
+@pytest.mark.parametrize("weights", ["uniform", "distance"])
+def test_exact_indexes_match_sklearn(kind, weights):
+    """Exact indexes reproduce KNeighborsClassifier.predict_proba"""
+    knn = KNeighborsClassifier(n_neighbors=6, weights=weights).fit(REFERENCE.astype(np.float32), LABELS)
+    index = build_index(kind, REFERENCE)
+    distances, indices = index.query(QUERIES, 6)
+    proba = neighbor_vote(LABELS[indices], distances, 2, weights)
+    np.testing.assert_allclose(proba, knn.predict_proba(QUERIES), atol=1e-6)
+
+def test_ivf_recall_grows_with_n_probe():
+    """n_probe = n_lists is exact; fewer probes trade recall for speed"""
+    exact = build_index("brute", REFERENCE).query(QUERIES, 6)[1]
+    index = build_index("ivf", REFERENCE, n_lists=32, n_probe=1)
+    low = np.mean([len(set(a) & set(b)) / 6 for a, b in zip(index.query(QUERIES, 6)[1], exact)])
+    index.n_probe = 32
+    full = np.mean([len(set(a) & set(b)) / 6 for a, b in zip(index.query(QUERIES, 6)[1], exact)])
+    assert full == 1.0
+    assert low <= full
+
+@pytest.mark.parametrize("kind", sorted(INDEX_TYPES))
+def test_saved_index_is_memory_mapped(kind, tmp_path):
+    """Saved indexes reload with a float32 memory-mapped reference set"""
+    index = build_index(kind, REFERENCE)
+    index.save(str(tmp_path))
+    loaded = load_index(str(tmp_path))
+    assert isinstance(loaded.reference, np.memmap)
+    assert loaded.reference.dtype == np.float32
+    np.testing.assert_array_equal(loaded.query(QUERIES, 6)[1], index.query(QUERIES, 6)[1])
@@ -0,0 +1,62 @@
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+from app.ml.credit_score_model import CreditScoreModel
+from app.ml.preprocessor import FeaturePipeline, KNNKernel
+
+rng = np.random.default_rng(11)
+RAW = np.column_stack([
+    rng.integers(0, 8, 500), rng.uniform(0, 5e5, 500), rng.uniform(0, 3e4, 500),
+    rng.uniform(0, 2e6, 500), rng.uniform(5e3, 2e5, 500), rng.integers(1, 4, 500),
+]).astype(float)
+LABELS = (RAW[:, 4] / 1e5 - RAW[:, 1] / 5e5 + 0.3 * rng.normal(size=500) > 0).astype(int)
+QUERIES = RAW[:40] * rng.uniform(0.8, 1.2, size=(40, 6))
+QUERIES[:, 5] = RAW[:40, 5]  # City tier stays a valid 1/2/3 code
+
+def test_scaler_matches_sklearn():
+    """Exported mean/scale arrays scale exactly like StandardScaler.transform"""
+    scaler = StandardScaler().fit(RAW)
+    pipeline = FeaturePipeline().fit(RAW)
+    np.testing.assert_array_equal(pipeline.mean, scaler.mean_)
+    np.testing.assert_array_equal(pipeline.scale, scaler.scale_)
+    np.testing.assert_allclose(pipeline.scale_features(QUERIES), scaler.transform(QUERIES), rtol=0, atol=1e-12)
+    assert pipeline.mean.flags.c_contiguous and pipeline.mean.dtype == np.float64
+    np.testing.assert_array_equal(FeaturePipeline.from_scaler(scaler).scaler.transform(QUERIES),
+                                  scaler.transform(QUERIES))
+
+@pytest.mark.parametrize("n_neighbors", [1, 6, 15])
+@pytest.mark.parametrize("weights", ["uniform", "distance"])
+def test_kernel_matches_predict_proba(n_neighbors, weights):
+    """The NumPy kernel reproduces KNeighborsClassifier.predict_proba, batched and row by row"""
+    pipeline = FeaturePipeline().fit(RAW)
+    knn = KNeighborsClassifier(n_neighbors=n_neighbors, weights=weights).fit(pipeline.transform(RAW), LABELS)
+    kernel = KNNKernel.from_classifier(knn)
+    X = pipeline.scale_features(QUERIES)
+    expected = knn.predict_proba(X)
+    np.testing.assert_allclose(kernel.predict_proba(X), expected, rtol=0, atol=1e-12)
+    for i in range(len(X)):
+        np.testing.assert_allclose(kernel.predict_proba(X[i:i + 1]), expected[i:i + 1], rtol=0, atol=1e-12)
+
+def test_kernel_handles_exact_matches_and_small_reference():
+    """Queries on a reference row (distance weights) and k >= rows behave like sklearn"""
+    X = FeaturePipeline().fit(RAW).transform(RAW)[:5]
+    knn = KNeighborsClassifier(n_neighbors=5, weights="distance").fit(X, LABELS[:5])
+    np.testing.assert_allclose(KNNKernel.from_classifier(knn).predict_proba(X), knn.predict_proba(X))
+
+def test_legacy_pickle_model_matches_sklearn(tmp_path):
+    """A pickled classifier and scaler score through the kernel exactly as sklearn would"""
+    scaler = StandardScaler().fit(RAW)
+    knn = KNeighborsClassifier(n_neighbors=6).fit(scaler.transform(RAW), LABELS)
+    model_path, scaler_path = tmp_path / "knn.pkl", tmp_path / "scaler.pkl"
+    model_path.write_bytes(pickle.dumps(knn))
+    scaler_path.write_bytes(pickle.dumps(scaler))
+
+    model = CreditScoreModel(model_path=str(model_path), scaler_path=str(scaler_path),
+                             bundle_path=str(tmp_path / "no_bundle"))
+    assert model.kernel is not None
+    expected = np.round(knn.predict_proba(scaler.transform(QUERIES))[:, 1] * 100, 2)
+    scored = model.evaluate_batch(pd.DataFrame(QUERIES, columns=model.get_model_info()["features"]))
+    np.testing.assert_array_equal(scored.ml_scores, expected)
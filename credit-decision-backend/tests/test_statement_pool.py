@@ -0,0 +1,49 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from app.services.statement_pool import StatementPool, merge_statements
+from app.utils.financial_analyzer import financial_analyzer
+
+HEADER = "date,description,amount,type\n"
+JANUARY = ["2025-01-05,Uber ride,350,debit", "2025-01-05,Uber ride,350,debit", "2025-01-31,Salary,50000,credit"]
+FEBRUARY = ["2025-01-31,Salary,50000,credit", "2025-02-03,DMart groceries,2400,debit"]
+
+def save(tmp_path, name: str, rows) -> dict:
+    path = tmp_path / name
+    path.write_text(HEADER + "\n".join(rows) + "\n")
+    return {"path": str(path), "file_name": name}
+
+def test_overlapping_statements_share_keys(tmp_path):
+    """Each statement is parsed on its own; a row in both statements gets the same key in each"""
+    pool = StatementPool(executor=ThreadPoolExecutor(2))
+    statements = [save(tmp_path, "jan.csv", JANUARY), save(tmp_path, "feb.csv", FEBRUARY)]
+    january, february = asyncio.run(pool.parse(statements))
+    pool.shutdown()
+
+    assert [january["count"], february["count"]] == [3, 2] and len(january["rows"]) == 3
+    # The two identical rides stay two transactions; the salary is one
+    assert len(set(january["keys"])) == 3
+    assert january["keys"][2] == february["keys"][0]
+    assert len(np.unique(np.concatenate([january["keys"], february["keys"]]))) == 4
+
+    # Merged, the shared salary counts once, from the first statement it appears in
+    rows, keys, records = merge_statements([january, february])
+    records = [json.loads(record) for record in records]
+    assert len(rows) == len(keys) == len(records) == 4
+    assert [r["description"] for r in records] == ["Uber ride", "Uber ride", "Salary", "DMart groceries"]
+    assert rows["category"].tolist() == financial_analyzer.analysis_rows(
+        pd.DataFrame(records, columns=["date", "description", "amount", "type"]))["category"].tolist()
+
+def test_unparseable_statement_is_named(tmp_path):
+    pool = StatementPool(executor=ThreadPoolExecutor(2))
+    bad = tmp_path / "march.csv"
+    bad.write_text("when,what\n2025-03-01,rent\n")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(pool.parse([save(tmp_path, "jan.csv", JANUARY), {"path": str(bad), "file_name": "march.csv"}]))
+    pool.shutdown()
+    assert error.value.status_code == 400
+    assert error.value.detail.startswith("march.csv: ")
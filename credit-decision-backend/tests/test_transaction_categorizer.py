@@ -0,0 +1,50 @@
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from app.utils.financial_analyzer import FinancialAnalyzer
+from app.utils.transaction_categorizer import (
+    UNKNOWN, TransactionCategorizer, ngram_features, normalize_descriptions
+)
+
+MERCHANTS = {
+    'transport': ['RAPIDO BIKE', 'REDBUS TICKETS', 'IRCTC WEB'],
+    'groceries': ['BLINKIT ORDER', 'ZEPTO MARKET', 'BB DAILY'],
+    'medical': ['APOLLO 24X7', 'PRACTO CONSULT', '1MG LABS'],
+}
+N_FEATURES = 1 << 14
+
+def make_categorizer(**kwargs) -> TransactionCategorizer:
+    descriptions, labels = [], []
+    for category, merchants in MERCHANTS.items():
+        for i in range(40):
+            descriptions.append(f"UPI/{1000 + i}/{merchants[i % len(merchants)]}")
+            labels.append(category)
+    X = ngram_features(normalize_descriptions(descriptions), N_FEATURES)
+    model = LogisticRegression(C=10, max_iter=1000).fit(X, labels)
+    return TransactionCategorizer(model.coef_.T, model.intercept_, model.classes_.tolist(), **kwargs)
+
+def test_ngram_features_ignore_case_and_reference_numbers():
+    X = ngram_features(normalize_descriptions(["UPI/123/Rapido", "upi/987/RAPIDO", "", None, "ab"]), N_FEATURES)
+    assert X.shape == (5, N_FEATURES)
+    assert (X[0] != X[1]).nnz == 0
+    # Too short for a 3-gram
+    assert X[2].nnz == X[3].nnz == X[4].nnz == 0
+
+def test_learned_categories_fill_in_after_keyword_rules(tmp_path):
+    path = str(tmp_path / "categorizer.npz")
+    make_categorizer().save(path)
+    analyzer = FinancialAnalyzer(TransactionCategorizer.load(path))
+    descriptions = ["UPI/5531/RAPIDO BIKE", "zepto market 77", "Uber trip", "Apollo pharmacy", "PRACTO CONSULT"]
+    assert [analyzer.categorize_transaction(d) for d in descriptions] == [
+        'transport', 'groceries', 'transport', 'medical', 'medical'
+    ]
+    codes = analyzer.categorize_descriptions(np.array(descriptions * 3, dtype=object))
+    assert [analyzer.categories[c] for c in codes[:5]] == ['transport', 'groceries', 'transport', 'medical', 'medical']
+
+    # Keyword rules alone leave the merchants in others
+    assert FinancialAnalyzer().categorize_transaction("UPI/5531/RAPIDO BIKE") == 'others'
+
+def test_low_confidence_predictions_stay_unknown():
+    categorizer = make_categorizer(min_confidence=0.999)
+    assert list(categorizer.predict(["qqq www", "QQQ WWW"])) == [UNKNOWN, UNKNOWN]
+    analyzer = FinancialAnalyzer(categorizer)
+    assert analyzer.categorize_transaction("qqq www") == 'others'
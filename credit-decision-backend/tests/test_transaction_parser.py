@@ -0,0 +1,240 @@
+import hashlib
+import io
+import re
+import zipfile
+import openpyxl
+import pytest
+from datetime import date, datetime, timedelta
+from fastapi import HTTPException, UploadFile
+from openpyxl.chart import BarChart, Reference
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+from app.utils.financial_analyzer import financial_analyzer
+from app.utils.transaction_parser import UPLOAD_CHUNK_SIZE, clean_transactions, read_excel_frame, transaction_parser
+from app.utils.xlsx_reader import XlsxWorkbook
+
+ROWS = [
+    "2025-01-01,Salary credit,50000,Credit",
+    "2025-01-03,Uber ride,350.5,debit",
+    '2025-01-04,"Swiggy, dinner",800,debit',
+    "2025-01-05,broken row,not-a-number,debit",
+    "2025-02-10,DMart groceries,2400,debit",
+]
+
+def make_upload(content: bytes, filename: str = "statement.csv", size=None) -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename=filename, size=size)
+
+def make_csv(n_repeats: int = 1) -> bytes:
+    return ("date,description,amount,type\n" + "\n".join(ROWS * n_repeats) + "\n").encode()
+
+def test_streams_clean_rows_and_skips_invalid():
+    """Rows are cleaned one at a time; quoted commas parse and bad amounts are skipped"""
+    rows = list(transaction_parser.iter_transactions(make_upload(make_csv()), max_bytes=0))
+    assert [r["description"] for r in rows] == ["Salary credit", "Uber ride", "Swiggy, dinner", "DMart groceries"]
+    assert rows[0] == {"date": "2025-01-01", "description": "Salary credit", "amount": 50000.0, "type": "credit"}
+
+def test_size_limit_enforced_while_reading():
+    """An upload of unknown size fails with 413 once the limit is passed, before it is fully read"""
+    content = make_csv(60000)
+    assert len(content) > 2 * UPLOAD_CHUNK_SIZE
+    stream = transaction_parser.iter_transactions(make_upload(content), max_bytes=UPLOAD_CHUNK_SIZE)
+    with pytest.raises(HTTPException) as error:
+        for _ in stream:
+            pass
+    assert error.value.status_code == 413
+
+    # A declared size over the limit is rejected up front
+    with pytest.raises(HTTPException) as error:
+        next(transaction_parser.iter_transactions(make_upload(content, size=len(content)), max_bytes=1024))
+    assert error.value.status_code == 413
+
+def test_rejects_missing_columns_and_bad_extension():
+    with pytest.raises(HTTPException) as error:
+        next(transaction_parser.iter_transactions(make_upload(b"date,amount\n2025-01-01,5\n"), max_bytes=0))
+    assert error.value.status_code == 400 and "description" in error.value.detail
+    with pytest.raises(HTTPException):
+        next(transaction_parser.iter_transactions(make_upload(make_csv(), filename="statement.pdf")))
+
+def test_analysis_of_a_stream_matches_a_list():
+    """The analyzer makes a single pass, so a generator gives the same result as a list"""
+    rows = list(transaction_parser.iter_transactions(make_upload(make_csv(3)), max_bytes=0))
+    streamed = financial_analyzer.analyze_transactions(
+        transaction_parser.iter_transactions(make_upload(make_csv(3)), max_bytes=0), 30000
+    )
+    assert streamed == financial_analyzer.analyze_transactions(rows, 30000)
+    assert streamed["transaction_depth_days"] == 40
+    # Three salary credits, all in January of a two-month history: not a stable inflow
+    assert streamed["cash_flow"]["months"] == 2 and streamed["cash_flow"]["inflow_months"] == 1
+    assert not streamed["has_stable_inflow"]
+
+def test_columnar_analysis_matches_row_categorization():
+    """Frames from the parser give the same analysis as dicts, and masking digits never changes a category"""
+    frames = list(transaction_parser.iter_frames(make_upload(make_csv(3)), max_bytes=0))
+    rows = list(transaction_parser.iter_transactions(make_upload(make_csv(3)), max_bytes=0))
+    assert financial_analyzer.analyze_frames(frames, 30000) == financial_analyzer.analyze_transactions(rows, 30000)
+
+    descriptions = ["UPI/123/Swiggy 42", "ZOMATO#9", "Rent 2025", "netflix", "", "ATM 5532 cash", "Paytm 7x"]
+    codes = financial_analyzer.categorize_descriptions(descriptions)
+    assert [financial_analyzer.categories[c] for c in codes] == [
+        financial_analyzer.categorize_transaction(d) for d in descriptions
+    ]
+
+def test_upload_hash_matches_saved_copy(tmp_path):
+    # Trailing blank lines are never parsed into rows but are part of the file
+    content = make_csv(3) + b"\n\n"
+    digest = hashlib.sha256()
+    for _ in transaction_parser.iter_frames(make_upload(content), max_bytes=0, digest=digest):
+        pass
+    assert digest.hexdigest() == hashlib.sha256(content).hexdigest()
+    size, saved_digest = transaction_parser.save_upload(make_upload(content), str(tmp_path / "copy"), max_bytes=0)
+    assert (size, saved_digest) == (len(content), digest.hexdigest())
+    assert (tmp_path / "copy").read_bytes() == content
+
+def make_workbook(write_only: bool = False) -> bytes:
+    """A summary sheet, then a statement with a title block and extra columns"""
+    workbook = openpyxl.Workbook(write_only=write_only)
+    if not write_only:
+        workbook.remove(workbook.active)
+    workbook.create_sheet("Summary").append(["Account", "XXXX1234"])
+    sheet = workbook.create_sheet("Statement")
+    sheet.append(["Statement of account"])
+    sheet.append([])
+    sheet.append(["ref", "date", "description", "amount", "balance", "type"])
+    sheet.append(["R1", datetime(2025, 1, 1), "Salary credit", 50000, 50000, "Credit"])
+    sheet.append(["R2", datetime(2025, 1, 3, 18, 30), "Uber & Ola", 350.5, 49649.5, "debit"])
+    sheet.append(["R3", datetime(2025, 1, 4), "Pending", "n/a", 49649.5, "debit"])
+    sheet.append([])
+    sheet.append(["R4", "2025-02-10", "DMart groceries", 2400, 47249.5, "debit"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def without_cell_references(content: bytes) -> bytes:
+    """The same workbook with the optional r attributes of its cells removed"""
+    source, buffer = zipfile.ZipFile(io.BytesIO(content)), io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as target:
+        for name in source.namelist():
+            data = source.read(name)
+            if name.startswith("xl/worksheets/"):
+                data = re.sub(rb'(<c\b[^>]*?) r="[A-Z]+\d+"', rb"\1", data)
+            target.writestr(name, data)
+    return buffer.getvalue()
+
+def with_shared_strings(content: bytes, sheet: str = "xl/worksheets/sheet1.xml") -> bytes:
+    """
+    The same workbook with one sheet's inline strings moved to a shared string table
+    (openpyxl writes every string inline); "Rich text" becomes rich text with a phonetic run
+    """
+    source, buffer = zipfile.ZipFile(io.BytesIO(content)), io.BytesIO()
+    strings = []
+
+    def share(match):
+        strings.append(match.group(2))
+        return b'%st="s"><v>%d</v></c>' % (match.group(1), len(strings) - 1)
+
+    with zipfile.ZipFile(buffer, "w") as target:
+        for name in source.namelist():
+            data = source.read(name)
+            if name == sheet:
+                data = re.sub(rb'(<c\b[^>]*?)t="inlineStr"><is>(.*?)</is></c>', share, data)
+            elif name == "xl/_rels/workbook.xml.rels":
+                data = data.replace(b"</Relationships>", b'<Relationship Id="rIdStrings" Target="sharedStrings.xml" '
+                                    b'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+                                    b'sharedStrings"/></Relationships>')
+            elif name == "[Content_Types].xml":
+                data = data.replace(b"</Types>", b'<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+                                    b'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>')
+            target.writestr(name, data)
+        items = b"".join(b"<si>%s</si>" % item for item in strings).replace(
+            b"<si><t>Rich text</t></si>", b'<si><r><t xml:space="preserve">Rich </t></r><r><rPr><b/></rPr><t>text</t></r>'
+                                          b'<rPh sb="0" eb="4"><t>ri</t></rPh></si>')
+        target.writestr("xl/sharedStrings.xml", b'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                                                b'%s</sst>' % items)
+    return buffer.getvalue()
+
+EXPECTED_EXCEL_ROWS = [
+    {"date": "2025-01-01 00:00:00", "description": "Salary credit", "amount": 50000.0, "type": "credit"},
+    {"date": "2025-01-03 18:30:00", "description": "Uber & Ola", "amount": 350.5, "type": "debit"},
+    {"date": "2025-02-10", "description": "DMart groceries", "amount": 2400.0, "type": "debit"},
+]
+
+@pytest.mark.parametrize("write_only", [False, True], ids=["shared_strings", "inline_strings"])
+def test_xlsx_rows_stream_from_the_statement_sheet(write_only):
+    """The sheet and header row are found, only the required columns are read, bad amounts are dropped"""
+    content = make_workbook(write_only)
+    for workbook in (content, without_cell_references(content)):
+        rows = list(transaction_parser.iter_transactions(make_upload(workbook, "statement.xlsx"), max_bytes=0))
+        assert rows == EXPECTED_EXCEL_ROWS
+
+    # Workbooks openpyxl cannot stream (.xls) are read whole through pandas, with the same sheet detection
+    frame = clean_transactions(read_excel_frame(content))
+    assert frame.to_dict("records") == EXPECTED_EXCEL_ROWS
+
+def test_xlsx_without_a_statement_sheet_is_rejected():
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["date", "amount"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    with pytest.raises(HTTPException) as error:
+        list(transaction_parser.iter_frames(make_upload(buffer.getvalue(), "statement.xlsx"), max_bytes=0))
+    assert error.value.status_code == 400 and "required columns" in error.value.detail
+
+@pytest.mark.parametrize("epoch", [CALENDAR_WINDOWS_1900, CALENDAR_MAC_1904], ids=["1900", "1904"])
+def test_xlsx_reader_matches_openpyxl(epoch):
+    """
+    XlsxWorkbook reads the workbook parts itself and only uses openpyxl's public
+    number format and date helpers; its values must stay those of openpyxl's reader
+    """
+    workbook = openpyxl.Workbook()
+    workbook.epoch = epoch
+    sheet = workbook.active
+    sheet.title = "Statement"
+    sheet.append(["date", "posted", "time", "description", "amount", "flag"])
+    for day in range(1, 6):
+        sheet.append([datetime(2025, 1, day), datetime(2025, 1, day, 9, 15), timedelta(hours=day, minutes=30),
+                      f"Payment {day} x005F_ & <co>", day * 100.25, day % 2 == 0])
+    sheet.append([date(2024, 12, 31), None, None, "Rich text", 7, None])
+    for row in sheet.iter_rows(min_row=2):
+        row[0].number_format = "dd/mm/yyyy"
+        row[1].number_format = "yyyy-mm-dd hh:mm"
+        row[2].number_format = "[h]:mm:ss"
+    workbook.create_sheet("Notes").append(["plain", 1, 2.5])
+    chart = BarChart()
+    chart.add_data(Reference(sheet, min_col=5, min_row=2, max_row=6))
+    workbook.create_chartsheet("Chart").add_chart(chart)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    content = with_shared_strings(buffer.getvalue())
+
+    expected = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    reader = XlsxWorkbook(content)
+    try:
+        assert [title for title, _ in reader.sheets] == [ws.title for ws in expected.worksheets]
+        for (_, path), worksheet in zip(reader.sheets, expected.worksheets):
+            rows = [list(values) for _, values in reader.iter_rows(path)]
+            # openpyxl pads rows to the sheet's width; iter_rows stops at the last filled cell
+            expected_rows = [list(row) for row in worksheet.iter_rows(values_only=True)]
+            for row in expected_rows:
+                while row and row[-1] is None:
+                    row.pop()
+            assert rows == expected_rows
+    finally:
+        reader.close()
+        expected.close()
+
+def test_zip_statements_are_extracted(tmp_path):
+    """Statements inside a zip are saved one by one; folders, hidden files and other types are skipped"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("2025/jan.csv", make_csv())
+        archive.writestr("2025/feb.xlsx", make_workbook())
+        archive.writestr("__MACOSX/2025/._jan.csv", b"junk")
+        archive.writestr("notes.txt", b"not a statement")
+    statements = transaction_parser.save_statements(make_upload(buffer.getvalue(), "statements.zip"), str(tmp_path), 5)
+    assert [s["file_name"] for s in statements] == ["jan.csv", "feb.xlsx"]
+    with open(statements[0]["path"], "rb") as f:
+        assert f.read() == make_csv()
+    assert statements[0]["sha256"] == hashlib.sha256(make_csv()).hexdigest()
+
+    with pytest.raises(HTTPException) as error:
+        transaction_parser.save_statements(make_upload(buffer.getvalue(), "statements.zip"), str(tmp_path), 1)
+    assert error.value.status_code == 400